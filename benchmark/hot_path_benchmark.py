@@ -0,0 +1,164 @@
+import argparse
+import json
+import math
+import os
+import sys
+import timeit
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+sys.path.insert(0, os.path.join(REPO_PATH, 'nifi_cluster_coordinator'))
+
+import services.access_policy_service as access_policy_service  # noqa: E402
+import services.parameter_context_service as parameter_context_service  # noqa: E402
+import services.sensitive_parameter_store as sensitive_parameter_store  # noqa: E402
+import services.user_group_service as user_group_service  # noqa: E402
+import utils.name_helper as name_helper  # noqa: E402
+from configuration.parameter_context import ParameterContext  # noqa: E402
+from configuration.project import Project  # noqa: E402
+from configuration.security import ComponentAccessPolicy, Security, UserGroup  # noqa: E402
+
+# Every case is measured at a quarter of its size and at its size, the growth of the time per call gives the
+# scaling exponent, 1 for linear and 2 for quadratic functions.
+size_factor = 4
+
+
+class FakeCluster:
+    def __init__(self, name: str):
+        self.name = name
+        self.root_process_group_id = 'root'
+
+
+def _tenant_json(identity: str):
+    return {'id': identity, 'revision': {'version': 1}, 'component': {'id': identity, 'identity': identity}}
+
+
+def _diff_parameters_case(size: int):
+    sensitive_parameter_store.init_sensitive_parameter_store(None)
+    cluster = FakeCluster('cluster')
+    parameters = [
+        {'name': f'parameter-{i}', 'description': '', 'is_sensitive': i % 10 == 0, 'value': f'value-{i}'} for i in range(size)
+    ]
+    parameter_context = ParameterContext('context', '', True, parameters)
+    sensitive_parameter_store.record(cluster, 'context-id', parameter_context.parameters)
+    current_json = {
+        'id': 'context-id',
+        'component': {
+            'description': '',
+            'parameters': [
+                {'parameter': {'name': p['name'], 'description': '', 'sensitive': p['is_sensitive'], 'value': p['value']}}
+                for p in reversed(parameters)
+            ]
+        }
+    }
+    return lambda: parameter_context_service._diff_parameters(cluster, parameter_context, current_json)
+
+
+def _did_members_change_case(size: int):
+    identities = [f'user-{i}' for i in range(size)]
+    security = Security({'is_coordinated': True, 'users': identities, 'user_groups': [{'identity': 'group', 'members': identities}]})
+    current_json = {'component': {'users': [_tenant_json(identity.upper()) for identity in reversed(identities)]}}
+    user_group = UserGroup('group', identities)
+    return lambda: user_group_service._did_members_change(user_group, current_json, security)
+
+
+def _did_users_or_groups_change_case(size: int):
+    identities = [f'user-{i}' for i in range(size)]
+    group_identities = [f'group-{i}' for i in range(size)]
+    current_json = {
+        'component': {
+            'users': [_tenant_json(identity) for identity in reversed(identities)],
+            'userGroups': [_tenant_json(identity) for identity in reversed(group_identities)]
+        }
+    }
+    return lambda: access_policy_service._did_users_or_groups_change(identities, group_identities, current_json)
+
+
+def _get_component_id_case(size: int):
+    # environments spread over projects of ten environments each, the policy points at the last one
+    cluster = FakeCluster('cluster')
+    projects = [
+        Project(f'project-{i}', '', 'registry', 'bucket', 'flow', [{
+            'cluster_name': 'cluster',
+            'environments': [{'name': f'environment-{j}', 'description': '', 'is_coordinated': True} for j in range(10)]
+        }])
+        for i in range(max(size // 10, 1))
+    ]
+    policy = ComponentAccessPolicy(
+        'view the component', 'environment', f'{projects[-1].name}:environment-9', [], [], False, [])
+    return lambda: access_policy_service._get_component_id(cluster, policy, projects)
+
+
+def _get_project_cluster_case(size: int):
+    project = Project('project', '', 'registry', 'bucket', 'flow', [{'cluster_name': f'cluster-{i}', 'environments': []} for i in range(size)])
+    cluster = FakeCluster(f'cluster-{size - 1}')
+    return lambda: project.get_project_cluster(cluster)
+
+
+def _missing_names_case(size: int):
+    current_names = [f'component-{i}' for i in range(size)]
+    configured_names = [f'COMPONENT-{i}' for i in range(size // 2, size + size // 2)]
+    return lambda: name_helper.missing_names(current_names, configured_names)
+
+
+# name, builder returning the call to measure for a size, size, highest scaling exponent that is accepted
+cases = [
+    ('parameter_context_service._diff_parameters', _diff_parameters_case, 5000, 1.5),
+    ('user_group_service._did_members_change', _did_members_change_case, 10000, 1.5),
+    ('access_policy_service._did_users_or_groups_change', _did_users_or_groups_change_case, 10000, 1.5),
+    ('access_policy_service._get_component_id', _get_component_id_case, 1000, 1.5),
+    ('Project.get_project_cluster', _get_project_cluster_case, 1000, 1.5),
+    ('name_helper.missing_names', _missing_names_case, 10000, 1.5)
+]
+
+
+def seconds_per_call(function, repeat: int = 3, batch_seconds: float = 0.2) -> float:
+    """Return the best time per call of the function out of several timed batches of at least batch_seconds."""
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < batch_seconds:
+        number *= 2
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def scaling_exponent(build, size: int, repeat: int = 3, batch_seconds: float = 0.2) -> tuple:
+    """Return the time per call at the size and the exponent of its growth from a quarter of the size."""
+    small_seconds = seconds_per_call(build(max(size // size_factor, 1)), repeat, batch_seconds)
+    seconds = seconds_per_call(build(size), repeat, batch_seconds)
+    return seconds, math.log(seconds / small_seconds) / math.log(size_factor)
+
+
+def run(scale: float = 1, repeat: int = 3) -> list:
+    results = []
+    for name, build, size, max_exponent in cases:
+        size = max(int(size * scale), size_factor)
+        seconds, exponent = scaling_exponent(build, size, repeat)
+        results.append({
+            'name': name,
+            'size': size,
+            'seconds_per_call': seconds,
+            'scaling_exponent': round(exponent, 2),
+            'max_scaling_exponent': max_exponent,
+            'regressed': exponent > max_exponent
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure how the pure Python diff and lookup functions scale with the configuration size.')
+    parser.add_argument('--scale', help='Multiply the size of every case, default is 1.', type=float, default=1)
+    parser.add_argument('--repeat', help='Number of timed batches per measurement, default is 3.', type=int, default=3)
+    parser.add_argument('--output', help='Write the results as JSON to this file.', required=False)
+    args = parser.parse_args()
+
+    results = run(args.scale, args.repeat)
+    for result in results:
+        print(  # noqa: T001
+            f'{result["name"]:<55} size: {result["size"]:>7}  {result["seconds_per_call"] * 1000:>9.3f} ms/call  '
+            f'exponent: {result["scaling_exponent"]:>5} (max {result["max_scaling_exponent"]}){"  REGRESSED" if result["regressed"] else ""}')
+
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(results, stream, indent=2)
+
+    sys.exit(1 if len([r for r in results if r['regressed']]) > 0 else 0)
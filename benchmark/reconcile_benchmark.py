@@ -0,0 +1,247 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+sys.path.insert(0, os.path.join(REPO_PATH, 'nifi_cluster_coordinator'))
+
+import worker  # noqa: E402
+import services.flow_version_cache as flow_version_cache  # noqa: E402
+import services.sensitive_parameter_store as sensitive_parameter_store  # noqa: E402
+import services.drift_service as drift_service  # noqa: E402
+from configuration import config_loader  # noqa: E402
+from test.fake_nifi_server import FakeNifiServer  # noqa: E402
+
+
+def generate_definition(
+    host_names: list,
+    users: int,
+    user_groups: int,
+    parameter_contexts: int,
+    parameters: int,
+    projects: int,
+    environments: int
+) -> dict:
+    """Return a configuration definition of the given size, every project is deployed to every cluster.
+
+    Users are spread over the user groups, every group may view the UI and the projects are bound to the
+    parameter contexts and granted to the groups in turn.
+    """
+    user_identities = [f'user-{i}' for i in range(users)]
+    user_group_identities = [f'group-{i}' for i in range(user_groups)]
+    parameter_context_names = [f'context-{i}' for i in range(parameter_contexts)]
+
+    return {
+        'clusters': [
+            {'name': f'cluster-{i}', 'host_name': host_name, 'security': {'use_certificate': False}}
+            for i, host_name in enumerate(host_names)
+        ],
+        'registries': [{'name': 'registry', 'host_name': 'http://registry', 'description': 'registry'}],
+        'parameter_contexts': [
+            {
+                'name': name,
+                'description': name,
+                'is_coordinated': True,
+                'parameters': [
+                    {'name': f'parameter-{j}', 'description': '', 'is_sensitive': j % 10 == 0, 'value': f'value-{j}'}
+                    for j in range(parameters)
+                ]
+            }
+            for name in parameter_context_names
+        ],
+        'projects': [
+            {
+                'name': f'project-{i}',
+                'description': f'project-{i}',
+                'registry_name': 'registry',
+                'bucket_id': 'bucket',
+                'flow_id': f'flow-{i}',
+                'clusters': [
+                    {
+                        'cluster_name': f'cluster-{c}',
+                        'environments': [
+                            {
+                                'name': f'environment-{j}',
+                                'description': f'environment-{j}',
+                                'is_coordinated': True,
+                                'version': 'latest',
+                                'parameter_context_name': parameter_context_names[(i + j) % len(parameter_context_names)] if parameter_contexts > 0 else ''
+                            }
+                            for j in range(environments)
+                        ]
+                    }
+                    for c in range(len(host_names))
+                ]
+            }
+            for i in range(projects)
+        ],
+        'security': {
+            'is_coordinated': True,
+            'users': user_identities,
+            'user_groups': [
+                {'identity': identity, 'members': user_identities[i::user_groups]}
+                for i, identity in enumerate(user_group_identities)
+            ],
+            'global_access_policies': [
+                {'name': 'view the UI', 'action': 'read', 'users': [], 'user_groups': user_group_identities}
+            ],
+            'component_access_policies': [
+                {
+                    'name': 'view the component',
+                    'component_type': 'project',
+                    'component_name': f'project-{i}',
+                    'user_groups': [user_group_identities[i % user_groups]]
+                }
+                for i in range(projects if user_groups > 0 else 0)
+            ]
+        }
+    }
+
+
+def run(args) -> dict:
+    """Reconcile a generated configuration against stand-in NiFi servers, once per pass, and measure every pass."""
+    flow_version_cache.init_flow_version_cache(args.flow_version_cache_ttl)
+    sensitive_parameter_store.init_sensitive_parameter_store(None)
+    drift_service.init_drift_detection(False)
+
+    # the servers live in their own process so they neither compete for the GIL nor count towards the memory
+    connection, server_connection = multiprocessing.Pipe()
+    server_process = multiprocessing.Process(target=_serve, args=(server_connection, args.clusters, {
+        'latency': args.latency,
+        'failure_rate': args.failure_rate,
+        'update_request_duration': args.update_request_duration,
+        'seed': 0
+    }), daemon=True)
+    server_process.start()
+    host_names = connection.recv()
+
+    definition = generate_definition(
+        host_names, args.users, args.user_groups, args.parameter_contexts, args.parameters, args.projects, args.environments)
+
+    passes = []
+    try:
+        for _ in range(args.passes):
+            configuration = config_loader._build_configuration(definition)
+            connection.send('reset')
+            connection.recv()
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            reconciled = worker.process(configuration, args.max_parallel_clusters)
+            wall_seconds = time.perf_counter() - started
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            for cluster in configuration.clusters:
+                cluster.close()
+            connection.send('calls')
+            endpoint_calls = connection.recv()
+
+            passes.append({
+                'reconciled': reconciled,
+                'wall_seconds': round(wall_seconds, 3),
+                'peak_memory_bytes': peak_memory,
+                'api_calls': sum(endpoint_calls.values()),
+                'api_calls_by_endpoint': dict(sorted(endpoint_calls.items()))
+            })
+    finally:
+        connection.send('stop')
+        server_process.join()
+
+    return {
+        'commit': _commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'parameters': {
+            k: getattr(args, k) for k in [
+                'clusters', 'users', 'user_groups', 'parameter_contexts', 'parameters', 'projects', 'environments',
+                'latency', 'failure_rate', 'update_request_duration', 'max_parallel_clusters', 'flow_version_cache_ttl'
+            ]
+        },
+        'passes': passes
+    }
+
+
+def compare(previous: dict, current: dict):
+    """Log the change of every pass against the same pass of a previous run."""
+    logger = logging.getLogger(__name__)
+    if previous['parameters'] != current['parameters']:
+        logger.warning('The previous run used other parameters, the comparison is not like for like.')
+
+    for i, (previous_pass, current_pass) in enumerate(zip(previous['passes'], current['passes'])):
+        for key in ['wall_seconds', 'api_calls', 'peak_memory_bytes']:
+            logger.info(
+                f'pass {i + 1} {key}: {previous_pass[key]} -> {current_pass[key]} ({_relative_change(previous_pass[key], current_pass[key])})')
+
+
+def _serve(connection, count: int, options: dict):
+    servers = [FakeNifiServer(**options).start() for _ in range(count)]
+    connection.send([server.host_name for server in servers])
+    while True:
+        command = connection.recv()
+        if command == 'reset':
+            for server in servers:
+                server.endpoint_calls.clear()
+            connection.send(None)
+        elif command == 'calls':
+            connection.send(sum((server.endpoint_calls for server in servers), Counter()))
+        else:
+            break
+    for server in servers:
+        server.stop()
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_PATH, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _relative_change(previous, current) -> str:
+    if previous == 0:
+        return 'n/a'
+    return f'{(current - previous) / previous * 100:+.1f}%'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure a reconcile of a generated configuration against stand-in NiFi servers.')
+    parser.add_argument('--clusters', help='Number of clusters, default is 2.', type=int, default=2)
+    parser.add_argument('--users', help='Number of users, default is 50.', type=int, default=50)
+    parser.add_argument('--user-groups', help='Number of user groups, default is 5.', type=int, default=5)
+    parser.add_argument('--parameter-contexts', help='Number of parameter contexts, default is 5.', type=int, default=5)
+    parser.add_argument('--parameters', help='Number of parameters per parameter context, default is 20.', type=int, default=20)
+    parser.add_argument('--projects', help='Number of projects, default is 5.', type=int, default=5)
+    parser.add_argument('--environments', help='Number of environments per project and cluster, default is 3.', type=int, default=3)
+    parser.add_argument('--latency', help='Seconds every API call is delayed, default is 0.01.', type=float, default=0.01)
+    parser.add_argument('--failure-rate', help='Fraction of the API calls that fail, default is 0.', type=float, default=0)
+    parser.add_argument('--update-request-duration', help='Seconds an update request takes, default is 0.', type=float, default=0)
+    parser.add_argument('--max-parallel-clusters', help='Number of clusters reconciled at the same time, default is 1.', type=int, default=1)
+    parser.add_argument('--flow-version-cache-ttl', help='Seconds fetched flow versions are reused, default is 300.', type=float, default=300)
+    parser.add_argument('--passes', help='Number of reconciles, the first one creates everything, default is 2.', type=int, default=2)
+    parser.add_argument('--output', help='Write the results as JSON to this file.', required=False)
+    parser.add_argument('--compare', help='Compare the results with those of a previous run.', required=False)
+    parser.add_argument('--loglevel', help='Log level of the coordinator, default is WARNING.', default='WARNING')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.loglevel, format='%(asctime)s %(threadName)s %(levelname)s %(message)s')
+    logging.getLogger(__name__).setLevel(logging.INFO)
+
+    results = run(args)
+    print(json.dumps(results, indent=2))  # noqa: T001
+
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(results, stream, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as stream:
+            compare(json.load(stream), results)
@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+import metrics_exporter
+from configuration.cluster import Cluster
+
+# Unreachable clusters are probed again after a growing delay, so a restarting cluster is back in seconds
+# while a cluster that stays down costs one probe a minute.
+initial_backoff = 2
+
+max_backoff = 60
+
+_on_recovered = None
+_watched_clusters = {}
+_condition = threading.Condition()
+_thread = None
+
+
+def init_cluster_prober(on_recovered):
+    """Start probing unreachable clusters in the background.
+
+    :param on_recovered:
+        Called with the cluster and its configuration once the cluster is reachable again, returns False
+        when the cluster could not be handed over yet so it is probed again later.
+    """
+    global _on_recovered, _thread
+    with _condition:
+        _on_recovered = on_recovered
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name='prober', daemon=True)
+            _thread.start()
+
+
+def watch(cluster: Cluster, configuration):
+    """Probe the unreachable cluster in the background until it is reachable again."""
+    logger = logging.getLogger(__name__)
+    with _condition:
+        if _on_recovered is None:
+            return
+        if not (cluster.name in _watched_clusters):
+            logger.info(f'Probing cluster: {cluster.name}, again in {initial_backoff} s.')
+        _watched_clusters[cluster.name] = {
+            'cluster': cluster,
+            'configuration': configuration,
+            'backoff': initial_backoff,
+            'probe_at': time.monotonic() + initial_backoff
+        }
+        _condition.notify_all()
+
+
+def forget(cluster: Cluster):
+    with _condition:
+        _watched_clusters.pop(cluster.name, None)
+
+
+def watched_cluster_names() -> list:
+    with _condition:
+        return sorted(_watched_clusters.keys())
+
+
+def _next_due():
+    with _condition:
+        while True:
+            if len(_watched_clusters) == 0:
+                _condition.wait()
+                continue
+            name, entry = min(_watched_clusters.items(), key=lambda e: e[1]['probe_at'])
+            wait_for = entry['probe_at'] - time.monotonic()
+            if wait_for > 0:
+                _condition.wait(wait_for)
+                continue
+            return name, entry
+
+
+def _run():
+    logger = logging.getLogger(__name__)
+    while True:
+        name, entry = _next_due()
+
+        try:
+            reachable = entry['cluster'].test_connectivity()
+            metrics_exporter.set_reachable(name, reachable)
+            handed_over = reachable and _on_recovered(entry['cluster'], entry['configuration'])
+        except Exception as exception:
+            logger.warning(exception)
+            handed_over = False
+
+        with _condition:
+            # a newer reconcile may have replaced the entry while the probe was running
+            if _watched_clusters.get(name, None) is not entry:
+                continue
+            if handed_over:
+                logger.info(f'Cluster: {name}, is reachable again, queueing a reconcile.')
+                del _watched_clusters[name]
+            else:
+                entry['backoff'] = min(entry['backoff'] * 2, max_backoff)
+                entry['probe_at'] = time.monotonic() + entry['backoff']
+                logger.info(f'Cluster: {name}, is still unreachable, probing again in {entry["backoff"]} s.')
@@ -1,6 +1,13 @@
 import logging
+import ssl
+import threading
+import time
 import requests
 from .security import ClusterSecurity
+import utils.http_session as http_session
+import utils.http_metrics as http_metrics
+from utils.circuit_breaker import CircuitBreaker
+from utils.latency_tracker import LatencyTracker
 
 revision_0 = {
     'version': 0
@@ -8,6 +15,28 @@ revision_0 = {
 
 base_api_path = '/nifi-api'
 
+default_connection_pool_size = 10
+
+default_connect_timeout = 5
+
+default_read_timeout = 60
+
+default_max_parallel_access_policies = 8
+
+default_max_parallel_environment_upgrades = 4
+
+default_max_parallel_parameter_contexts = 4
+
+default_max_parallel_projects = 4
+
+default_circuit_breaker_failures = 5
+
+default_circuit_breaker_cooldown = 30
+
+default_circuit_breaker_slow_call = None
+
+default_adaptive_timeouts = True
+
 # For each cluster in our configuration
 # Get the list of currently configured registry clients
 # For each registry in the confgiuration file
@@ -19,37 +48,186 @@ base_api_path = '/nifi-api'
 
 
 class Cluster:
-    def __init__(self, name: str, host_name: str, security: dict):
+    def __init__(
+        self,
+        name: str,
+        host_name: str,
+        security: dict,
+        connection_pool_size: int = default_connection_pool_size,
+        connect_timeout: float = default_connect_timeout,
+        read_timeout: float = default_read_timeout,
+        max_parallel_access_policies: int = default_max_parallel_access_policies,
+        max_parallel_environment_upgrades: int = default_max_parallel_environment_upgrades,
+        max_parallel_parameter_contexts: int = default_max_parallel_parameter_contexts,
+        max_parallel_projects: int = default_max_parallel_projects,
+        circuit_breaker_failures: int = default_circuit_breaker_failures,
+        circuit_breaker_cooldown: float = default_circuit_breaker_cooldown,
+        circuit_breaker_slow_call: float = default_circuit_breaker_slow_call,
+        adaptive_timeouts: bool = default_adaptive_timeouts
+    ):
         self.name = name
         self.host_name = host_name
         self.security = ClusterSecurity(security)
+        self._security_definition = security
+        self.connection_pool_size = connection_pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_parallel_access_policies = max_parallel_access_policies
+        self.max_parallel_environment_upgrades = max_parallel_environment_upgrades
+        self.max_parallel_parameter_contexts = max_parallel_parameter_contexts
+        self.max_parallel_projects = max_parallel_projects
+        # shared by every project of the cluster so the limit holds for the whole cluster
+        self.environment_upgrade_slots = threading.BoundedSemaphore(max(max_parallel_environment_upgrades, 1))
+        # a sick cluster fails the remaining calls fast instead of letting each one hang until its timeout
+        self.circuit_breaker = CircuitBreaker(name, circuit_breaker_failures, circuit_breaker_cooldown, circuit_breaker_slow_call)
+        self.adaptive_timeouts = adaptive_timeouts
+        # per method and endpoint template, a cheap lookup says nothing about how long a large listing takes
+        self._latency_trackers = {}
+        self._latency_trackers_lock = threading.Lock()
+        # the services log failed changes and carry on, a reconcile compares the count to tell if it applied everything
+        self.failures = 0
+        self._failures_lock = threading.Lock()
         self.is_reachable = False
+        self.latency = None
         self.registeries_json_dict = None
+        self.tenant_snapshot = None
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """Return the pooled keep-alive session used for every API call to the cluster."""
+        with self._session_lock:
+            if self._session is None:
+                ssl_context = None
+                if self.security.use_certificate:
+                    certificate_config = self.security.certificate_config
+                    try:
+                        ssl_context = http_session.create_ssl_context(
+                            certificate_config.ssl_cert_file,
+                            certificate_config.ssl_key_file,
+                            certificate_config.ssl_ca_cert)
+                    except (OSError, ssl.SSLError) as exception:
+                        raise requests.exceptions.SSLError(f'Unable to load certificates for cluster: {self.name}, {exception}')
+                self._session = http_session.create_session(self.connection_pool_size, ssl_context)
+            return self._session
+
+    def close(self):
+        """Close the pooled connections of the cluster."""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def take_over(self, previous):
+        """Carry on with the circuit breaker, recent latencies and pooled connections of the cluster a reload replaces.
+
+        Nothing is carried over to another host, and the connections are only reused with the same security settings
+        and pool size, otherwise the connections of the previous cluster are closed.
+        """
+        if previous is self:
+            return
+        if previous.host_name != self.host_name:
+            previous.close()
+            return
+
+        circuit_breaker = previous.circuit_breaker
+        circuit_breaker.failure_threshold = self.circuit_breaker.failure_threshold
+        circuit_breaker.cooldown = self.circuit_breaker.cooldown
+        circuit_breaker.slow_call_seconds = self.circuit_breaker.slow_call_seconds
+        self.circuit_breaker = circuit_breaker
+
+        with previous._latency_trackers_lock:
+            for latency_tracker in previous._latency_trackers.values():
+                latency_tracker.max_timeout = self.read_timeout
+        self._latency_trackers = previous._latency_trackers
+        self._latency_trackers_lock = previous._latency_trackers_lock
 
-    def _get_connection_details(self, endpoint: str):
-        """Return the connection details for the cluster API calls."""
-        connection_details = {
-            'url': self.host_name + base_api_path + endpoint,
-            'cert': (self.security.certificate_config.ssl_cert_file, self.security.certificate_config.ssl_key_file) if self.security.use_certificate else None,
-            'verify': self.security.certificate_config.ssl_ca_cert if self.security.use_certificate else None
-        }
-        return connection_details
-
-    def test_connectivity(self):
-        """Determine if cluster is reachable."""
+        if previous._security_definition == self._security_definition and previous.connection_pool_size == self.connection_pool_size:
+            with previous._session_lock:
+                self._session = previous._session
+        else:
+            previous.close()
+
+    def request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """Issue an API call to the cluster over the pooled session, guarded by the circuit breaker of the cluster."""
+        ticket = self.circuit_breaker.before_call()
+
+        latency_tracker = self._latency_tracker(method, endpoint)
+        read_timeout = latency_tracker.read_timeout() if self.adaptive_timeouts else self.read_timeout
+        kwargs.setdefault('timeout', (self.connect_timeout, read_timeout))
+
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, self.host_name + base_api_path + endpoint, **kwargs)
+        except Exception:
+            duration = time.monotonic() - started
+            self.circuit_breaker.record(False, duration, ticket)
+            http_metrics.record(self.name, method, endpoint, None, duration)
+            self.record_failure()
+            raise
+
+        duration = time.monotonic() - started
+        succeeded = response.status_code < 500
+        self.circuit_breaker.record(succeeded, duration, ticket)
+        # lookups answer 404 for components that do not exist yet, only rejected changes count as failures
+        if not succeeded or (method != 'GET' and response.status_code >= 400):
+            self.record_failure()
+        if succeeded:
+            latency_tracker.record(duration)
+        http_metrics.record(self.name, method, endpoint, response.status_code, duration, _body_size(response.request.body), len(response.content))
+        return response
+
+    def record_failure(self):
+        """Count a change that did not apply, like a rejected call or a failed update request."""
+        with self._failures_lock:
+            self.failures += 1
+
+    def _latency_tracker(self, method: str, endpoint: str) -> LatencyTracker:
+        key = (method, http_metrics.endpoint_template(endpoint))
+        with self._latency_trackers_lock:
+            if not (key in self._latency_trackers):
+                self._latency_trackers[key] = LatencyTracker(self.read_timeout)
+            return self._latency_trackers[key]
+
+    def get(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request('GET', endpoint, **kwargs)
+
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request('POST', endpoint, **kwargs)
+
+    def put(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request('PUT', endpoint, **kwargs)
+
+    def delete(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', endpoint, **kwargs)
+
+    def test_connectivity(self) -> bool:
+        """Determine if cluster is reachable and measure the latency of the probe."""
         logger = logging.getLogger(__name__)
         logger.info(f'Connectivity test: {self.name}.')
+        self.is_reachable = False
+        self.latency = None
+        started = time.monotonic()
         try:
-            response = requests.get(**self._get_connection_details('/process-groups/root'))
+            response = self.get('/process-groups/root')
+            self.latency = time.monotonic() - started
             logger.debug(response.text)
             if response.status_code == 200:
                 self.is_reachable = True
                 self.root_process_group_id = response.json()['id']
-                logger.info(f'found process group id: {self.root_process_group_id}')
+                logger.info(f'found process group id: {self.root_process_group_id}, latency: {self.latency * 1000:.0f} ms')
             else:
                 logger.warn(f'Connection issues with {self.name}: {response.text}')
 
         except requests.exceptions.RequestException as exception:
             logger.warning(exception)
-            logger.info(f'Unable to reach {self.name}, will try again later.')
-            self.is_reachable = False
+            logger.info(f'Unable to reach {self.name} after {time.monotonic() - started:.1f} s, will try again later.')
+
+        return self.is_reachable
+
+
+def _body_size(body) -> int:
+    if body is None:
+        return 0
+    return len(body) if isinstance(body, (bytes, str)) else 0
@@ -0,0 +1,238 @@
+import logging
+
+registries_phase = 'registries'
+users_phase = 'users'
+user_groups_phase = 'user_groups'
+global_policies_phase = 'global_policies'
+parameter_contexts_phase = 'parameter_contexts'
+projects_phase = 'projects'
+component_policies_phase = 'component_policies'
+
+all_phases = [
+    registries_phase,
+    users_phase,
+    user_groups_phase,
+    global_policies_phase,
+    parameter_contexts_phase,
+    projects_phase,
+    component_policies_phase
+]
+
+
+class ClusterPlan:
+    """Phases of a cluster that need to run, and the parameter contexts and projects they are limited to.
+
+    A scope of None covers every resource, otherwise it holds the lower cased names of the resources to
+    create, update or delete.
+    """
+
+    def __init__(self, phases: set = None, parameter_context_scope: set = None, project_scope: set = None):
+        self.phases = set(all_phases) if phases is None else phases
+        self.parameter_context_scope = parameter_context_scope
+        self.project_scope = project_scope
+
+    def includes(self, phase: str) -> bool:
+        return phase in self.phases
+
+    def add_scope(self, phase: str, names: set):
+        """Add the phase limited to the named resources, a phase that already covers every resource stays that way."""
+        if phase == parameter_contexts_phase:
+            if not (phase in self.phases):
+                self.parameter_context_scope = set()
+            if not (self.parameter_context_scope is None):
+                self.parameter_context_scope |= names
+        if phase == projects_phase:
+            if not (phase in self.phases):
+                self.project_scope = set()
+            if not (self.project_scope is None):
+                self.project_scope |= names
+        self.phases.add(phase)
+
+    def __repr__(self):
+        phases = [p for p in all_phases if p in self.phases]
+        return f'phases: {phases}, parameter contexts: {_describe_scope(self.parameter_context_scope)}, projects: {_describe_scope(self.project_scope)}'
+
+
+def plan_clusters(applied_configurations: dict, configuration) -> dict:
+    """Return the plan of every affected cluster, each against the configuration that was last applied to it.
+
+    :param applied_configurations:
+        Dictionary of cluster name to the configuration last fully applied to the cluster, None when unknown.
+    :param configuration:
+        Configuration to apply.
+    :returns:
+        Dictionary of cluster name to ClusterPlan, clusters without changes are left out.
+    """
+    plans = {}
+    for previous_configuration, cluster_names in by_applied_configuration(applied_configurations, [c.name for c in configuration.clusters]):
+        plans.update(plan(previous_configuration, configuration, cluster_names))
+    return plans
+
+
+def by_applied_configuration(applied_configurations: dict, cluster_names: list) -> list:
+    """Group the clusters by the configuration last applied to them, returns a list of configuration and cluster names."""
+    groups = {}
+    for name in cluster_names:
+        applied_configuration = applied_configurations.get(name, None)
+        groups.setdefault(id(applied_configuration), (applied_configuration, []))[1].append(name)
+    return list(groups.values())
+
+
+def plan(previous_configuration, configuration, cluster_names: list = None) -> dict:
+    """Return the plan of every cluster that is affected by the changes between two configurations.
+
+    :param previous_configuration:
+        Configuration that was last applied to the clusters, None when unknown.
+    :param configuration:
+        Configuration to apply.
+    :param cluster_names:
+        Names of the clusters to plan, None for every cluster of the configuration.
+    :returns:
+        Dictionary of cluster name to ClusterPlan, clusters without changes are left out.
+    """
+    logger = logging.getLogger(__name__)
+
+    cluster_names = [c.name for c in configuration.clusters if cluster_names is None or c.name in cluster_names]
+    if (
+        previous_configuration is None
+        or previous_configuration.definition is None
+        or configuration.definition is None
+    ):
+        return {name: ClusterPlan() for name in cluster_names}
+
+    previous_definition = previous_configuration.definition
+    definition = configuration.definition
+
+    previous_security = _section(previous_definition, 'security', {})
+    security = _section(definition, 'security', {})
+
+    # registries, and whether security is coordinated at all, affect every phase of every cluster
+    if (
+        _by_name(_section(previous_definition, 'registries', [])) != _by_name(_section(definition, 'registries', []))
+        or previous_security.get('is_coordinated', False) != security.get('is_coordinated', False)
+    ):
+        return {name: ClusterPlan() for name in cluster_names}
+
+    plans = {name: ClusterPlan(set()) for name in cluster_names}
+
+    # a changed cluster entry may point at another host or use other credentials
+    previous_clusters = _clusters_by_name(previous_definition)
+    for name, cluster in _clusters_by_name(definition).items():
+        if name in plans and previous_clusters.get(name, None) != cluster:
+            plans[name] = ClusterPlan()
+
+    if security.get('is_coordinated', False):
+        changed_security_sections = {
+            k for k in set(previous_security.keys()) | set(security.keys()) if previous_security.get(k, None) != security.get(k, None)
+        }
+        security_phases = set()
+        if 'users' in changed_security_sections or 'user_groups' in changed_security_sections:
+            security_phases |= {users_phase, user_groups_phase, global_policies_phase, component_policies_phase}
+        if 'global_access_policies' in changed_security_sections:
+            security_phases |= {global_policies_phase}
+        if 'component_access_policies' in changed_security_sections:
+            security_phases |= {component_policies_phase}
+        for cluster_plan in plans.values():
+            cluster_plan.phases |= security_phases
+
+    changed_parameter_contexts = _changed_names(
+        _section(previous_definition, 'parameter_contexts', []), _section(definition, 'parameter_contexts', []))
+    if len(changed_parameter_contexts) > 0:
+        for cluster_plan in plans.values():
+            cluster_plan.add_scope(parameter_contexts_phase, changed_parameter_contexts)
+
+    policy_project_names = set()
+    if security.get('is_coordinated', False):
+        policy_project_names = _component_policy_project_names(_section(security, 'component_access_policies', []))
+
+    plans_by_cluster_key = {name.lower(): cluster_plan for name, cluster_plan in plans.items()}
+    previous_projects = _by_name(_section(previous_definition, 'projects', []))
+    projects = _by_name(_section(definition, 'projects', []))
+    for name in _changed_names(previous_projects.values(), projects.values()):
+        previous_environments = _environment_names(previous_projects.get(name, None))
+        environments = _environment_names(projects.get(name, None))
+        # only the clusters the project was or is deployed to are affected
+        for cluster_key in _project_cluster_keys(previous_projects.get(name, None)) | _project_cluster_keys(projects.get(name, None)):
+            if not (cluster_key in plans_by_cluster_key):
+                continue
+            plans_by_cluster_key[cluster_key].add_scope(projects_phase, {name})
+            # added, removed or renamed environments get new process groups, the component policies that point at their project are applied again
+            if name in policy_project_names and previous_environments.get(cluster_key, set()) != environments.get(cluster_key, set()):
+                plans_by_cluster_key[cluster_key].phases.add(component_policies_phase)
+
+    for cluster_plan in plans.values():
+        add_required_phases(cluster_plan)
+
+    plans = {name: cluster_plan for name, cluster_plan in plans.items() if len(cluster_plan.phases) > 0}
+    for name, cluster_plan in plans.items():
+        logger.info(f'Changes for cluster: {name}, {cluster_plan}')
+    return plans
+
+
+def add_required_phases(cluster_plan: ClusterPlan):
+    """Add the phases that resolve the ids the planned phases rely on."""
+    # component policies point at the process groups of every project and environment
+    if cluster_plan.includes(component_policies_phase):
+        cluster_plan.phases.add(projects_phase)
+        cluster_plan.project_scope = None
+
+    # projects need the registry clients and the ids of the parameter contexts they bind to
+    if cluster_plan.includes(projects_phase):
+        cluster_plan.phases.add(registries_phase)
+        cluster_plan.add_scope(parameter_contexts_phase, set())
+
+    # policies are granted to users and groups by id
+    if cluster_plan.includes(global_policies_phase) or cluster_plan.includes(component_policies_phase):
+        cluster_plan.phases |= {users_phase, user_groups_phase}
+
+
+def _section(definition: dict, key: str, default):
+    value = definition[key] if key in definition else None
+    return default if value is None else value
+
+
+def _by_name(entries) -> dict:
+    return {str(e['name']).lower(): e for e in entries}
+
+
+def _changed_names(previous_entries, entries) -> set:
+    previous_by_name = _by_name(previous_entries)
+    by_name = _by_name(entries)
+    return {k for k in set(previous_by_name.keys()) | set(by_name.keys()) if previous_by_name.get(k, None) != by_name.get(k, None)}
+
+
+def _clusters_by_name(definition: dict) -> dict:
+    cluster_defaults = _section(definition, 'cluster_defaults', {})
+    return {c['name']: {**cluster_defaults, **c} for c in _section(definition, 'clusters', [])}
+
+
+def _project_cluster_keys(project_definition) -> set:
+    if project_definition is None:
+        return set()
+    return {str(c['cluster_name']).lower() for c in _section(project_definition, 'clusters', [])}
+
+
+def _environment_names(project_definition) -> dict:
+    """Return the lower cased names of the environments of the project per lower cased cluster name."""
+    if project_definition is None:
+        return {}
+    return {
+        str(c['cluster_name']).lower(): {str(e['name']).lower() for e in _section(c, 'environments', [])}
+        for c in _section(project_definition, 'clusters', [])
+    }
+
+
+def _component_policy_project_names(component_access_policies: list) -> set:
+    """Return the lower cased names of the projects the project and environment policies point at."""
+    names = set()
+    for policy in component_access_policies:
+        component_type = str(policy.get('component_type', '')).lower()
+        if component_type == 'project':
+            names.add(str(policy.get('component_name', '')).lower())
+        elif component_type == 'environment':
+            names.add(str(policy.get('component_name', '')).split(':')[0].lower())
+    return names
+
+
+def _describe_scope(scope: set) -> str:
+    return 'all' if scope is None else str(len(scope))
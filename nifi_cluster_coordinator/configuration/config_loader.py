@@ -1,19 +1,54 @@
 import yaml
+import hashlib
+import json
 import logging
 import os
 import glob
+import threading
 import hiyapyco
 from .cluster import Cluster
+from .cluster import default_connection_pool_size, default_connect_timeout, default_read_timeout
+from .cluster import default_max_parallel_access_policies, default_max_parallel_environment_upgrades, default_max_parallel_parameter_contexts
+from .cluster import default_max_parallel_projects
+from .cluster import default_circuit_breaker_failures, default_circuit_breaker_cooldown, default_circuit_breaker_slow_call, default_adaptive_timeouts
 from .registry import Registry
 from .project import Project
 from .parameter_context import ParameterContext
 from .security import Security
+import utils.phase_profiler as phase_profiler
+
+# Name of the phase that reads and parses the configuration when profiling.
+load_configuration_phase = 'load_configuration'
+
+# the configuration loaded last, the clusters of a reload carry on with its circuit breakers, latencies and connections
+_loaded_configuration = None
+_loaded_configuration_lock = threading.Lock()
 
 
 class Configuration:
 
-    def __init__(self, clusters: dict, registries: dict, projects: dict, parameter_contexts: dict, security: dict):
-        self.clusters = [Cluster(name=c['name'], host_name=c['host_name'], security=c['security']) for c in clusters]
+    def __init__(self, clusters: dict, registries: dict, projects: dict, parameter_contexts: dict, security: dict, cluster_defaults: dict = None):
+        # Cluster level settings fall back to the cluster_defaults section, then to the built-in defaults.
+        cluster_defaults = cluster_defaults if not (cluster_defaults is None) else {}
+        clusters = [{**cluster_defaults, **c} for c in clusters]
+        self.clusters = [
+            Cluster(
+                name=c['name'],
+                host_name=c['host_name'],
+                security=c['security'],
+                connection_pool_size=c['connection_pool_size'] if 'connection_pool_size' in c else default_connection_pool_size,
+                connect_timeout=c['connect_timeout'] if 'connect_timeout' in c else default_connect_timeout,
+                read_timeout=c['read_timeout'] if 'read_timeout' in c else default_read_timeout,
+                max_parallel_access_policies=c['max_parallel_access_policies'] if 'max_parallel_access_policies' in c else default_max_parallel_access_policies,
+                max_parallel_environment_upgrades=c['max_parallel_environment_upgrades'] if 'max_parallel_environment_upgrades' in c else default_max_parallel_environment_upgrades,
+                max_parallel_parameter_contexts=c['max_parallel_parameter_contexts'] if 'max_parallel_parameter_contexts' in c else default_max_parallel_parameter_contexts,
+                max_parallel_projects=c['max_parallel_projects'] if 'max_parallel_projects' in c else default_max_parallel_projects,
+                circuit_breaker_failures=c['circuit_breaker_failures'] if 'circuit_breaker_failures' in c else default_circuit_breaker_failures,
+                circuit_breaker_cooldown=c['circuit_breaker_cooldown'] if 'circuit_breaker_cooldown' in c else default_circuit_breaker_cooldown,
+                circuit_breaker_slow_call=c['circuit_breaker_slow_call'] if 'circuit_breaker_slow_call' in c else default_circuit_breaker_slow_call,
+                adaptive_timeouts=c['adaptive_timeouts'] if 'adaptive_timeouts' in c else default_adaptive_timeouts)
+            for c in clusters
+        ]
         self.registries = [Registry(name=r['name'], uri=r['host_name'], description=r['description']) for r in registries]
         self.projects = [
             Project(
@@ -37,6 +72,10 @@ class Configuration:
 
         self.security = Security(security) if not (security is None) else Security({'is_coordinated': False})
 
+        # the parsed definition and its digest, set by the loader
+        self.definition = None
+        self.digest = None
+
 
 def load_from_file(config_file_location: str) -> Configuration:
     """Return a configuration based on a file location.
@@ -48,10 +87,11 @@ def load_from_file(config_file_location: str) -> Configuration:
     """
     logger = logging.getLogger(__name__)
     logger.info(f'Attempting to load config file from {config_file_location}')
-    stream = open(config_file_location, 'r')
-    configuration = _build_configuration(yaml.safe_load(stream))
+    with phase_profiler.phase(None, load_configuration_phase):
+        stream = open(config_file_location, 'r')
+        configuration = _build_configuration(yaml.safe_load(stream))
     logger.info(f'Loaded configuration for {configuration.clusters.__len__()} clusters.')
-    return configuration
+    return _take_over_clusters(configuration)
 
 
 def _build_configuration(config_definition) -> Configuration:
@@ -62,12 +102,29 @@ def _build_configuration(config_definition) -> Configuration:
             config_definition['registries'],
             config_definition['projects'] if 'projects' in config_definition else None,
             config_definition['parameter_contexts'] if 'parameter_contexts' in config_definition else None,
-            config_definition['security'] if 'security' in config_definition else None)
+            config_definition['security'] if 'security' in config_definition else None,
+            config_definition['cluster_defaults'] if 'cluster_defaults' in config_definition else None)
+        config.definition = config_definition
+        config.digest = definition_digest(config_definition)
         return config
     except Exception as e:
         logging.critical(f'Error parsing configuration file: {e}')
 
 
+def definition_digest(config_definition) -> str:
+    """Return a digest of the parsed configuration, formatting, comments and key order do not change it."""
+    return hashlib.sha256(json.dumps(config_definition, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def file_digest(file_location: str) -> str:
+    """Return a digest of the file content, None if the file can not be read."""
+    try:
+        with open(file_location, 'rb') as stream:
+            return hashlib.sha256(stream.read()).hexdigest()
+    except OSError:
+        return None
+
+
 def load_from_folder(config_folder_location: str) -> Configuration:
     """Return a configuration based on a folder location.
 
@@ -90,7 +147,26 @@ def load_from_folder(config_folder_location: str) -> Configuration:
     for file in files:
         logger.info(f'Found file {file}')
 
-    # Forcing INFO level logging here, debug will print file contents which might leak secrets
-    conf = hiyapyco.load(list(files), method=hiyapyco.METHOD_MERGE, mergelists=False, loglevel='INFO')
-    configuration = _build_configuration(yaml.safe_load(hiyapyco.dump(conf)))
+    with phase_profiler.phase(None, load_configuration_phase):
+        # Forcing INFO level logging here, debug will print file contents which might leak secrets
+        conf = hiyapyco.load(list(files), method=hiyapyco.METHOD_MERGE, mergelists=False, loglevel='INFO')
+        configuration = _build_configuration(yaml.safe_load(hiyapyco.dump(conf)))
+    return _take_over_clusters(configuration)
+
+
+def _take_over_clusters(configuration: Configuration) -> Configuration:
+    """Hand the state of the clusters of the configuration loaded last to the clusters of the same name."""
+    global _loaded_configuration
+    if configuration is None:
+        return configuration
+
+    with _loaded_configuration_lock:
+        previous_clusters = {} if _loaded_configuration is None else {c.name: c for c in _loaded_configuration.clusters}
+        for cluster in configuration.clusters:
+            if cluster.name in previous_clusters:
+                cluster.take_over(previous_clusters.pop(cluster.name))
+        # clusters that were removed from the configuration keep no connections open
+        for previous_cluster in previous_clusters.values():
+            previous_cluster.close()
+        _loaded_configuration = configuration
     return configuration
\ No newline at end of file
@@ -1,13 +1,24 @@
 import logging
+import glob
 import time
 import worker
+from reconcile_queue import ReconcileQueue
 from watchdog.observers import Observer
 from watchdog.events import PatternMatchingEventHandler
 from os import path
 from configuration import config_loader
+from configuration import config_diff
+from configuration.config_diff import ClusterPlan
 
 logger = logging.getLogger(__name__)
 
+max_parallel_clusters = 1
+
+reconcile_queue = None
+
+# content digest of every watched file, events that leave the content untouched are ignored
+_file_digests = {}
+
 
 def _on_created(event):
     logger.critical(f'{event.src_path} was created.  This should not happen.')
@@ -19,19 +30,45 @@ def _on_deleted(event):
     raise Exception
 
 
-def _on_modifiedfile(event):
+def _on_modified(event):
     logger.debug(event)
-    logger.info(f'{event.src_path} was modified.  Processing changes.')
-    configuration = config_loader.load_from_file(event.src_path)
-    worker.process(configuration)
+    digest = config_loader.file_digest(event.src_path)
+    if not (digest is None) and _file_digests.get(event.src_path, None) == digest:
+        logger.debug(f'{event.src_path} content did not change.  Ignoring event.')
+        return
+    _file_digests[event.src_path] = digest
 
+    logger.info(f'{event.src_path} was modified.  Queueing changes.')
+    reconcile_queue.submit(event.src_path)
+
+
+def _reconcile(configuration, cancel_event, applied_configurations: dict) -> dict:
+    # only the clusters, phases and resources touched since the configuration last applied to a cluster are reconciled
+    plans = config_diff.plan_clusters(applied_configurations, configuration)
+    return worker.process_clusters(configuration, max_parallel_clusters, cancel_event, plans)
+
+
+def _resync(applied_configurations: dict, cancel_event) -> dict:
+    results = {}
+    for configuration, cluster_names in config_diff.by_applied_configuration(applied_configurations, list(applied_configurations.keys())):
+        results.update(worker.resync(configuration, max_parallel_clusters, cancel_event, cluster_names))
+    return results
+
+
+def _reconcile_clusters(configuration, cancel_event, cluster_names: list) -> dict:
+    return worker.process_clusters(configuration, max_parallel_clusters, cancel_event, {name: ClusterPlan() for name in cluster_names})
 
-def _on_modifiedfolder(event):
-    logger.debug(event)
-    logger.info(f'{event.src_path} was modified.  Processing changes.')
-    directory = path.dirname(event.src_path)
-    configuration = config_loader.load_from_folder(directory)
-    worker.process(configuration)
+
+def on_cluster_recovered(cluster, configuration) -> bool:
+    """Queue a reconcile of a cluster that is reachable again, returns False while nothing is watched yet."""
+    if reconcile_queue is None:
+        return False
+    return reconcile_queue.submit_cluster(cluster.name, configuration)
+
+
+def _record_file_digests(files: list):
+    for file in files:
+        _file_digests[file] = config_loader.file_digest(file)
 
 
 def _on_moved(event):
@@ -39,7 +76,17 @@ def _on_moved(event):
     raise Exception
 
 
-def watch_configurationfile(config_file: str):
+def watch_configurationfile(
+    config_file: str,
+    parallel_clusters: int = 1,
+    debounce_seconds: float = 2,
+    applied_configurations: dict = None,
+    resync_interval: float = None
+):
+    global max_parallel_clusters, reconcile_queue
+    max_parallel_clusters = parallel_clusters
+    reconcile_queue = ReconcileQueue(
+        lambda: config_loader.load_from_file(config_file), _reconcile, debounce_seconds, applied_configurations, _resync, resync_interval, _reconcile_clusters)
     directory = path.dirname(config_file)
     logger.debug(f'Directory: {directory}')
     filename = path.basename(config_file)
@@ -53,14 +100,25 @@ def watch_configurationfile(config_file: str):
     )
     event_handler.on_created = _on_created
     event_handler.on_deleted = _on_deleted
-    event_handler.on_modified = _on_modifiedfile
+    event_handler.on_modified = _on_modified
     event_handler.on_moved = _on_moved
+    _record_file_digests(glob.glob(path.join(directory, f'*{filename}')))
     logger.info(f'Starting to watch {config_file}')
     _start_observer(event_handler, directory)
 
 
-def watch_configurationfolder(config_folder: str):
+def watch_configurationfolder(
+    config_folder: str,
+    parallel_clusters: int = 1,
+    debounce_seconds: float = 2,
+    applied_configurations: dict = None,
+    resync_interval: float = None
+):
+    global max_parallel_clusters, reconcile_queue
+    max_parallel_clusters = parallel_clusters
     directory = path.normpath(config_folder)
+    reconcile_queue = ReconcileQueue(
+        lambda: config_loader.load_from_folder(directory), _reconcile, debounce_seconds, applied_configurations, _resync, resync_interval, _reconcile_clusters)
     logger.debug(f'Directory: {directory}')
 
     event_handler = PatternMatchingEventHandler(
@@ -71,13 +129,30 @@ def watch_configurationfolder(config_folder: str):
     )
     event_handler.on_created = _on_created
     event_handler.on_deleted = _on_deleted
-    event_handler.on_modified = _on_modifiedfolder
+    event_handler.on_modified = _on_modified
     event_handler.on_moved = _on_moved
+    _record_file_digests(glob.glob(path.join(directory, '*.yaml')) + glob.glob(path.join(directory, '*.yml')))
     logger.info(f'Starting to watch {config_folder}')
     _start_observer(event_handler, directory)
 
 
+def resync_configuration(load_configuration, parallel_clusters: int, resync_interval: float, applied_configurations: dict = None):
+    """Keep enforcing the configuration on the clusters without watching the configuration for changes."""
+    global max_parallel_clusters, reconcile_queue
+    max_parallel_clusters = parallel_clusters
+    reconcile_queue = ReconcileQueue(load_configuration, _reconcile, 0, applied_configurations, _resync, resync_interval, _reconcile_clusters)
+    reconcile_queue.start()
+    logger.info(f'Checking clusters for drift every {resync_interval} seconds')
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        reconcile_queue.stop()
+
+
 def _start_observer(event_handler, directory):
+    reconcile_queue.start()
     observer = Observer()
     observer.schedule(event_handler, directory, recursive=False)
     observer.start()
@@ -87,4 +162,5 @@ def _start_observer(event_handler, directory):
             time.sleep(1)
     except KeyboardInterrupt:
         observer.stop()
-        observer.join()
\ No newline at end of file
+        observer.join()
+        reconcile_queue.stop()
\ No newline at end of file
@@ -42,7 +42,6 @@ class Project:
                 environments=c['environments'] if 'environments' in c else [])
             for c in clusters
         ] if not (clusters is None) else []
-        self.available_versions_dict = None
 
     def get_project_cluster(self, cluster: Cluster) -> ProjectCluster:
         clusters = [c for c in self.clusters if c.name.lower() == cluster.name.lower()]
@@ -1,4 +1,10 @@
 from .certificate_config import CertificateConfig
+import utils.name_helper as name_helper
+
+
+def identity_key(identity: str) -> str:
+    """Return the case-folded key used to match user and user group identities."""
+    return name_helper.name_key(identity)
 
 
 class ClusterSecurity:
@@ -90,6 +96,26 @@ class Security:
             for cap in security['component_access_policies']
         ] if 'component_access_policies' in security and not(security['component_access_policies'] is None) else []
 
+        self.users_by_identity = {}
+        for user in self.users:
+            self.users_by_identity.setdefault(identity_key(user.identity), user)
+
+        self.user_groups_by_identity = {}
+        self.user_group_members = {}
+        for user_group in self.user_groups:
+            self.user_groups_by_identity.setdefault(identity_key(user_group.identity), user_group)
+            self.user_group_members.setdefault(identity_key(user_group.identity), {identity_key(m) for m in user_group.members})
+
+    def find_user(self, identity: str) -> User:
+        return self.users_by_identity.get(identity_key(identity), None)
+
+    def find_user_group(self, identity: str) -> UserGroup:
+        return self.user_groups_by_identity.get(identity_key(identity), None)
+
+    def add_user(self, user: User):
+        self.users.append(user)
+        self.users_by_identity.setdefault(identity_key(user.identity), user)
+
 
 class AccessPolicyDescriptor:
 
@@ -0,0 +1,76 @@
+import threading
+from .security import identity_key
+
+
+class TenantSnapshot:
+    """Users, user groups and the coordinator user of a cluster, fetched once per reconcile.
+
+    The services keep the snapshot current with the entities NiFi returns from create, update and delete calls,
+    so later phases of the same pass never need to download the tenant lists again. Users and user groups are
+    keyed by identity_key, the key the configured identities are matched by.
+    """
+
+    def __init__(self, current_user_identity: str, users_json: list, user_groups_json: list):
+        self.current_user_identity = current_user_identity
+        self.users_json_dict = {identity_key(user['component']['identity']): user for user in users_json}
+        self.user_groups_json_dict = {identity_key(user_group['component']['identity']): user_group for user_group in user_groups_json}
+        self.current_user_json = None
+        self._lock = threading.RLock()
+
+        current_users_json = [
+            u for u in users_json
+            if identity_key(u['component']['identity']) == identity_key(current_user_identity)
+        ]
+        if len(current_users_json) > 0:
+            self.current_user_json = current_users_json[0]
+
+    def set_user(self, user_json):
+        with self._lock:
+            key = identity_key(user_json['component']['identity'])
+            if key == identity_key(self.current_user_identity):
+                # keep the access policies the coordinator user already holds when NiFi does not return them
+                if not (self.current_user_json is None) and not ('accessPolicies' in user_json['component']):
+                    user_json['component']['accessPolicies'] = self.current_user_json['component'].get('accessPolicies', [])
+                self.current_user_json = user_json
+            self.users_json_dict[key] = user_json
+
+    def remove_user(self, identity: str):
+        with self._lock:
+            self.users_json_dict.pop(identity_key(identity), None)
+
+    def set_user_group(self, user_group_json):
+        with self._lock:
+            self.user_groups_json_dict[identity_key(user_group_json['component']['identity'])] = user_group_json
+
+    def remove_user_group(self, identity: str):
+        with self._lock:
+            self.user_groups_json_dict.pop(identity_key(identity), None)
+
+    def record_access_policy(self, access_policy_json):
+        """Refresh the coordinator user's embedded policies from a created or updated access policy."""
+        with self._lock:
+            if self.current_user_json is None:
+                return
+
+            self.forget_access_policy(access_policy_json['id'])
+            if len([u for u in access_policy_json['component'].get('users', []) if u['id'] == self.current_user_json['id']]) > 0:
+                self.current_user_json['component'].setdefault('accessPolicies', []).append({
+                    'id': access_policy_json['id'],
+                    'revision': access_policy_json['revision'],
+                    'component': {
+                        'id': access_policy_json['id'],
+                        'resource': access_policy_json['component']['resource'],
+                        'action': access_policy_json['component']['action']
+                    }
+                })
+
+    def forget_access_policy(self, access_policy_id: str):
+        """Drop a deleted access policy from the coordinator user's embedded policies."""
+        with self._lock:
+            if self.current_user_json is None:
+                return
+
+            self.current_user_json['component']['accessPolicies'] = [
+                p for p in self.current_user_json['component'].get('accessPolicies', [])
+                if p['id'] != access_policy_id
+            ]
@@ -1,7 +1,15 @@
 import logging
+import os
 import coloredlogs
 import argparse
 import worker
+import cluster_prober
+import metrics_exporter
+import services.flow_version_cache as flow_version_cache
+import services.sensitive_parameter_store as sensitive_parameter_store
+import services.drift_service as drift_service
+import utils.http_metrics as http_metrics
+import utils.phase_profiler as phase_profiler
 from configuration import config_watcher
 from configuration import config_loader
 
@@ -12,6 +20,19 @@ def main(args):
     if args.configfile is not None and args.configfolder is not None:
         raise ValueError('Please specify either a single config file or a folder, not both.')
 
+    # loading a folder changes the working directory, reloads and files written later on need absolute paths
+    if args.configfile is not None:
+        args.configfile = os.path.abspath(args.configfile)
+    if args.configfolder is not None:
+        args.configfolder = os.path.abspath(args.configfolder)
+    if args.sensitive_parameter_store is not None:
+        args.sensitive_parameter_store = os.path.abspath(args.sensitive_parameter_store)
+    if args.http_metrics_file is not None:
+        args.http_metrics_file = os.path.abspath(args.http_metrics_file)
+
+    # set up before the first load so loading the configuration is profiled as well
+    phase_profiler.init_phase_profiler(args.profile)
+
     if args.configfile is not None:
         try:
             configuration = config_loader.load_from_file(args.configfile)
@@ -26,13 +47,32 @@ def main(args):
             logger.critical(f'Error loading configuration: {exception}')
             raise
 
-    worker.process(configuration)
+    flow_version_cache.init_flow_version_cache(args.flow_version_cache_ttl)
+    sensitive_parameter_store.init_sensitive_parameter_store(args.sensitive_parameter_store)
+    drift_service.init_drift_detection(args.resync_interval > 0)
+    http_metrics.init_http_metrics(args.http_metrics_file)
+    if args.metrics_port is not None:
+        metrics_exporter.init_metrics_exporter(args.metrics_port)
+    if args.watch or args.resync_interval > 0:
+        cluster_prober.init_cluster_prober(config_watcher.on_cluster_recovered)
+    # later changes are planned per cluster against the configuration the cluster was last fully reconciled with
+    applied_configurations = {
+        name: configuration if reconciled else None for name, reconciled in worker.process_clusters(configuration, args.max_parallel_clusters).items()
+    }
 
     if args.watch and args.configfile is not None:
-        config_watcher.watch_configurationfile(args.configfile)
+        config_watcher.watch_configurationfile(args.configfile, args.max_parallel_clusters, args.debounce_seconds, applied_configurations, args.resync_interval)
 
     if args.watch and args.configfolder is not None:
-        config_watcher.watch_configurationfolder(args.configfolder)
+        config_watcher.watch_configurationfolder(args.configfolder, args.max_parallel_clusters, args.debounce_seconds, applied_configurations, args.resync_interval)
+
+    if not args.watch and args.resync_interval > 0:
+        if args.configfile is not None:
+            config_watcher.resync_configuration(
+                lambda: config_loader.load_from_file(args.configfile), args.max_parallel_clusters, args.resync_interval, applied_configurations)
+        else:
+            config_watcher.resync_configuration(
+                lambda: config_loader.load_from_folder(args.configfolder), args.max_parallel_clusters, args.resync_interval, applied_configurations)
 
 
 if __name__ == '__main__':
@@ -54,12 +94,55 @@ if __name__ == '__main__':
         '--configfolder',
         help='Set the folder to watch for config files.',
         required=False)
+    parser.add_argument(
+        '--resync-interval',
+        help='Set how many seconds to wait between checks of the clusters for drift, default is 0 which never checks.',
+        type=float,
+        default=0,
+        required=False)
+    parser.add_argument(
+        '--debounce-seconds',
+        help='Set how many quiet seconds to wait after a configuration change before reconciling, default is 2.',
+        type=float,
+        default=2,
+        required=False)
+    parser.add_argument(
+        '--max-parallel-clusters',
+        help='Set how many clusters are reconciled at the same time, default is 1.',
+        type=int,
+        default=1,
+        required=False)
+    parser.add_argument(
+        '--flow-version-cache-ttl',
+        help='Set how many seconds registry flow versions are reused across clusters and reconciles, default is 300.',
+        type=float,
+        default=300,
+        required=False)
+    parser.add_argument(
+        '--sensitive-parameter-store',
+        help='Set the file that remembers which sensitive parameter values were applied, by default they are only remembered until the coordinator stops.',
+        required=False)
+    parser.add_argument(
+        '--http-metrics-file',
+        help='Set the file the API call metrics of every reconcile are written to as JSON, by default they are only logged.',
+        required=False)
+    parser.add_argument(
+        '--metrics-port',
+        help='Serve Prometheus metrics on this port at /metrics, by default no metrics are served.',
+        type=int,
+        required=False)
+    parser.add_argument(
+        '--profile',
+        help='Profile every phase and write a profile dump per phase to this folder, default folder is profiles.',
+        nargs='?',
+        const='profiles',
+        required=False)
     args = parser.parse_args()
 
     coloredlogs.install(
         level=args.loglevel,
         milliseconds=True,
-        fmt='%(asctime)s %(hostname)s %(name)s %(levelname)s: %(funcName)s[%(lineno)s] %(message)s')
+        fmt='%(asctime)s %(hostname)s %(name)s %(levelname)s: [%(threadName)s] %(funcName)s[%(lineno)s] %(message)s')
     logger = logging.getLogger(__name__)
 
     logger.debug('Starting program')
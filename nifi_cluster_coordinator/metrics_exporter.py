@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import utils.http_metrics as http_metrics
+
+# Successful calls that change a resource in NiFi, by method and endpoint template.
+resource_changes = {
+    ('POST', '/controller/registry-clients'): ('registry_client', 'created'),
+    ('PUT', '/controller/registry-clients/{id}'): ('registry_client', 'updated'),
+    ('DELETE', '/controller/registry-clients/{id}'): ('registry_client', 'deleted'),
+    ('POST', '/tenants/users'): ('user', 'created'),
+    ('DELETE', '/tenants/users/{id}'): ('user', 'deleted'),
+    ('POST', '/tenants/user-groups'): ('user_group', 'created'),
+    ('PUT', '/tenants/user-groups/{id}'): ('user_group', 'updated'),
+    ('DELETE', '/tenants/user-groups/{id}'): ('user_group', 'deleted'),
+    ('POST', '/policies'): ('access_policy', 'created'),
+    ('PUT', '/policies/{id}'): ('access_policy', 'updated'),
+    ('DELETE', '/policies/{id}'): ('access_policy', 'deleted'),
+    ('POST', '/parameter-contexts'): ('parameter_context', 'created'),
+    ('POST', '/parameter-contexts/{id}/update-requests'): ('parameter_context', 'updated'),
+    ('DELETE', '/parameter-contexts/{id}'): ('parameter_context', 'deleted'),
+    ('POST', '/process-groups/{id}/process-groups'): ('process_group', 'created'),
+    ('PUT', '/process-groups/{id}'): ('process_group', 'updated'),
+    ('DELETE', '/process-groups/{id}'): ('process_group', 'deleted'),
+    ('POST', '/versions/update-requests/process-groups/{id}'): ('process_group_version', 'updated')
+}
+
+# Metrics are only collected once the endpoint is started.
+enabled = False
+
+_lock = threading.Lock()
+_reconciles = {}
+_reconcile_seconds = {}
+_last_success = {}
+_phase_seconds = {}
+_reachable = {}
+_http_recorder = None
+_server = None
+
+
+def init_metrics_exporter(port: int, address: str = '') -> int:
+    """Serve the metrics in the Prometheus text format on /metrics, returns the port the endpoint listens on."""
+    global enabled, _http_recorder, _server
+    logger = logging.getLogger(__name__)
+
+    with _lock:
+        _reconciles.clear()
+        _reconcile_seconds.clear()
+        _last_success.clear()
+        _phase_seconds.clear()
+        _reachable.clear()
+        if _http_recorder is None:
+            _http_recorder = http_metrics.HttpMetrics()
+            http_metrics.add_recorder(_http_recorder)
+        enabled = True
+
+    _server = ThreadingHTTPServer((address, port), _MetricsHandler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+    logger.info(f'Serving metrics on port: {_server.server_address[1]}.')
+    return _server.server_address[1]
+
+
+def shutdown_metrics_exporter():
+    """Stop serving and collecting the metrics."""
+    global enabled, _http_recorder, _server
+    with _lock:
+        enabled = False
+        if not (_http_recorder is None):
+            http_metrics.remove_recorder(_http_recorder)
+            _http_recorder = None
+    if not (_server is None):
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+
+def observe_phase(cluster_name: str, phase: str, seconds: float):
+    if not enabled:
+        return
+    with _lock:
+        _phase_seconds[(cluster_name, phase)] = seconds
+
+
+def observe_reconcile(cluster_name: str, succeeded: bool, seconds: float):
+    if not enabled:
+        return
+    with _lock:
+        result = 'success' if succeeded else 'failure'
+        _reconciles[(cluster_name, result)] = _reconciles.get((cluster_name, result), 0) + 1
+        _reconcile_seconds[cluster_name] = seconds
+        if succeeded:
+            _last_success[cluster_name] = time.time()
+
+
+def set_reachable(cluster_name: str, reachable: bool):
+    if not enabled:
+        return
+    with _lock:
+        _reachable[cluster_name] = reachable
+
+
+def render() -> str:
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        _family(lines, 'nifi_coordinator_reconciles_total', 'counter', 'Reconciles of a cluster by result.', [
+            ({'cluster': cluster_name, 'result': result}, count) for (cluster_name, result), count in sorted(_reconciles.items())
+        ])
+        _family(lines, 'nifi_coordinator_reconcile_duration_seconds', 'gauge', 'Duration of the last reconcile of a cluster.', [
+            ({'cluster': cluster_name}, seconds) for cluster_name, seconds in sorted(_reconcile_seconds.items())
+        ])
+        _family(lines, 'nifi_coordinator_last_success_timestamp_seconds', 'gauge', 'Unix time of the last successful reconcile of a cluster.', [
+            ({'cluster': cluster_name}, timestamp) for cluster_name, timestamp in sorted(_last_success.items())
+        ])
+        _family(lines, 'nifi_coordinator_phase_duration_seconds', 'gauge', 'Duration of the last run of a phase on a cluster.', [
+            ({'cluster': cluster_name, 'phase': phase}, seconds) for (cluster_name, phase), seconds in sorted(_phase_seconds.items())
+        ])
+        _family(lines, 'nifi_coordinator_cluster_reachable', 'gauge', 'Whether the last probe of a cluster reached it.', [
+            ({'cluster': cluster_name}, 1 if reachable else 0) for cluster_name, reachable in sorted(_reachable.items())
+        ])
+        recorder = _http_recorder
+
+    endpoints = [] if recorder is None else recorder.to_json()
+    _family(lines, 'nifi_coordinator_api_calls_total', 'counter', 'API calls by endpoint and status code.', [
+        ({**_endpoint_labels(e), 'status': status}, count) for e in endpoints for status, count in sorted(e['status_codes'].items())
+    ])
+    _family(lines, 'nifi_coordinator_api_errors_total', 'counter', 'API calls answered with status 400 and above or not answered at all.', [
+        (_endpoint_labels(e), e['errors']) for e in endpoints
+    ])
+    _family(lines, 'nifi_coordinator_api_call_duration_seconds', 'histogram', 'Latency of the API calls by endpoint.', [
+        sample for e in endpoints for sample in _histogram_samples(e)
+    ])
+
+    changes = {}
+    for e in endpoints:
+        if (e['method'], e['endpoint']) in resource_changes:
+            resource, action = resource_changes[(e['method'], e['endpoint'])]
+            key = (e['cluster'], resource, action)
+            changes[key] = changes.get(key, 0) + sum(count for status, count in e['status_codes'].items() if status.startswith('2'))
+    _family(lines, 'nifi_coordinator_resource_changes_total', 'counter', 'Resources created, updated or deleted by the coordinator.', [
+        ({'cluster': c, 'resource': resource, 'action': action}, count) for (c, resource, action), count in sorted(changes.items())
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+def _endpoint_labels(endpoint_json) -> dict:
+    return {'cluster': endpoint_json['cluster'], 'method': endpoint_json['method'], 'endpoint': endpoint_json['endpoint']}
+
+
+def _histogram_samples(endpoint_json) -> list:
+    labels = _endpoint_labels(endpoint_json)
+    samples = []
+    cumulative = 0
+    for bound, count in endpoint_json['latency_buckets'].items():
+        cumulative += count
+        samples.append(({**labels, 'le': bound}, cumulative, '_bucket'))
+    samples.append((labels, endpoint_json['seconds'], '_sum'))
+    samples.append((labels, endpoint_json['calls'], '_count'))
+    return samples
+
+
+def _family(lines: list, name: str, metric_type: str, description: str, samples: list):
+    lines.append(f'# HELP {name} {description}')
+    lines.append(f'# TYPE {name} {metric_type}')
+    for sample in samples:
+        labels, value = sample[0], sample[1]
+        suffix = sample[2] if len(sample) > 2 else ''
+        label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        lines.append(f'{name}{suffix}{{{label_text}}} {value}')
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        content = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,186 @@
+import logging
+import threading
+import time
+
+
+class ReconcileQueue:
+    """Coalesces configuration changes and reconciles them one run at a time on a single worker thread.
+
+    Changes that arrive within the quiet window are merged into one run, a change that arrives while a run
+    is in progress cancels that run at its next phase boundary and a new run starts once things are quiet again.
+    With a resync interval, the applied configuration is enforced again whenever no run happened for that long.
+    Clusters that are reachable again are reconciled on their own when no configuration change is waiting.
+
+    The configuration applied is tracked per cluster. A reconcile and a resync return for the name of every
+    cluster they worked on whether it was fully reconciled, a cluster that was not is reconciled in full next time.
+    """
+
+    def __init__(
+        self,
+        load_configuration,
+        reconcile,
+        debounce_seconds: float = 2,
+        applied_configurations: dict = None,
+        resync=None,
+        resync_interval: float = None,
+        reconcile_clusters=None
+    ):
+        self.load_configuration = load_configuration
+        self.reconcile = reconcile
+        self.debounce_seconds = debounce_seconds
+        self.resync = resync
+        self.reconcile_clusters = reconcile_clusters
+        self.resync_interval = resync_interval if not (resync is None) and not (resync_interval is None) and resync_interval > 0 else None
+        # the last configuration each cluster was fully reconciled with, None for clusters that missed a change
+        self.applied_configurations = {} if applied_configurations is None else dict(applied_configurations)
+        self.runs = 0
+        self._condition = threading.Condition()
+        self._pending = []
+        self._pending_clusters = {}
+        self._last_change = None
+        self._last_run = time.monotonic()
+        self._cancel_event = threading.Event()
+        self._stopped = False
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, name='reconcile', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._cancel_event.set()
+            self._condition.notify_all()
+        self._thread.join()
+
+    def submit(self, reason: str):
+        """Queue a reconcile for the change, superseding the run in progress."""
+        logger = logging.getLogger(__name__)
+        with self._condition:
+            self._pending.append(reason)
+            self._last_change = time.monotonic()
+            self._cancel_event.set()
+            logger.debug(f'Change queued: {reason}')
+            self._condition.notify_all()
+
+    def submit_cluster(self, cluster_name: str, configuration) -> bool:
+        """Queue a reconcile of a single cluster with the configuration it missed, returns False if not supported."""
+        if self.reconcile_clusters is None:
+            return False
+        with self._condition:
+            self._pending_clusters[cluster_name] = configuration
+            self._condition.notify_all()
+        return True
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Wait until every queued change has been reconciled, returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while len(self._pending) > 0 or len(self._pending_clusters) > 0 or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not (remaining is None) and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _fully_applied(self) -> bool:
+        return len(self.applied_configurations) > 0 and all(not (c is None) for c in self.applied_configurations.values())
+
+    def _is_applied(self, configuration) -> bool:
+        return (
+            not (configuration.digest is None)
+            and self._fully_applied()
+            and all(c.digest == configuration.digest for c in self.applied_configurations.values()))
+
+    def _record_results(self, configuration, results: dict):
+        applied_configurations = {}
+        for cluster in configuration.clusters:
+            # a cluster the changes did not affect is as up to date as it was before
+            reconciled = results[cluster.name] if cluster.name in results else not (self.applied_configurations.get(cluster.name, None) is None)
+            applied_configurations[cluster.name] = configuration if reconciled else None
+        self.applied_configurations = applied_configurations
+
+    def _next_changes(self):
+        with self._condition:
+            while not self._stopped:
+                if len(self._pending) == 0 and len(self._pending_clusters) > 0:
+                    pending_clusters = self._pending_clusters
+                    self._pending_clusters = {}
+                    self._cancel_event = threading.Event()
+                    self._busy = True
+                    return [], pending_clusters
+
+                if len(self._pending) == 0:
+                    if self.resync_interval is None:
+                        self._condition.wait()
+                        continue
+                    resync_due_in = self._last_run + self.resync_interval - time.monotonic()
+                    if resync_due_in > 0:
+                        self._condition.wait(resync_due_in)
+                        continue
+                    # no changes, the run only checks the clusters for drift
+                    self._cancel_event = threading.Event()
+                    self._busy = True
+                    return [], {}
+
+                # keep waiting while changes keep coming in, one run covers the whole burst
+                quiet_for = time.monotonic() - self._last_change
+                if quiet_for < self.debounce_seconds:
+                    self._condition.wait(self.debounce_seconds - quiet_for)
+                    continue
+
+                # the change reconciles every cluster that missed the applied configuration as well
+                changes = self._pending
+                self._pending = []
+                self._pending_clusters = {}
+                self._cancel_event = threading.Event()
+                self._busy = True
+                return changes, {}
+        return None, None
+
+    def _run(self):
+        logger = logging.getLogger(__name__)
+        while True:
+            changes, pending_clusters = self._next_changes()
+            if changes is None:
+                return
+
+            try:
+                if len(pending_clusters) > 0:
+                    for cluster_name, configuration in pending_clusters.items():
+                        logger.info(f'Reconciling cluster: {cluster_name}, that is reachable again.')
+                        reconciled = self.reconcile_clusters(configuration, self._cancel_event, [cluster_name]).get(cluster_name, False)
+                        self.applied_configurations[cluster_name] = configuration if reconciled else None
+                    continue
+
+                if len(changes) == 0 and self._fully_applied():
+                    logger.info('Checking clusters for drift.')
+                    for cluster_name, reconciled in self.resync(self.applied_configurations, self._cancel_event).items():
+                        if not reconciled:
+                            self.applied_configurations[cluster_name] = None
+                    continue
+
+                if len(changes) == 0:
+                    logger.info('Last reconcile did not complete on every cluster, reconciling again.')
+                else:
+                    logger.info(f'Processing {len(changes)} configuration change(s): {", ".join(sorted(set(changes)))}.')
+                configuration = self.load_configuration()
+                if configuration is None:
+                    logger.warning('Unable to load the configuration, waiting for the next change.')
+                elif self._is_applied(configuration):
+                    logger.info('Configuration did not change since it was last applied, nothing to reconcile.')
+                else:
+                    self.runs += 1
+                    self._record_results(configuration, self.reconcile(configuration, self._cancel_event, dict(self.applied_configurations)))
+            except Exception as exception:
+                logger.warning('Unable to process configuration changes, waiting for the next change.')
+                logger.warning(exception)
+            finally:
+                with self._condition:
+                    self._last_run = time.monotonic()
+                    self._busy = False
+                    self._condition.notify_all()
+
+            if self._cancel_event.is_set() and not self._stopped:
+                logger.info('Configuration changed during the reconcile, starting over with the latest configuration.')
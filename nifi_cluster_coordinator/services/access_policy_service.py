@@ -1,8 +1,10 @@
 import logging
 import requests
 import utils.url_helper as url_helper
+import utils.concurrency_helper as concurrency_helper
+import services.tenant_service as tenant_service
 from configuration.cluster import Cluster
-from configuration.security import AccessPolicyDescriptor, ComponentAccessPolicy, GlobalAccessPolicy, Security
+from configuration.security import AccessPolicyDescriptor, ComponentAccessPolicy, GlobalAccessPolicy, Security, identity_key
 
 
 def init_access_policies_descriptors():
@@ -53,6 +55,7 @@ def sync_global_policies(cluster: Cluster, security: Security):
     current_user_json = _get_current_user_json(cluster)
 
     # sync global policies
+    global_policies = []
     for access_policy_descriptor in global_access_policies_descriptors:
         configured_access_policies = [
             a for a in security.global_access_policies
@@ -68,74 +71,88 @@ def sync_global_policies(cluster: Cluster, security: Security):
                         action=access_policy_descriptor.action,
                         users=[current_user_json['component']['identity']],
                         user_groups=[]))
-            elif len([u for u in configured_access_policies[0].users if u.lower() == current_user_json['component']['identity'].lower()]) == 0:
+            elif identity_key(current_user_json['component']['identity']) not in {identity_key(u) for u in configured_access_policies[0].users}:
                 configured_access_policies[0].users.append(current_user_json['component']['identity'])
 
-        access_policy_json = _get_access_policy_json(cluster, access_policy_descriptor, None)
-        if (
-            not (access_policy_json is None)
-            and '/' + access_policy_descriptor.resource.lower() != access_policy_json['component']['resource'].lower()
-        ):
-            # create global policy override for the resource
-            policy_override_users = []
-            policy_override_user_groups = []
-            if len(configured_access_policies) > 0:
-                policy_override_users = configured_access_policies[0].users
-                policy_override_user_groups = configured_access_policies[0].user_groups
-            _create(
-                cluster,
-                access_policy_descriptor,
-                policy_override_users,
-                policy_override_user_groups,
-                security.users,
-                security.user_groups,
-                None)
-        else:
-            if len(configured_access_policies) == 0:
-                if not(access_policy_json is None):
-                    # global policy is not in config but exists with current or coordinator user, remove other users and groups
-                    if _does_current_user_has_policy(access_policy_descriptor.action, access_policy_descriptor.resource, current_user_json):
-                        _update(
-                            cluster,
-                            access_policy_descriptor,
-                            [],
-                            [],
-                            security.users,
-                            security.user_groups,
-                            access_policy_json,
-                            current_user_json,
-                            None)
-                    # global policy is not in config and does not have cuurent or coordinator user, delete the policy
-                    else:
-                        _delete(cluster, access_policy_descriptor, access_policy_json, None)
-                else:
-                    logger.info(
-                        f'Access policy ({access_policy_descriptor.name}): {access_policy_descriptor.action}/{access_policy_descriptor.resource}, in cluster: {cluster.name}, is up-to-date.')
+        global_policies.append((access_policy_descriptor, configured_access_policies))
 
-            else:
-                configured_access_policy = configured_access_policies[0]
-                if access_policy_json is None:
-                    # create global policy for the resource
-                    _create(
-                        cluster,
-                        access_policy_descriptor,
-                        configured_access_policy.users,
-                        configured_access_policy.user_groups,
-                        security.users,
-                        security.user_groups,
-                        None)
-                else:
-                    # update global policy for the resource
+    # every descriptor is a separate policy in nifi, look them up and apply them through the cluster's bounded pool
+    concurrency_helper.map_bounded(
+        lambda global_policy: _sync_global_policy(cluster, security, current_user_json, *global_policy),
+        global_policies,
+        cluster.max_parallel_access_policies)
+
+
+def _sync_global_policy(
+    cluster: Cluster,
+    security: Security,
+    current_user_json,
+    access_policy_descriptor: AccessPolicyDescriptor,
+    configured_access_policies: list
+):
+    logger = logging.getLogger(__name__)
+
+    access_policy_json = _get_access_policy_json(cluster, access_policy_descriptor, None)
+    if (
+        not (access_policy_json is None)
+        and '/' + access_policy_descriptor.resource.lower() != access_policy_json['component']['resource'].lower()
+    ):
+        # create global policy override for the resource
+        policy_override_users = []
+        policy_override_user_groups = []
+        if len(configured_access_policies) > 0:
+            policy_override_users = configured_access_policies[0].users
+            policy_override_user_groups = configured_access_policies[0].user_groups
+        _create(
+            cluster,
+            access_policy_descriptor,
+            policy_override_users,
+            policy_override_user_groups,
+            security,
+            None)
+    else:
+        if len(configured_access_policies) == 0:
+            if not(access_policy_json is None):
+                # global policy is not in config but exists with current or coordinator user, remove other users and groups
+                if _does_current_user_has_policy(access_policy_descriptor.action, access_policy_descriptor.resource, current_user_json):
                     _update(
                         cluster,
                         access_policy_descriptor,
-                        configured_access_policy.users,
-                        configured_access_policy.user_groups,
-                        security.users,
-                        security.user_groups,
+                        [],
+                        [],
+                        security,
                         access_policy_json,
                         current_user_json,
                         None)
+                # global policy is not in config and does not have cuurent or coordinator user, delete the policy
+                else:
+                    _delete(cluster, access_policy_descriptor, access_policy_json, None)
+            else:
+                logger.info(
+                    f'Access policy ({access_policy_descriptor.name}): {access_policy_descriptor.action}/{access_policy_descriptor.resource}, in cluster: {cluster.name}, is up-to-date.')
+
+        else:
+            configured_access_policy = configured_access_policies[0]
+            if access_policy_json is None:
+                # create global policy for the resource
+                _create(
+                    cluster,
+                    access_policy_descriptor,
+                    configured_access_policy.users,
+                    configured_access_policy.user_groups,
+                    security,
+                    None)
+            else:
+                # update global policy for the resource
+                _update(
+                    cluster,
+                    access_policy_descriptor,
+                    configured_access_policy.users,
+                    configured_access_policy.user_groups,
+                    security,
+                    access_policy_json,
+                    current_user_json,
+                    None)
 
 
 def sync_component_policies(cluster: Cluster, security: Security, configured_projects: list):
@@ -146,6 +163,7 @@ def sync_component_policies(cluster: Cluster, security: Security, configured_pro
     current_user_json = _get_current_user_json(cluster)
 
     # sync component policies
+    component_policies = []
     for access_policy_descriptor in component_access_policies_descriptors:
         configured_access_policies = [
             a for a in security.component_access_policies
@@ -170,7 +188,7 @@ def sync_component_policies(cluster: Cluster, security: Security, configured_pro
                         inherited=False,
                         clusters=[]))
             for access_policy in configured_access_policies:
-                if len([u for u in access_policy.users if u.lower() == current_user_json['component']['identity'].lower()]) == 0:
+                if identity_key(current_user_json['component']['identity']) not in {identity_key(u) for u in access_policy.users}:
                     access_policy.users.append(current_user_json['component']['identity'])
 
         for configured_access_policy in configured_access_policies:
@@ -179,44 +197,61 @@ def sync_component_policies(cluster: Cluster, security: Security, configured_pro
                 logger.warning(
                     f'Unable to find component: {configured_access_policy.component_type}/{configured_access_policy.component_name}, in cluster: {cluster.name}.')
             else:
-                access_policy_json = _get_access_policy_json(cluster, access_policy_descriptor, component_id)
-                inherited_policy = (
-                    not (access_policy_json is None)
-                    and 'componentReference' in access_policy_json['component']
-                    and access_policy_json['component']['componentReference']['id'] != component_id
-                )
-
-                if configured_access_policy.inherited:
-                    if not inherited_policy:
-                        # delete policy override
-                        _delete(cluster, access_policy_descriptor, access_policy_json, component_id)
-                    else:
-                        resource = access_policy_descriptor.resource.replace('{id}', component_id)
-                        logger.info(
-                            f'Access policy ({access_policy_descriptor.name}): {access_policy_descriptor.action}/{resource}, in cluster: {cluster.name}, is up-to-date.')
-                else:
-                    if access_policy_json is None or inherited_policy:
-                        # create policy overrride
-                        _create(
-                            cluster,
-                            access_policy_descriptor,
-                            configured_access_policy.users,
-                            configured_access_policy.user_groups,
-                            security.users,
-                            security.user_groups,
-                            component_id)
-                    else:
-                        # update policy override
-                        _update(
-                            cluster,
-                            access_policy_descriptor,
-                            configured_access_policy.users,
-                            configured_access_policy.user_groups,
-                            security.users,
-                            security.user_groups,
-                            access_policy_json,
-                            current_user_json,
-                            component_id)
+                component_policies.append((access_policy_descriptor, configured_access_policy, component_id))
+
+    # one policy lookup per descriptor per component, run them through the cluster's bounded pool
+    concurrency_helper.map_bounded(
+        lambda component_policy: _sync_component_policy(cluster, security, current_user_json, *component_policy),
+        component_policies,
+        cluster.max_parallel_access_policies)
+
+
+def _sync_component_policy(
+    cluster: Cluster,
+    security: Security,
+    current_user_json,
+    access_policy_descriptor: AccessPolicyDescriptor,
+    configured_access_policy: ComponentAccessPolicy,
+    component_id: str
+):
+    logger = logging.getLogger(__name__)
+
+    access_policy_json = _get_access_policy_json(cluster, access_policy_descriptor, component_id)
+    inherited_policy = (
+        not (access_policy_json is None)
+        and 'componentReference' in access_policy_json['component']
+        and access_policy_json['component']['componentReference']['id'] != component_id
+    )
+
+    if configured_access_policy.inherited:
+        if not inherited_policy:
+            # delete policy override
+            _delete(cluster, access_policy_descriptor, access_policy_json, component_id)
+        else:
+            resource = access_policy_descriptor.resource.replace('{id}', component_id)
+            logger.info(
+                f'Access policy ({access_policy_descriptor.name}): {access_policy_descriptor.action}/{resource}, in cluster: {cluster.name}, is up-to-date.')
+    else:
+        if access_policy_json is None or inherited_policy:
+            # create policy overrride
+            _create(
+                cluster,
+                access_policy_descriptor,
+                configured_access_policy.users,
+                configured_access_policy.user_groups,
+                security,
+                component_id)
+        else:
+            # update policy override
+            _update(
+                cluster,
+                access_policy_descriptor,
+                configured_access_policy.users,
+                configured_access_policy.user_groups,
+                security,
+                access_policy_json,
+                current_user_json,
+                component_id)
 
 
 def _create(
@@ -224,8 +259,7 @@ def _create(
     access_policy_descriptor: AccessPolicyDescriptor,
     policy_users: list,
     policy_user_groups: list,
-    configured_users: list,
-    configured_user_groups: list,
+    security: Security,
     component_id: str
 ):
     logger = logging.getLogger(__name__)
@@ -241,20 +275,20 @@ def _create(
         'component': {
             'resource': '/' + resource,
             'action': access_policy_descriptor.action,
-            'users': _get_access_policy_users_json(policy_users, configured_users),
-            'userGroups': _get_access_policy_user_groups_json(policy_user_groups, configured_user_groups)
+            'users': _get_access_policy_users_json(policy_users, security),
+            'userGroups': _get_access_policy_user_groups_json(policy_user_groups, security)
         }
     }
 
     try:
-        response = requests.post(
-            **cluster._get_connection_details(
-                '/' + url_helper.construct_path_parts(['policies'])), json=create_json)
+        response = cluster.post(
+            '/' + url_helper.construct_path_parts(['policies']), json=create_json)
         if response.status_code != 201:
             logger.warning(
                 f'Unable to create access policy ({access_policy_descriptor.name}): {access_policy_descriptor.action}/{resource}, in cluster: {cluster.name}.')
             logger.warning(response.text)
             return
+        cluster.tenant_snapshot.record_access_policy(response.json())
         logger.info(
             f'Created access policy ({access_policy_descriptor.name}): {access_policy_descriptor.action}/{resource}, in cluster: {cluster.name}.')
     except requests.exceptions.RequestException as exception:
@@ -268,8 +302,7 @@ def _update(
     access_policy_descriptor: AccessPolicyDescriptor,
     policy_users: list,
     policy_user_groups: list,
-    configured_users: list,
-    configured_user_groups: list,
+    security: Security,
     current_access_policy_json,
     current_user_json,
     component_id: str
@@ -283,7 +316,7 @@ def _update(
     desired_policy_users = policy_users
     append_current_user = (
         _does_current_user_has_policy(access_policy_descriptor.action, resource, current_user_json)
-        and len([u for u in desired_policy_users if u.lower() == current_user_json['component']['identity'].lower()]) == 0)
+        and identity_key(current_user_json['component']['identity']) not in {identity_key(u) for u in desired_policy_users})
 
     if append_current_user:
         desired_policy_users.append(current_user_json['component']['identity'])
@@ -291,8 +324,8 @@ def _update(
     if _did_users_or_groups_change(desired_policy_users, policy_user_groups, current_access_policy_json):
 
         url = '/' + url_helper.construct_path_parts(['policies', current_access_policy_json['id']])
-        current_access_policy_json['component']['users'] = _get_access_policy_users_json(policy_users, configured_users)
-        current_access_policy_json['component']['userGroups'] = _get_access_policy_user_groups_json(policy_user_groups, configured_user_groups)
+        current_access_policy_json['component']['users'] = _get_access_policy_users_json(policy_users, security)
+        current_access_policy_json['component']['userGroups'] = _get_access_policy_user_groups_json(policy_user_groups, security)
 
         if append_current_user:
             current_access_policy_json['component']['users'].append({
@@ -305,11 +338,12 @@ def _update(
             })
 
         try:
-            response = requests.put(**cluster._get_connection_details(url), json=current_access_policy_json)
+            response = cluster.put(url, json=current_access_policy_json)
             if response.status_code != 200:
                 logger.warning(f'Unable to update access policy ({access_policy_descriptor.name}): {access_policy_descriptor.action}/{resource}, in cluster: {cluster.name}.')
                 logger.warning(response.text)
                 return
+            cluster.tenant_snapshot.record_access_policy(response.json())
             logger.info(f'Updated access policy ({access_policy_descriptor.name}): {access_policy_descriptor.action}/{resource}, in cluster: {cluster.name}.')
         except requests.exceptions.RequestException as exception:
             logger.warning(f'Unable to update access policy ({access_policy_descriptor.name}): {access_policy_descriptor.action}/{resource}, in cluster: {cluster.name}.')
@@ -332,14 +366,15 @@ def _delete(
 
     delete_url = '/' + url_helper.construct_path_parts(['policies', delete_access_policy_json['id']])
     try:
-        response = requests.delete(
-            **cluster._get_connection_details(delete_url),
+        response = cluster.delete(
+            delete_url,
             params={'version': str(delete_access_policy_json['revision']['version'])})
         if response.status_code != 200:
             logger.warning(
                 f'Unable to delete access policy ({access_policy_descriptor.name}): {access_policy_descriptor.action}/{resource}, from cluster: {cluster.name}.')
             logger.warning(response.text)
             return
+        cluster.tenant_snapshot.forget_access_policy(delete_access_policy_json['id'])
         logger.info(
             f'Deleted access policy ({access_policy_descriptor.name}): {access_policy_descriptor.action}/{resource}, from cluster: {cluster.name}.')
     except requests.exceptions.RequestException as exception:
@@ -356,9 +391,8 @@ def _get_access_policy_json(cluster: Cluster, access_policy_descriptor: AccessPo
         resource = resource.replace('{id}', component_id)
 
     try:
-        response = requests.get(
-            **cluster._get_connection_details(
-                '/' + url_helper.construct_path_parts(['policies', access_policy_descriptor.action, resource])))
+        response = cluster.get(
+            '/' + url_helper.construct_path_parts(['policies', access_policy_descriptor.action, resource]))
         if response.status_code != 200:
             return None
         return response.json()
@@ -371,23 +405,7 @@ def _get_access_policy_json(cluster: Cluster, access_policy_descriptor: AccessPo
 
 
 def _get_current_user_json(cluster: Cluster):
-    current_user_identity = requests.get(
-        **cluster._get_connection_details(
-            '/' + url_helper.construct_path_parts(['flow', 'current-user']))).json()['identity']
-
-    users_json = requests.get(
-        **cluster._get_connection_details(
-            '/' + url_helper.construct_path_parts(['tenants', 'users']))).json()
-
-    current_user_jsons = [
-        u for u in users_json['users']
-        if u['component']['identity'].lower() == current_user_identity.lower()
-    ]
-
-    if len(current_user_jsons) > 0:
-        return current_user_jsons[0]
-
-    return None
+    return tenant_service.get_snapshot(cluster).current_user_json
 
 
 def _get_component_id(cluster: Cluster, component_access_policy: ComponentAccessPolicy, configured_projects: list):
@@ -420,48 +438,29 @@ def _get_component_id(cluster: Cluster, component_access_policy: ComponentAccess
 
 
 def _did_users_or_groups_change(policy_users: list, policy_user_groups: list, current_acccess_policy_json):
-    if len(policy_users) != len(current_acccess_policy_json['component']['users']):
+    current_users = {identity_key(u['component']['identity']) for u in current_acccess_policy_json['component']['users']}
+    if {identity_key(u) for u in policy_users} != current_users:
         return True
 
-    if len(policy_user_groups) != len(current_acccess_policy_json['component']['userGroups']):
-        return True
-
-    for user_identity in policy_users:
-        users = [
-            u for u in current_acccess_policy_json['component']['users']
-            if u['component']['identity'].lower() == user_identity.lower()
-        ]
-
-        if len(users) == 0:
-            return True
-
-    for user_group_identity in policy_user_groups:
-        user_groups = [
-            ug for ug in current_acccess_policy_json['component']['userGroups']
-            if ug['component']['identity'].lower() == user_group_identity.lower()
-        ]
-
-        if len(user_groups) == 0:
-            return True
-
-    return False
+    current_user_groups = {identity_key(ug['component']['identity']) for ug in current_acccess_policy_json['component']['userGroups']}
+    return {identity_key(ug) for ug in policy_user_groups} != current_user_groups
 
 
-def _get_access_policy_users_json(policy_users: list, configured_users: list):
+def _get_access_policy_users_json(policy_users: list, security: Security):
     logger = logging.getLogger(__name__)
 
     users_json = []
     for user_identity in policy_users:
-        users = [u for u in configured_users if u.identity.lower() == user_identity.lower()]
-        if len(users) > 0:
+        user = security.find_user(user_identity)
+        if not (user is None):
             users_json.append({
                 'revision': {
-                    'version': users[0].revision_version
+                    'version': user.revision_version
                 },
-                'id': users[0].component_id,
+                'id': user.component_id,
                 'component': {
                     'identity': user_identity,
-                    'id': users[0].component_id
+                    'id': user.component_id
                 }
             })
         else:
@@ -470,21 +469,21 @@ def _get_access_policy_users_json(policy_users: list, configured_users: list):
     return users_json
 
 
-def _get_access_policy_user_groups_json(policy_user_groups: list, configured_user_groups: list):
+def _get_access_policy_user_groups_json(policy_user_groups: list, security: Security):
     logger = logging.getLogger(__name__)
 
     users_groups_json = []
     for user_group_identity in policy_user_groups:
-        user_groups = [ug for ug in configured_user_groups if ug.identity.lower() == user_group_identity.lower()]
-        if len(user_groups) > 0:
+        user_group = security.find_user_group(user_group_identity)
+        if not (user_group is None):
             users_groups_json.append({
                 'revision': {
-                    'version': user_groups[0].revision_version
+                    'version': user_group.revision_version
                 },
-                'id': user_groups[0].component_id,
+                'id': user_group.component_id,
                 'component': {
                     'identity': user_group_identity,
-                    'id': user_groups[0].component_id
+                    'id': user_group.component_id
                 }
             })
         else:
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import logging
+import threading
+import requests
+import utils.http_metrics as http_metrics
+import utils.url_helper as url_helper
+from configuration.cluster import Cluster
+from configuration.config_diff import ClusterPlan
+import configuration.config_diff as config_diff
+
+registries_section = 'registries'
+tenants_section = 'tenants'
+parameter_contexts_section = 'parameter_contexts'
+projects_section = 'projects'
+environments_section = 'environments'
+global_policies_section = 'global_policies'
+component_policies_section = 'component_policies'
+
+all_sections = [
+    registries_section, tenants_section, parameter_contexts_section, projects_section, environments_section, global_policies_section,
+    component_policies_section
+]
+
+# Sections a write to an endpoint template changes, deleted tenants and process groups take their policies along.
+written_sections = [
+    ('/controller/registry-clients', [registries_section]),
+    ('/tenants/', [tenants_section, global_policies_section, component_policies_section]),
+    ('/parameter-contexts', [parameter_contexts_section]),
+    ('/process-groups/', [projects_section, environments_section, component_policies_section]),
+    ('/versions/', [projects_section, environments_section]),
+    ('/policies', [global_policies_section, component_policies_section])
+]
+
+_tenant_sections = {tenants_section, global_policies_section, component_policies_section}
+_process_group_sections = {projects_section, environments_section}
+
+# Fingerprints are only taken when periodic resyncs are enabled, they cost a few calls per cluster.
+enabled = False
+
+_fingerprints = {}
+# fingerprint of the last check of a cluster, taken before the reconcile of its drift
+_checked_fingerprints = {}
+_written_sections = {}
+_fingerprints_lock = threading.Lock()
+
+
+class _WriteRecorder:
+    """Notes the sections the calls of a reconcile wrote to, only those are read again once it is over."""
+
+    def record(self, cluster_name: str, method: str, template: str, status_code: int, seconds: float, bytes_sent: int, bytes_received: int):
+        if method == 'GET':
+            return
+        sections = {s for prefix, prefix_sections in written_sections if template.startswith(prefix) for s in prefix_sections}
+        with _fingerprints_lock:
+            _written_sections.setdefault(cluster_name, set()).update(sections)
+
+
+_write_recorder = _WriteRecorder()
+
+
+def init_drift_detection(enable: bool):
+    """Enable fingerprinting of the clusters and drop the recorded fingerprints."""
+    global enabled
+    with _fingerprints_lock:
+        if enabled:
+            http_metrics.remove_recorder(_write_recorder)
+        enabled = enable
+        if enabled:
+            http_metrics.add_recorder(_write_recorder)
+        _fingerprints.clear()
+        _checked_fingerprints.clear()
+        _written_sections.clear()
+
+
+def fingerprint(cluster: Cluster, sections: set = None) -> dict:
+    """Return a digest per section of the revisions NiFi holds for the cluster, None if the cluster can not be read.
+
+    Every change made in NiFi bumps the revision of the changed component, so an unchanged digest means the
+    section was not touched since the fingerprint was taken. Environments add their version control state, which
+    changes without a new revision, and access policies are read from the policy summaries of the users and groups.
+    Only the listings the requested sections need are read, None requests every section.
+    """
+    logger = logging.getLogger(__name__)
+    sections = set(all_sections) if sections is None else sections
+    current_fingerprint = {}
+
+    try:
+        if registries_section in sections:
+            current_fingerprint[registries_section] = _digest(_get(cluster, ['controller', 'registry-clients'])['registries'])
+
+        if len(sections & _tenant_sections) > 0:
+            tenants_json = _get(cluster, ['tenants', 'users'])['users'] + _get(cluster, ['tenants', 'user-groups'])['userGroups']
+            # policies without any user or group are not listed, emptying a policy still changes the digest
+            access_policies_json = list({
+                p['id']: p for t in tenants_json for p in t.get('component', {}).get('accessPolicies', [])
+            }.values())
+            current_fingerprint[tenants_section] = _digest(tenants_json)
+            current_fingerprint[global_policies_section] = _digest([p for p in access_policies_json if not _is_component_policy(p)])
+            current_fingerprint[component_policies_section] = _digest([p for p in access_policies_json if _is_component_policy(p)])
+
+        if parameter_contexts_section in sections:
+            current_fingerprint[parameter_contexts_section] = _digest(_get(cluster, ['flow', 'parameter-contexts'])['parameterContexts'])
+
+        if len(sections & _process_group_sections) > 0:
+            root_process_group_json = _get(cluster, ['process-groups', 'root'])
+            project_process_groups_json = _get(cluster, ['process-groups', root_process_group_json['id'], 'process-groups'])['processGroups']
+            current_fingerprint[projects_section] = _digest([root_process_group_json] + project_process_groups_json)
+            if environments_section in sections:
+                environment_process_groups_json = [
+                    e for p in project_process_groups_json for e in _get(cluster, ['process-groups', p['id'], 'process-groups'])['processGroups']
+                ]
+                current_fingerprint[environments_section] = _digest(environment_process_groups_json, _environment_key)
+    except (requests.exceptions.RequestException, ValueError, KeyError) as exception:
+        logger.warning(f'Unable to fingerprint cluster: {cluster.name}.')
+        logger.warning(exception)
+        return None
+
+    return {s: current_fingerprint[s] for s in sections}
+
+
+def record(cluster: Cluster, plan: ClusterPlan):
+    """Remember the fingerprint of the sections the plan fully reconciled on the cluster.
+
+    Sections the reconcile did not write keep the fingerprint of the check that found the drift, so a change made by
+    hand while the reconcile ran is still noticed. The sections it wrote, or all of them without a check, are read again.
+    """
+    if not enabled:
+        return
+
+    # a section that was only partly reconciled keeps its old fingerprint so its drift is still noticed
+    sections = reconciled_sections(plan)
+    with _fingerprints_lock:
+        checked_fingerprint = _checked_fingerprints.pop(cluster.name, None)
+        written = _written_sections.pop(cluster.name, set())
+    stale_sections = sections if checked_fingerprint is None else sections & written
+    current_fingerprint = fingerprint(cluster, stale_sections) if len(stale_sections) > 0 else {}
+
+    with _fingerprints_lock:
+        if current_fingerprint is None:
+            _fingerprints.pop(cluster.name, None)
+            return
+        recorded_fingerprint = _fingerprints.setdefault(cluster.name, {})
+        for section in sections:
+            recorded_fingerprint[section] = current_fingerprint[section] if section in stale_sections else checked_fingerprint[section]
+
+
+def discard(cluster: Cluster):
+    """Drop what was noted for the reconcile of the cluster, the next reconcile reads its sections again."""
+    with _fingerprints_lock:
+        _checked_fingerprints.pop(cluster.name, None)
+        _written_sections.pop(cluster.name, None)
+
+
+def changed_sections(cluster: Cluster) -> set:
+    """Return the sections of the cluster that changed since its fingerprint was recorded, all of them when unknown."""
+    logger = logging.getLogger(__name__)
+
+    with _fingerprints_lock:
+        recorded_fingerprint = _fingerprints.get(cluster.name, None)
+    current_fingerprint = fingerprint(cluster)
+
+    with _fingerprints_lock:
+        if current_fingerprint is None:
+            _checked_fingerprints.pop(cluster.name, None)
+        else:
+            _checked_fingerprints[cluster.name] = current_fingerprint
+            _written_sections.pop(cluster.name, None)
+
+    if recorded_fingerprint is None or current_fingerprint is None:
+        return set(all_sections)
+
+    sections = {s for s in all_sections if recorded_fingerprint.get(s, None) != current_fingerprint[s]}
+    if len(sections) > 0:
+        logger.info(f'Drift detected in cluster: {cluster.name}, sections: {sorted(sections)}.')
+    return sections
+
+
+def reconciled_sections(plan: ClusterPlan) -> set:
+    """Return the sections the plan reconciles completely."""
+    sections = set()
+    if plan.includes(config_diff.registries_phase):
+        sections.add(registries_section)
+    if plan.includes(config_diff.users_phase) and plan.includes(config_diff.user_groups_phase):
+        sections.add(tenants_section)
+    if plan.includes(config_diff.parameter_contexts_phase) and plan.parameter_context_scope is None:
+        sections.add(parameter_contexts_section)
+    if plan.includes(config_diff.projects_phase) and plan.project_scope is None:
+        sections |= {projects_section, environments_section}
+    if plan.includes(config_diff.global_policies_phase):
+        sections.add(global_policies_section)
+    if plan.includes(config_diff.component_policies_phase):
+        sections.add(component_policies_section)
+    return sections
+
+
+def drift_plan(sections: set) -> ClusterPlan:
+    """Return the plan that reconciles the drifted sections of a cluster."""
+    cluster_plan = ClusterPlan(set())
+    if registries_section in sections:
+        cluster_plan.phases.add(config_diff.registries_phase)
+    # recreated users, groups and process groups lose their policies, so those are applied again as well
+    if tenants_section in sections:
+        cluster_plan.phases |= {config_diff.users_phase, config_diff.user_groups_phase, config_diff.global_policies_phase, config_diff.component_policies_phase}
+    if parameter_contexts_section in sections:
+        cluster_plan.phases.add(config_diff.parameter_contexts_phase)
+    if projects_section in sections or environments_section in sections:
+        cluster_plan.phases |= {config_diff.projects_phase, config_diff.component_policies_phase}
+    if global_policies_section in sections:
+        cluster_plan.phases.add(config_diff.global_policies_phase)
+    if component_policies_section in sections:
+        cluster_plan.phases.add(config_diff.component_policies_phase)
+    config_diff.add_required_phases(cluster_plan)
+    return cluster_plan
+
+
+def _get(cluster: Cluster, path_parts: list):
+    response = cluster.get('/' + url_helper.construct_path_parts(path_parts))
+    response.raise_for_status()
+    return response.json()
+
+
+def _digest(components_json: list, key=None) -> str:
+    key = _revision_key if key is None else key
+    revisions = sorted(key(c) for c in components_json)
+    return hashlib.sha256(json.dumps(revisions).encode('utf-8')).hexdigest()
+
+
+def _revision_key(component_json) -> tuple:
+    return (component_json['id'], component_json['revision']['version'])
+
+
+def _environment_key(environment_json) -> tuple:
+    version_control_json = environment_json.get('component', {}).get('versionControlInformation', {})
+    return _revision_key(environment_json) + (str(version_control_json.get('version', '')), version_control_json.get('state', ''))
+
+
+def _is_component_policy(access_policy_json) -> bool:
+    return '/process-groups/' in access_policy_json.get('component', {}).get('resource', '')
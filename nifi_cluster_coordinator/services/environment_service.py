@@ -1,30 +1,47 @@
 import logging
+from concurrent.futures import Executor
 import requests
 import utils.url_helper as url_helper
+import utils.concurrency_helper as concurrency_helper
+import utils.name_helper as name_helper
+import services.flow_version_cache as flow_version_cache
+import services.update_request_service as update_request_service
 from configuration.cluster import Cluster
 from configuration.project import Project, ProjectCluster, ProjectEnvironment
 from configuration.parameter_context import ParameterContext
 
 
-def sync(cluster: Cluster, project: Project, project_cluster: ProjectCluster, parameter_contexts: list):
+def sync(cluster: Cluster, project: Project, project_cluster: ProjectCluster, parameter_contexts: list, environment_executor: Executor = None):
+    """Set the environments of the project to their desired configuration.
+
+    The environments are synced on the executor when given, which the project service shares between all projects of the
+    cluster, otherwise max_parallel_projects of them at once.
+    """
     logger = logging.getLogger(__name__)
 
     desired_environments = list(filter(lambda e: e.is_coordinated, project_cluster.environments))
 
     logger.info(f'Collecting currently configured environments for project: {project.name}')
-    response = requests.get(
-        **cluster._get_connection_details(
-            '/' + url_helper.construct_path_parts(['process-groups', project_cluster.project_process_group_id, 'process-groups']))).json()
+    response = cluster.get(
+        '/' + url_helper.construct_path_parts(['process-groups', project_cluster.project_process_group_id, 'process-groups'])).json()
     current_environments_json_dict = {project['component']['name']: project for project in response['processGroups']}
 
-    for delete_env_name in list(filter(lambda k: len([p for p in project_cluster.environments if p.name.lower() == k.lower()]) == 0, current_environments_json_dict.keys())):
+    for delete_env_name in name_helper.missing_names(current_environments_json_dict.keys(), [e.name for e in project_cluster.environments]):
         _delete(cluster, project, current_environments_json_dict[delete_env_name])
 
-    for environment in desired_environments:
-        if environment.name in current_environments_json_dict:
-            _update(cluster, project, project_cluster, environment, current_environments_json_dict[environment.name], parameter_contexts)
-        else:
-            _create(cluster, project, project_cluster, environment, parameter_contexts)
+    # environments are synced side by side
+    version_updates = concurrency_helper.map_bounded(
+        lambda environment: _sync_environment(cluster, project, project_cluster, environment, current_environments_json_dict, parameter_contexts),
+        desired_environments,
+        cluster.max_parallel_projects,
+        environment_executor)
+    version_updates = list(filter(lambda version_update: not (version_update is None), version_updates))
+
+    # version changes take a while in nifi, several environments are upgraded at once
+    concurrency_helper.map_bounded(
+        lambda version_update: _update_version(cluster, project, *version_update),
+        version_updates,
+        cluster.max_parallel_environment_upgrades)
 
     uncoordinated_environments = list(filter(lambda e: not e.is_coordinated, project_cluster.environments))
     for environment in uncoordinated_environments:
@@ -34,6 +51,19 @@ def sync(cluster: Cluster, project: Project, project_cluster: ProjectCluster, pa
             environment.process_group_id = ''
 
 
+def _sync_environment(
+    cluster: Cluster,
+    project: Project,
+    project_cluster: ProjectCluster,
+    environment: ProjectEnvironment,
+    current_environments_json_dict: dict,
+    parameter_contexts: list
+):
+    if environment.name in current_environments_json_dict:
+        return _update(cluster, project, project_cluster, environment, current_environments_json_dict[environment.name], parameter_contexts)
+    return _create(cluster, project, project_cluster, environment, parameter_contexts)
+
+
 def _create(
     cluster: Cluster,
     project: Project,
@@ -43,7 +73,7 @@ def _create(
 ):
     logger = logging.getLogger(__name__)
 
-    desired_version = _get_desired_version(project, environment)
+    desired_version = _get_desired_version(cluster, project, environment)
     if desired_version is None:
         logger.warning(
             f'Unable to find project version: {environment.version}, for project: {project.name}, environment: {environment.name}.')
@@ -81,7 +111,7 @@ def _create(
             }
 
     try:
-        response = requests.post(**cluster._get_connection_details(post_url), json=create_json)
+        response = cluster.post(post_url, json=create_json)
         if response.status_code != 201:
             logger.warning(response.text)
             return
@@ -89,7 +119,7 @@ def _create(
         response_json = response.json()
         environment.process_group_id = response_json['id']
         logger.info(f'Created project: {project.name}, environment: {environment.name}, in cluster: {cluster.name}.')
-        _update(cluster, project, project_cluster, environment, response_json, parameter_contexts)
+        return _update(cluster, project, project_cluster, environment, response_json, parameter_contexts)
     except requests.exceptions.RequestException as exception:
         logger.warning(f'Unable to create project: {project.name}, environment: {environment.name}, in cluster: {cluster.name}.')
         logger.warning(exception)
@@ -107,7 +137,7 @@ def _update(
 
     environment.process_group_id = environment_json['id']
 
-    desired_version = _get_desired_version(project, environment)
+    desired_version = _get_desired_version(cluster, project, environment)
     if desired_version is None:
         logger.warning(
             f'Unable to find project version: {environment.version}, for project: {project.name}, environment: {environment.name}, in cluster: {cluster.name}.')
@@ -161,8 +191,8 @@ def _update(
         if 'versionControlInformation' in environment_json['component']:
             try:
                 delete_version_url = '/' + url_helper.construct_path_parts(['versions', 'process-groups', environment_json['id']])
-                response = requests.delete(
-                    **cluster._get_connection_details(delete_version_url), params=environment_json['revision'])
+                response = cluster.delete(
+                    delete_version_url, params=environment_json['revision'])
                 if response.status_code != 200:
                     logger.warning(response.text)
                     return
@@ -178,7 +208,7 @@ def _update(
 
         try:
             put_url = '/' + url_helper.construct_path_parts(['process-groups', environment_json['id']])
-            response = requests.put(**cluster._get_connection_details(put_url), json=update_json)
+            response = cluster.put(put_url, json=update_json)
             if response.status_code != 200:
                 logger.warning(response.text)
                 return
@@ -192,7 +222,9 @@ def _update(
         logger.info(f'Project: {project.name}, environment: {environment.name}, in cluster: {cluster.name}, is up-to-date.')
 
     if update_version:
-        _update_version(desired_version, cluster, project, environment, environment_json)
+        return (desired_version, environment, environment_json)
+
+    return None
 
 
 def _delete(cluster: Cluster, project: Project, delete_environment_json):
@@ -201,8 +233,8 @@ def _delete(cluster: Cluster, project: Project, delete_environment_json):
 
     delete_url = '/' + url_helper.construct_path_parts(['process-groups', delete_environment_json['component']['id']])
     try:
-        response = requests.delete(
-            **cluster._get_connection_details(delete_url), params=delete_environment_json['revision'])
+        response = cluster.delete(
+            delete_url, params=delete_environment_json['revision'])
         if response.status_code != 200:
             logger.warning(response.text)
             return
@@ -212,7 +244,7 @@ def _delete(cluster: Cluster, project: Project, delete_environment_json):
         logger.warning(exception)
 
 
-def _update_version(desired_version, cluster: Cluster, project: Project, environment: ProjectEnvironment, environment_json):
+def _update_version(cluster: Cluster, project: Project, desired_version, environment: ProjectEnvironment, environment_json):
     logger = logging.getLogger(__name__)
 
     registry_json = cluster.registeries_json_dict[project.registry_name]
@@ -227,25 +259,44 @@ def _update_version(desired_version, cluster: Cluster, project: Project, environ
         }
     }
 
-    # Todo: since version control is an async process inside nifi, we need an async logic or while loop to check
-    # the request status to issue delete request when the versionrequest is processed by the nifi server
+    # version control is an async process inside nifi, the update request is tracked until nifi completes it
     post_url = '/' + url_helper.construct_path_parts(['versions', 'update-requests', 'process-groups', environment_json['id']])
-    try:
-        response = requests.post(**cluster._get_connection_details(post_url), json=version_update_json)
-        if response.status_code != 200:
-            logger.warning(response.text)
+    with cluster.environment_upgrade_slots:
+        try:
+            response = cluster.post(post_url, json=version_update_json)
+            if response.status_code != 200:
+                logger.warning(response.text)
+                return
+        except requests.exceptions.RequestException as exception:
+            logger.warning(f'Unable to update project: {project.name}, environment: {environment.name}, version: {desired_version}, in cluster: {cluster.name}.')
+            logger.warning(exception)
             return
-        logger.info(f'Updated project: {project.name}, environment: {environment.name}, version: {desired_version}, in cluster: {cluster.name}.')
-    except requests.exceptions.RequestException as exception:
-        logger.warning(f'Unable to update project: {project.name}, environment: {environment.name}, version: {desired_version}, in cluster: {cluster.name}.')
-        logger.warning(exception)
 
+        request_json = response.json()['request']
+        request_url = '/' + url_helper.construct_path_parts(['versions', 'update-requests', request_json['requestId']])
+        if update_request_service.track(
+            cluster,
+            request_url,
+            request_json,
+            f'Version update of project: {project.name}, environment: {environment.name}, to version: {desired_version}'
+        ):
+            logger.info(f'Updated project: {project.name}, environment: {environment.name}, version: {desired_version}, in cluster: {cluster.name}.')
+
+
+def _get_desired_version(cluster: Cluster, project: Project, environment: ProjectEnvironment):
+    available_versions_dict = flow_version_cache.get_available_versions(cluster, project)
+    if not available_versions_dict:
+        return None
 
-def _get_desired_version(project: Project, environment: ProjectEnvironment):
     desired_version = environment.version
     if str(desired_version).lower() == 'latest':
-        return max(project.available_versions_dict.keys())
-    elif desired_version in project.available_versions_dict.keys():
+        return max(available_versions_dict.keys())
+
+    if not (desired_version in available_versions_dict.keys()):
+        # the version may have been published after the versions were cached
+        available_versions_dict = flow_version_cache.get_available_versions(cluster, project, refresh=True)
+
+    if not (available_versions_dict is None) and desired_version in available_versions_dict.keys():
         return desired_version
     else:
         return None
@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+import requests
+import utils.url_helper as url_helper
+from configuration.cluster import Cluster
+from configuration.project import Project
+
+# Every cluster points at the same registries, so the versions of a flow are fetched once and shared by all clusters.
+cache_ttl = 300
+
+_cached_versions = {}
+_cache_lock = threading.Lock()
+_key_locks = {}
+
+
+def init_flow_version_cache(ttl: float):
+    """Set how many seconds fetched flow versions are reused and drop what is cached."""
+    global cache_ttl
+    cache_ttl = ttl
+    clear()
+
+
+def clear():
+    with _cache_lock:
+        _cached_versions.clear()
+
+
+def get_available_versions(cluster: Cluster, project: Project, refresh: bool = False) -> dict:
+    """Return the registry versions of the project flow indexed by version number.
+
+    :param cluster:
+        Cluster used to reach the registry when the versions are not cached.
+    :param project:
+        Project whose registry, bucket and flow are looked up.
+    :param refresh:
+        Ignore the cached versions and fetch them again.
+    :returns:
+        Dictionary of version number to version metadata, None if the versions could not be fetched.
+    """
+    logger = logging.getLogger(__name__)
+
+    if cluster.registeries_json_dict is None or not (project.registry_name in cluster.registeries_json_dict):
+        logger.warning(f'Unable to find registry: {project.registry_name}, in cluster: {cluster.name}.')
+        return None
+
+    registry_json = cluster.registeries_json_dict[project.registry_name]
+    key = (registry_json['component']['uri'].lower(), project.bucket_id, project.flow_id)
+
+    with _cache_lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    # one fetch per flow, clusters asking at the same time wait for it instead of fetching too
+    with key_lock:
+        with _cache_lock:
+            cached = _cached_versions.get(key, None)
+        if not refresh and not (cached is None) and time.monotonic() - cached[0] < cache_ttl:
+            return cached[1]
+
+        url = '/' + url_helper.construct_path_parts(['flow', 'registries', registry_json['id'], 'buckets', project.bucket_id, 'flows', project.flow_id, 'versions'])
+        try:
+            response = cluster.get(url)
+            if response.status_code != 200:
+                logger.info(f'Unable to get flow versions for project: {project.name}, Response: {response.text}')
+                return None
+            available_versions_dict = {version['versionedFlowSnapshotMetadata']['version']: version for version in response.json()['versionedFlowSnapshotMetadataSet']}
+        except requests.exceptions.RequestException as exception:
+            logger.warning(f'Unable to get flow versions for project: {project.name}.')
+            logger.warning(exception)
+            return None
+
+        with _cache_lock:
+            _cached_versions[key] = (time.monotonic(), available_versions_dict)
+        return available_versions_dict
@@ -1,30 +1,42 @@
 import logging
 import requests
 import utils.url_helper as url_helper
+import utils.concurrency_helper as concurrency_helper
+import utils.name_helper as name_helper
+import services.update_request_service as update_request_service
+import services.sensitive_parameter_store as sensitive_parameter_store
 from configuration.cluster import Cluster
-from configuration.parameter_context import ParameterContext
+from configuration.parameter_context import ParameterContext, Parameter
 
 
-def sync(cluster: Cluster, configured_parameter_contexts: list):
-    """Set the cluster parameter contexts to desired configuration."""
+def sync(cluster: Cluster, configured_parameter_contexts: list, scope: set = None):
+    """Set the cluster parameter contexts to desired configuration.
+
+    Only the contexts named in the scope are created, updated or deleted, the ids of the others are still resolved.
+    """
     logger = logging.getLogger(__name__)
 
     desired_parameter_contexts = list(filter(lambda pc: pc.is_coordinated, configured_parameter_contexts))
 
     logger.info(f'Collecting currently configure parameter contexts for cluster: {cluster.name}')
-    response = requests.get(
-        **cluster._get_connection_details(
-            '/' + url_helper.construct_path_parts(['flow', 'parameter-contexts']))).json()
+    response = cluster.get(
+        '/' + url_helper.construct_path_parts(['flow', 'parameter-contexts'])).json()
     current_parameter_contexts_json_dict = {context['component']['name']: context for context in response['parameterContexts']}
 
-    for delete_parameter_context_name in list(filter(lambda k: len([pc for pc in configured_parameter_contexts if pc.name.lower() == k.lower()]) == 0, current_parameter_contexts_json_dict.keys())):
-        _delete(cluster, current_parameter_contexts_json_dict[delete_parameter_context_name])
+    for delete_parameter_context_name in name_helper.missing_names(current_parameter_contexts_json_dict.keys(), [pc.name for pc in configured_parameter_contexts]):
+        if _in_scope(scope, delete_parameter_context_name):
+            _delete(cluster, current_parameter_contexts_json_dict[delete_parameter_context_name])
 
-    for parameter_context in desired_parameter_contexts:
+    for parameter_context in list(filter(lambda pc: not _in_scope(scope, pc.name), desired_parameter_contexts)):
         if parameter_context.name in current_parameter_contexts_json_dict:
-            _update(cluster, parameter_context, current_parameter_contexts_json_dict[parameter_context.name])
-        else:
-            _create(cluster, parameter_context)
+            parameter_context.id = current_parameter_contexts_json_dict[parameter_context.name]['id']
+    desired_parameter_contexts = list(filter(lambda pc: _in_scope(scope, pc.name), desired_parameter_contexts))
+
+    # contexts are independent of each other, nifi applies their update requests side by side
+    concurrency_helper.map_bounded(
+        lambda parameter_context: _sync_parameter_context(cluster, parameter_context, current_parameter_contexts_json_dict),
+        desired_parameter_contexts,
+        cluster.max_parallel_parameter_contexts)
 
     uncoordinated_parameter_contexts = list(filter(lambda pc: not pc.is_coordinated, configured_parameter_contexts))
     for parameter_context in uncoordinated_parameter_contexts:
@@ -34,6 +46,17 @@ def sync(cluster: Cluster, configured_parameter_contexts: list):
             parameter_context.id = None
 
 
+def _in_scope(scope: set, name: str) -> bool:
+    return scope is None or name.lower() in scope
+
+
+def _sync_parameter_context(cluster: Cluster, parameter_context: ParameterContext, current_parameter_contexts_json_dict: dict):
+    if parameter_context.name in current_parameter_contexts_json_dict:
+        _update(cluster, parameter_context, current_parameter_contexts_json_dict[parameter_context.name])
+    else:
+        _create(cluster, parameter_context)
+
+
 def _create(cluster: Cluster, parameter_context: ParameterContext):
     logger = logging.getLogger(__name__)
 
@@ -59,12 +82,13 @@ def _create(cluster: Cluster, parameter_context: ParameterContext):
         })
 
     try:
-        response = requests.post(**cluster._get_connection_details('/parameter-contexts'), json=create_json)
+        response = cluster.post('/parameter-contexts', json=create_json)
         if response.status_code != 201:
             logger.warning(f'Unable to create parameter context: {parameter_context.name}, in cluster: {cluster.name}.')
             logger.warning(response.text)
             return
         parameter_context.id = response.json()['id']
+        sensitive_parameter_store.record(cluster, parameter_context.id, parameter_context.parameters)
         logger.info(f'Created parameter context: {parameter_context.name}, in cluster: {cluster.name}.')
     except requests.exceptions.RequestException as exception:
         logger.warning(f'Unable to create parameter context: {parameter_context.name}, cluster: {cluster.name}.')
@@ -76,33 +100,54 @@ def _update(cluster: Cluster, parameter_context: ParameterContext, current_param
 
     parameter_context.id = current_parameter_context_json['id']
 
-    if (
-        parameter_context.description.lower() != current_parameter_context_json['component']['description'].lower()
-        or _did_parameters_change(parameter_context, current_parameter_context_json)
-    ):
+    added, changed, removed = _diff_parameters(cluster, parameter_context, current_parameter_context_json)
+    description_changed = parameter_context.description.lower() != current_parameter_context_json['component']['description'].lower()
+
+    if description_changed or len(added) > 0 or len(changed) > 0 or len(removed) > 0:
+        logger.info(
+            f'Parameter context: {parameter_context.name}, in cluster: {cluster.name}, '
+            f'parameters added: {len(added)}, changed: {len(changed)}, removed: {len(removed)}.')
+
         url = '/' + url_helper.construct_path_parts(['parameter-contexts', parameter_context.id, 'update-requests'])
         current_parameter_context_json['component']['description'] = parameter_context.description
-        current_parameter_context_json['component']['parameters'] = []
 
-        for parameter in parameter_context.parameters:
-            current_parameter_context_json['component']['parameters'].append({
+        # only the parameters that differ are sent, nifi keeps the others and revalidates less components
+        current_parameter_context_json['component']['parameters'] = [
+            {
                 'parameter': {
                     'name': parameter.name,
                     'description': parameter.description,
                     'sensitive': parameter.is_sensitive,
                     'value': parameter.value
                 }
-            })
+            }
+            for parameter in added + changed
+        ] + [
+            {
+                'parameter': {
+                    'name': name,
+                    'value': None
+                }
+            }
+            for name in removed
+        ]
 
         try:
-            response = requests.post(**cluster._get_connection_details(url), json=current_parameter_context_json)
+            response = cluster.post(url, json=current_parameter_context_json)
             if response.status_code != 200:
                 logger.warning(response.text)
                 return
-            logger.info(f'Updated parameter context: {parameter_context.name}, in cluster: {cluster.name}.')
         except requests.exceptions.RequestException as exception:
             logger.warning(f'Unable to update parameter context: {parameter_context.name}, in cluster: {cluster.name}.')
             logger.warning(exception)
+            return
+
+        # environments are bound to the context later on, the update has to be finished by then
+        request_json = response.json()['request']
+        request_url = '/' + url_helper.construct_path_parts(['parameter-contexts', parameter_context.id, 'update-requests', request_json['requestId']])
+        if update_request_service.track(cluster, request_url, request_json, f'Update of parameter context: {parameter_context.name}'):
+            sensitive_parameter_store.record(cluster, parameter_context.id, parameter_context.parameters)
+            logger.info(f'Updated parameter context: {parameter_context.name}, in cluster: {cluster.name}.')
 
     else:
         logger.info(f'Parameter context: {parameter_context.name}, in cluster: {cluster.name}, is up-to-date.')
@@ -114,33 +159,50 @@ def _delete(cluster: Cluster, delete_parameter_context_json):
 
     delete_url = '/' + url_helper.construct_path_parts(['parameter-contexts', delete_parameter_context_json['component']['id']])
     try:
-        response = requests.delete(
-            **cluster._get_connection_details(delete_url),
+        response = cluster.delete(
+            delete_url,
             params={'version': str(delete_parameter_context_json['revision']['version'])})
         if response.status_code != 200:
             logger.warning(f'Unable to delete parameter context: {parameter_context_name}, from cluster: {cluster.name}.')
             logger.warning(response.text)
             return
+        sensitive_parameter_store.forget(cluster, delete_parameter_context_json['component']['id'])
         logger.info(f'Deleted parameter context: {parameter_context_name}, from cluster: {cluster.name}.')
     except requests.exceptions.RequestException as exception:
         logger.warning(f'Unable to delete parameter context: {parameter_context_name}, from cluster: {cluster.name}.')
         logger.warning(exception)
 
 
-def _did_parameters_change(parameter_context: ParameterContext, current_parameter_context_json):
-    if len(parameter_context.parameters) != len(current_parameter_context_json['component']['parameters']):
-        return True
+def _diff_parameters(cluster: Cluster, parameter_context: ParameterContext, current_parameter_context_json):
+    """Return the configured parameters that are added, the configured parameters that changed and the names of removed parameters."""
+    current_parameters_json_dict = {
+        p['parameter']['name'].lower(): p['parameter'] for p in current_parameter_context_json['component']['parameters']
+    }
+    configured_parameter_names = {parameter.name.lower() for parameter in parameter_context.parameters}
 
+    added = []
+    changed = []
     for parameter in parameter_context.parameters:
-        parameters = [
-            p for p in current_parameter_context_json['component']['parameters']
-            if p['parameter']['name'].lower() == parameter.name.lower()
-            and p['parameter']['description'].lower() == parameter.description.lower()
-            and p['parameter']['sensitive'] == parameter.is_sensitive
-            and str(p['parameter']['value']).lower() == str(parameter.value).lower()
-        ]
+        current_parameter_json = current_parameters_json_dict.get(parameter.name.lower(), None)
+        if current_parameter_json is None:
+            added.append(parameter)
+        elif _did_parameter_change(cluster, current_parameter_context_json['id'], parameter, current_parameter_json):
+            changed.append(parameter)
+
+    removed = [p['name'] for k, p in current_parameters_json_dict.items() if not (k in configured_parameter_names)]
+
+    return added, changed, removed
+
+
+def _did_parameter_change(cluster: Cluster, parameter_context_id: str, parameter: Parameter, current_parameter_json) -> bool:
+    if (
+        str(current_parameter_json['description']).lower() != str(parameter.description).lower()
+        or current_parameter_json['sensitive'] != parameter.is_sensitive
+    ):
+        return True
 
-        if len(parameters) == 0:
-            return True
+    # nifi masks sensitive values, they are compared with the last value applied by the coordinator
+    if parameter.is_sensitive:
+        return not sensitive_parameter_store.is_applied(cluster, parameter_context_id, parameter)
 
-    return False
+    return str(current_parameter_json['value']).lower() != str(parameter.value).lower()
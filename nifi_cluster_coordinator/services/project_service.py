@@ -1,34 +1,54 @@
 import logging
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
 import requests
 import utils.url_helper as url_helper
+import utils.concurrency_helper as concurrency_helper
+import utils.name_helper as name_helper
 import services.environment_service as environment_service
 from configuration.cluster import Cluster
 from configuration.project import Project
 
 
-def sync(cluster: Cluster, configured_projects: list, parameter_contexts: list):
-    """Set the cluster projects to their desired configuration."""
+def sync(cluster: Cluster, configured_projects: list, parameter_contexts: list, scope: set = None):
+    """Set the cluster projects to their desired configuration, limited to the projects named in the scope."""
     logger = logging.getLogger(__name__)
 
     desired_projects = list(filter(lambda p: len([c for c in p.clusters if c.name.lower() == cluster.name.lower()]) > 0, configured_projects))
 
     logger.info(f'Collecting currently configure projects for cluster: {cluster.name}')
-    response = requests.get(
-        **cluster._get_connection_details(
-            '/' + url_helper.construct_path_parts(['process-groups', cluster.root_process_group_id, 'process-groups']))).json()
+    response = cluster.get(
+        '/' + url_helper.construct_path_parts(['process-groups', cluster.root_process_group_id, 'process-groups'])).json()
     current_projects_json_dict = {project['component']['name']: project for project in response['processGroups']}
 
-    for delete_project_name in list(filter(lambda k: len([p for p in desired_projects if p.name.lower() == k.lower()]) == 0, current_projects_json_dict.keys())):
-        _delete(cluster, current_projects_json_dict[delete_project_name])
+    for delete_project_name in name_helper.missing_names(current_projects_json_dict.keys(), [p.name for p in desired_projects]):
+        if _in_scope(scope, delete_project_name):
+            _delete(cluster, current_projects_json_dict[delete_project_name])
+
+    # projects are independent of each other, each one creates its process group before its environments
+    # the environments of all projects share one pool, so at most max_parallel_projects of them sync at once
+    with ThreadPoolExecutor(
+        max_workers=max(cluster.max_parallel_projects, 1),
+        thread_name_prefix=threading.current_thread().name
+    ) as environment_executor:
+        concurrency_helper.map_bounded(
+            lambda desired_project: _sync_project(cluster, desired_project, current_projects_json_dict, parameter_contexts, environment_executor),
+            list(filter(lambda p: _in_scope(scope, p.name), desired_projects)),
+            cluster.max_parallel_projects)
+
+
+def _sync_project(cluster: Cluster, desired_project: Project, current_projects_json_dict: dict, parameter_contexts: list, environment_executor: Executor):
+    if desired_project.name in current_projects_json_dict:
+        _update(cluster, desired_project, current_projects_json_dict[desired_project.name], parameter_contexts, environment_executor)
+    else:
+        _create(cluster, desired_project, parameter_contexts, environment_executor)
+
 
-    for desired_project in desired_projects:
-        if desired_project.name in current_projects_json_dict:
-            _update(cluster, desired_project, current_projects_json_dict[desired_project.name], parameter_contexts)
-        else:
-            _create(cluster, desired_project, parameter_contexts)
+def _in_scope(scope: set, name: str) -> bool:
+    return scope is None or name.lower() in scope
 
 
-def _create(cluster: Cluster, project: Project, parameter_contexts: list):
+def _create(cluster: Cluster, project: Project, parameter_contexts: list, environment_executor: Executor = None):
     logger = logging.getLogger(__name__)
 
     project_cluster = project.get_project_cluster(cluster)
@@ -48,7 +68,7 @@ def _create(cluster: Cluster, project: Project, parameter_contexts: list):
     }
 
     try:
-        response = requests.post(**cluster._get_connection_details(post_url), json=create_json)
+        response = cluster.post(post_url, json=create_json)
         if response.status_code != 201:
             logger.warning(response.text)
             return
@@ -59,11 +79,10 @@ def _create(cluster: Cluster, project: Project, parameter_contexts: list):
         logger.warning(exception)
         return
 
-    _get_available_versions(cluster, project)
-    environment_service.sync(cluster, project, project_cluster, parameter_contexts)
+    environment_service.sync(cluster, project, project_cluster, parameter_contexts, environment_executor)
 
 
-def _update(cluster: Cluster, project: Project, current_project_json, parameter_contexts: list):
+def _update(cluster: Cluster, project: Project, current_project_json, parameter_contexts: list, environment_executor: Executor = None):
     logger = logging.getLogger(__name__)
 
     project_cluster = project.get_project_cluster(cluster)
@@ -77,7 +96,7 @@ def _update(cluster: Cluster, project: Project, current_project_json, parameter_
         put_url = '/' + url_helper.construct_path_parts(['process-groups', project_cluster.project_process_group_id])
         current_project_json['component']['comments'] = project.description
         try:
-            response = requests.put(**cluster._get_connection_details(put_url), json=current_project_json)
+            response = cluster.put(put_url, json=current_project_json)
             if response.status_code != 200:
                 logger.warning(response.text)
                 return
@@ -90,8 +109,7 @@ def _update(cluster: Cluster, project: Project, current_project_json, parameter_
     else:
         logger.info(f'Project: {project.name}, in cluster: {cluster.name}, is up-to-date.')
 
-    _get_available_versions(cluster, project)
-    environment_service.sync(cluster, project, project_cluster, parameter_contexts)
+    environment_service.sync(cluster, project, project_cluster, parameter_contexts, environment_executor)
 
 
 def _delete(cluster: Cluster, delete_project_json):
@@ -100,8 +118,8 @@ def _delete(cluster: Cluster, delete_project_json):
 
     delete_url = '/' + url_helper.construct_path_parts(['process-groups', delete_project_json['component']['id']])
     try:
-        response = requests.delete(
-            **cluster._get_connection_details(delete_url),
+        response = cluster.delete(
+            delete_url,
             params={'version': str(delete_project_json['revision']['version'])})
         if response.status_code != 200:
             logger.warning(response.text)
@@ -110,24 +128,3 @@ def _delete(cluster: Cluster, delete_project_json):
     except requests.exceptions.RequestException as exception:
         logger.warning(f'Unable to delete project: {project_name}, will try again later.')
         logger.warning(exception)
-
-
-def _get_available_versions(cluster: Cluster, project: Project):
-    logger = logging.getLogger(__name__)
-
-    if not(project.registry_name in cluster.registeries_json_dict):
-        logger.warning(f'Unable to find registry: {project.registry_name}, in cluster: {cluster.name}.')
-        return
-
-    registry_json = cluster.registeries_json_dict[project.registry_name]
-    url = '/' + url_helper.construct_path_parts(['flow', 'registries', registry_json['id'], 'buckets', project.bucket_id, 'flows', project.flow_id, 'versions'])
-
-    try:
-        response = requests.get(**cluster._get_connection_details(url))
-        if response.status_code != 200:
-            logger.info(f'Unable to get flow versions for project: {project.name}, Response: {response.text}')
-            return
-        project.available_versions_dict = {version['versionedFlowSnapshotMetadata']['version']: version for version in response.json()['versionedFlowSnapshotMetadataSet']}
-    except requests.exceptions.RequestException as exception:
-        logger.warning(f'Unable to get flow versions for project: {project.name}.')
-        logger.warning(exception)
\ No newline at end of file
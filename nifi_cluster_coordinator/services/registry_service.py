@@ -13,7 +13,7 @@ def sync(cluster: Cluster, configured_registries: list):
     logger = logging.getLogger(__name__)
 
     logger.info(f'Collecting currently configure registries for cluster: {cluster.name}')
-    cluster_registries_json = requests.get(**cluster._get_connection_details('/controller/registry-clients')).json()
+    cluster_registries_json = cluster.get('/controller/registry-clients').json()
 
     # Build dictionaries for the desired registry configuration & the current registry configuration.
     # The dictionaries are indexed by name to support efficient lookups & comparisons.
@@ -31,7 +31,7 @@ def sync(cluster: Cluster, configured_registries: list):
         else:
             _update(cluster, desired_registry, current_registry_json)
 
-    cluster_registries_json = requests.get(**cluster._get_connection_details('/controller/registry-clients')).json()
+    cluster_registries_json = cluster.get('/controller/registry-clients').json()
     cluster.registeries_json_dict = {registry['component']['name']: registry for registry in cluster_registries_json['registries']}
 
 
@@ -45,7 +45,7 @@ def _create(cluster: Cluster, registry: Registry):
     }
 
     try:
-        response = requests.post(**cluster._get_connection_details('/controller/registry-clients'), json=data)
+        response = cluster.post('/controller/registry-clients', json=data)
         logger.debug(response.text)
         if response.status_code != 201:
             # NiFi clusters which are not configured with keystore/truststores cannot be configured
@@ -66,8 +66,8 @@ def _update(cluster: Cluster, registry: Registry, current_registry_json):
         logger.warning(f'Registry details mismatch for {registry.name} and {cluster.name}, updating.')
         current_registry_json['component']['uri'] = registry.uri
         try:
-            response = requests.put(
-                **cluster._get_connection_details(f'/controller/registry-clients/{current_registry_json["id"]}'),
+            response = cluster.put(
+                f'/controller/registry-clients/{current_registry_json["id"]}',
                 json=current_registry_json)
             logger.debug(response.text)
         except requests.exceptions.RequestException as exception:
@@ -79,8 +79,8 @@ def _delete(cluster: Cluster, registry: Registry):
     logger = logging.getLogger(__name__)
     logger.info(f'Deleting registry with id {registry["id"]}')
     try:
-        response = requests.delete(
-            **cluster._get_connection_details(f'/controller/registry-clients/{registry["id"]}'),
+        response = cluster.delete(
+            f'/controller/registry-clients/{registry["id"]}',
             params={'version': registry['revision']['version']})
         logger.debug(response.text)
     except requests.exceptions.RequestException as exception:
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import logging
+import os
+import secrets
+import threading
+from configuration.cluster import Cluster
+from configuration.parameter_context import Parameter
+
+# NiFi masks sensitive values, the digest of the last applied value tells whether a secret has to be sent again.
+store_file = None
+
+_store = {'salt': secrets.token_hex(16), 'clusters': {}}
+_store_lock = threading.Lock()
+
+
+def init_sensitive_parameter_store(file: str):
+    """Load the digests of applied sensitive parameters from the file, kept in memory only when no file is given."""
+    global store_file, _store
+    logger = logging.getLogger(__name__)
+
+    with _store_lock:
+        store_file = file
+        _store = {'salt': secrets.token_hex(16), 'clusters': {}}
+        if store_file is None or not os.path.isfile(store_file):
+            return
+        try:
+            with open(store_file, 'r') as stream:
+                loaded = json.load(stream)
+            if 'salt' in loaded and 'clusters' in loaded:
+                _store = loaded
+        except (OSError, ValueError) as exception:
+            logger.warning(f'Unable to read sensitive parameter store: {store_file}, every sensitive parameter will be applied again.')
+            logger.warning(exception)
+
+
+def is_applied(cluster: Cluster, parameter_context_id: str, parameter: Parameter) -> bool:
+    """Return True if the configured value of the sensitive parameter is the last value applied to the cluster."""
+    with _store_lock:
+        digests = _store['clusters'].get(cluster.name, {}).get(parameter_context_id, {})
+        return digests.get(parameter.name.lower(), None) == _digest(parameter)
+
+
+def record(cluster: Cluster, parameter_context_id: str, parameters: list):
+    """Remember the values of the sensitive parameters applied to the parameter context."""
+    with _store_lock:
+        _store['clusters'].setdefault(cluster.name, {})[parameter_context_id] = {
+            p.name.lower(): _digest(p) for p in parameters if p.is_sensitive
+        }
+        _save()
+
+
+def forget(cluster: Cluster, parameter_context_id: str):
+    with _store_lock:
+        if _store['clusters'].get(cluster.name, {}).pop(parameter_context_id, None) is not None:
+            _save()
+
+
+def _digest(parameter: Parameter) -> str:
+    return hashlib.sha256(f'{_store["salt"]}:{parameter.value}'.encode('utf-8')).hexdigest()
+
+
+def _save():
+    logger = logging.getLogger(__name__)
+    if store_file is None:
+        return
+
+    # written next to the store and renamed, a crash never leaves a half written file behind
+    # only the owner may read it, the salt is stored next to the digests it protects
+    temporary_file = store_file + '.tmp'
+    try:
+        with os.fdopen(os.open(temporary_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as stream:
+            json.dump(_store, stream)
+        os.replace(temporary_file, store_file)
+    except OSError as exception:
+        logger.warning(f'Unable to write sensitive parameter store: {store_file}.')
+        logger.warning(exception)
@@ -0,0 +1,29 @@
+import logging
+import utils.url_helper as url_helper
+from configuration.cluster import Cluster
+from configuration.tenant_snapshot import TenantSnapshot
+
+
+def load_snapshot(cluster: Cluster) -> TenantSnapshot:
+    """Fetch the coordinator user, users and user groups of the cluster for the current reconcile."""
+    logger = logging.getLogger(__name__)
+
+    logger.info(f'Getting coordinator user for cluster: {cluster.name}')
+    current_user_identity = cluster.get(
+        '/' + url_helper.construct_path_parts(['flow', 'current-user'])).json()['identity']
+
+    logger.info(f'Collecting currently configured users and user groups for cluster: {cluster.name}')
+    users_json = cluster.get(
+        '/' + url_helper.construct_path_parts(['tenants', 'users'])).json()
+    user_groups_json = cluster.get(
+        '/' + url_helper.construct_path_parts(['tenants', 'user-groups'])).json()
+
+    cluster.tenant_snapshot = TenantSnapshot(current_user_identity, users_json['users'], user_groups_json['userGroups'])
+    return cluster.tenant_snapshot
+
+
+def get_snapshot(cluster: Cluster) -> TenantSnapshot:
+    """Return the tenant snapshot of the current reconcile, fetching it when it was not loaded yet."""
+    if cluster.tenant_snapshot is None:
+        return load_snapshot(cluster)
+    return cluster.tenant_snapshot
@@ -0,0 +1,78 @@
+import logging
+import time
+import requests
+from configuration.cluster import Cluster
+
+# NiFi processes update requests asynchronously, the request is polled with a growing interval until it completes.
+initial_poll_interval = 0.5
+
+max_poll_interval = 10
+
+request_timeout = 900
+
+
+def track(cluster: Cluster, request_endpoint: str, request_json, description: str) -> bool:
+    """Wait for an asynchronous update request to complete, then delete it.
+
+    :param cluster:
+        Cluster that processes the request.
+    :param request_endpoint:
+        API endpoint of the update request, used to poll and to delete it.
+    :param request_json:
+        The request as returned when it was submitted.
+    :param description:
+        Description of the update used in the log.
+    :returns:
+        True if the request completed without a failure.
+    """
+    logger = logging.getLogger(__name__)
+
+    started = time.monotonic()
+    poll_interval = initial_poll_interval
+    try:
+        while not request_json['complete']:
+            if time.monotonic() - started > request_timeout:
+                logger.warning(f'{description} did not complete within {request_timeout} s, in cluster: {cluster.name}.')
+                _delete(cluster, request_endpoint, description)
+                cluster.record_failure()
+                return False
+
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, max_poll_interval)
+
+            response = cluster.get(request_endpoint)
+            if response.status_code != 200:
+                logger.warning(f'Unable to get the status of: {description}, in cluster: {cluster.name}.')
+                logger.warning(response.text)
+                cluster.record_failure()
+                return False
+            request_json = response.json()['request']
+            logger.debug(f'{description}: {request_json.get("percentCompleted", 0)}% {request_json.get("state", "")}')
+
+    except requests.exceptions.RequestException as exception:
+        logger.warning(f'Unable to get the status of: {description}, in cluster: {cluster.name}.')
+        logger.warning(exception)
+        return False
+
+    _delete(cluster, request_endpoint, description)
+
+    duration = time.monotonic() - started
+    if request_json.get('failureReason'):
+        logger.warning(f'{description} failed after {duration:.1f} s, in cluster: {cluster.name}: {request_json["failureReason"]}')
+        cluster.record_failure()
+        return False
+
+    logger.info(f'{description} completed in {duration:.1f} s, in cluster: {cluster.name}.')
+    return True
+
+
+def _delete(cluster: Cluster, request_endpoint: str, description: str):
+    logger = logging.getLogger(__name__)
+    try:
+        response = cluster.delete(request_endpoint)
+        if response.status_code != 200:
+            logger.warning(f'Unable to delete the update request of: {description}, in cluster: {cluster.name}.')
+            logger.warning(response.text)
+    except requests.exceptions.RequestException as exception:
+        logger.warning(f'Unable to delete the update request of: {description}, in cluster: {cluster.name}.')
+        logger.warning(exception)
@@ -1,40 +1,34 @@
 import logging
 import requests
 import utils.url_helper as url_helper
+import services.tenant_service as tenant_service
 from configuration.cluster import Cluster
-from configuration.security import User
+from configuration.security import Security, User, identity_key
 
 
-def sync(cluster: Cluster, configured_users: list):
+def sync(cluster: Cluster, security: Security):
     """Set the cluster users to desired configuration."""
     logger = logging.getLogger(__name__)
 
-    logger.info(f'Getting coordinator user for cluster: {cluster.name}')
-    response = requests.get(
-        **cluster._get_connection_details(
-            '/' + url_helper.construct_path_parts(['flow', 'current-user']))).json()
-    current_user_identity = response['identity']
+    tenant_snapshot = tenant_service.get_snapshot(cluster)
+    current_user_identity = tenant_snapshot.current_user_identity
 
-    desired_users = configured_users
-    if len([u for u in desired_users if u.identity.lower() == current_user_identity.lower()]) == 0:
-        desired_users.append(User(current_user_identity))
+    if security.find_user(current_user_identity) is None:
+        security.add_user(User(current_user_identity))
+    desired_users = security.users
 
     logger.info(f'Collecting currently configured users for cluster: {cluster.name}')
-    response = requests.get(
-        **cluster._get_connection_details(
-            '/' + url_helper.construct_path_parts(['tenants', 'users']))).json()
-    current_users_json_dict = {user['component']['identity']: user for user in response['users']}
-
-    for delete_user_name in list(
-        filter(
-            lambda k: current_user_identity.lower() != k.lower() and len([
-                u for u in desired_users if u.identity.lower() == k.lower()
-            ]) == 0, current_users_json_dict.keys())):
-        _delete(cluster, current_users_json_dict[delete_user_name])
+    current_users_json_dict = dict(tenant_snapshot.users_json_dict)
+
+    for delete_user_key in [
+        k for k in current_users_json_dict.keys()
+        if k not in security.users_by_identity
+    ]:
+        _delete(cluster, current_users_json_dict[delete_user_key])
 
     for user in desired_users:
-        if user.identity in current_users_json_dict:
-            _update(cluster, user, current_users_json_dict[user.identity])
+        if identity_key(user.identity) in current_users_json_dict:
+            _update(cluster, user, current_users_json_dict[identity_key(user.identity)])
         else:
             _create(cluster, user)
 
@@ -52,9 +46,8 @@ def _create(cluster: Cluster, user: User):
     }
 
     try:
-        response = requests.post(
-            **cluster._get_connection_details(
-                '/' + url_helper.construct_path_parts(['tenants', 'users'])), json=create_json)
+        response = cluster.post(
+            '/' + url_helper.construct_path_parts(['tenants', 'users']), json=create_json)
         if response.status_code != 201:
             logger.warning(f'Unable to create user: {user.identity}, in cluster: {cluster.name}.')
             logger.warning(response.text)
@@ -63,6 +56,7 @@ def _create(cluster: Cluster, user: User):
         response_json = response.json()
         user.component_id = response_json['id']
         user.revision_version = response_json['revision']['version']
+        cluster.tenant_snapshot.set_user(response_json)
         logger.info(f'Created user: {user.identity}, in cluster: {cluster.name}.')
     except requests.exceptions.RequestException as exception:
         logger.warning(f'Unable to create user: {user.identity}, cluster: {cluster.name}.')
@@ -83,13 +77,14 @@ def _delete(cluster: Cluster, delete_user_json):
 
     delete_url = '/' + url_helper.construct_path_parts(['tenants', 'users', delete_user_json['id']])
     try:
-        response = requests.delete(
-            **cluster._get_connection_details(delete_url),
+        response = cluster.delete(
+            delete_url,
             params={'version': str(delete_user_json['revision']['version'])})
         if response.status_code != 200:
             logger.warning(f'Unable to delete user: {user_identity}, from cluster: {cluster.name}.')
             logger.warning(response.text)
             return
+        cluster.tenant_snapshot.remove_user(user_identity)
         logger.info(f'Deleted user: {user_identity}, from cluster: {cluster.name}.')
     except requests.exceptions.RequestException as exception:
         logger.warning(f'Unable to delete user: {user_identity}, from cluster: {cluster.name}.')
@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+import requests
+
+closed_state = 'closed'
+open_state = 'open'
+half_open_state = 'half-open'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling a cluster whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops calling a cluster after consecutive failed or slow calls, until a trial call succeeds after a cooldown.
+
+    :param name:
+        Name of the cluster used in the log.
+    :param failure_threshold:
+        Number of consecutive failed calls that opens the circuit.
+    :param cooldown:
+        Seconds the circuit stays open before a single trial call is let through.
+    :param slow_call_seconds:
+        Calls that take longer count as failed, None to only count errors.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown: float, slow_call_seconds: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.slow_call_seconds = slow_call_seconds
+        self.state = closed_state
+        self._consecutive_failures = 0
+        self._opened_at = None
+        # bumped whenever the circuit opens, outcomes of calls let through before that are ignored
+        self._generation = 0
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> tuple:
+        """Return the ticket of the call to pass on to record, raise CircuitOpenError if the call may not be made."""
+        with self._lock:
+            if self.state == closed_state:
+                return (self._generation, False)
+            if self.state == open_state and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = half_open_state
+            # while half-open a single trial call decides whether the circuit closes again
+            if self.state == half_open_state and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return (self._generation, True)
+        raise CircuitOpenError(f'Circuit of cluster: {self.name}, is open, call skipped.')
+
+    def record(self, succeeded: bool, duration: float, ticket: tuple = None):
+        """Record the outcome of a call that was let through.
+
+        Without a ticket the outcome counts as that of the latest call, with one, only the trial call resolves the
+        half-open circuit and calls let through before the circuit last opened are ignored.
+        """
+        logger = logging.getLogger(__name__)
+        failed = not succeeded or (not (self.slow_call_seconds is None) and duration > self.slow_call_seconds)
+
+        with self._lock:
+            if not (ticket is None):
+                generation, trial = ticket
+                if generation != self._generation or (self.state != closed_state and not trial):
+                    return
+            if self.state != closed_state:
+                self._trial_in_progress = False
+            if not failed:
+                if self.state != closed_state:
+                    logger.info(f'Circuit of cluster: {self.name}, closed again.')
+                self.state = closed_state
+                self._consecutive_failures = 0
+                return
+
+            self._consecutive_failures += 1
+            if self.state == half_open_state or (self.state == closed_state and self._consecutive_failures >= self.failure_threshold):
+                logger.warning(
+                    f'Circuit of cluster: {self.name}, opened after {self._consecutive_failures} failed calls, '
+                    f'calls fail fast for {self.cooldown} s.')
+                self.state = open_state
+                self._opened_at = time.monotonic()
+                self._generation += 1
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == open_state and time.monotonic() - self._opened_at < self.cooldown
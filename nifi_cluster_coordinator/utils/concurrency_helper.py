@@ -0,0 +1,67 @@
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, List, Tuple
+import utils.phase_profiler as phase_profiler
+
+
+def map_bounded(function: Callable, items: Iterable, max_workers: int, executor: Executor = None) -> List:
+    """Return the results of applying function to every item, running at most max_workers calls at once.
+
+    Calls run inline when max_workers is 1 or less, which keeps the sequential behaviour (and log ordering).
+    Worker threads are named after the calling thread so log lines keep the caller's context.
+    The first exception raised by a call is re-raised once every call has finished.
+    Calls on worker threads are profiled as part of the phase of the calling thread.
+    With an executor the calls run on its workers instead, which bound them together with every other call submitted
+    to it, max_workers is ignored then.
+    """
+    items = list(items)
+    if not (executor is None):
+        futures = [executor.submit(phase_profiler.bind(function), item) for item in items]
+        wait(futures)
+        return [future.result() for future in futures]
+
+    if max_workers is None or max_workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(items)),
+        thread_name_prefix=threading.current_thread().name
+    ) as executor:
+        futures = [executor.submit(phase_profiler.bind(function), item) for item in items]
+    return [future.result() for future in futures]
+
+
+def run_dependent(tasks: Dict[str, Tuple[Iterable[str], Callable]]):
+    """Run named tasks as soon as the tasks they depend on have finished, independent tasks run at the same time.
+
+    Dependencies on names that are not among the tasks are ignored. Once a task raises no further task is started,
+    the first exception is re-raised after the running tasks have finished.
+    """
+    dependencies = {name: set(d for d in task[0] if d in tasks) for name, task in tasks.items()}
+    finished = set()
+    running = {}
+    first_exception = None
+
+    if len(tasks) == 0:
+        return
+
+    with ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix=threading.current_thread().name) as executor:
+        while True:
+            if first_exception is None:
+                for name in [n for n in tasks if not (n in finished) and not (n in running.values()) and dependencies[n] <= finished]:
+                    running[executor.submit(phase_profiler.bind(tasks[name][1]))] = name
+
+            if len(running) == 0:
+                break
+
+            done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+            for future in done:
+                finished.add(running.pop(future))
+                if first_exception is None and not (future.exception() is None):
+                    first_exception = future.exception()
+
+        if first_exception is None and len(finished) < len(tasks):
+            raise ValueError(f'Tasks with unmet dependencies: {sorted(set(tasks.keys()) - finished)}')
+
+    if not (first_exception is None):
+        raise first_exception
@@ -0,0 +1,190 @@
+import json
+import logging
+import re
+import threading
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the latency histogram buckets, slower calls land in an extra overflow bucket.
+latency_buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+# Written after every reconcile when set.
+summary_file = None
+
+# Endpoints of the NiFi API the services call, ids and resources are folded into placeholders.
+endpoint_templates = [
+    (r'/process-groups/root', '/process-groups/root'),
+    (r'/process-groups/[^/]+', '/process-groups/{id}'),
+    (r'/process-groups/[^/]+/process-groups', '/process-groups/{id}/process-groups'),
+    (r'/controller/registry-clients/[^/]+', '/controller/registry-clients/{id}'),
+    (r'/tenants/users/[^/]+', '/tenants/users/{id}'),
+    (r'/tenants/user-groups/[^/]+', '/tenants/user-groups/{id}'),
+    (r'/policies/[^/]+', '/policies/{id}'),
+    (r'/policies/[^/]+/.+', '/policies/{action}/{resource}'),
+    (r'/parameter-contexts/[^/]+', '/parameter-contexts/{id}'),
+    (r'/parameter-contexts/[^/]+/update-requests', '/parameter-contexts/{id}/update-requests'),
+    (r'/parameter-contexts/[^/]+/update-requests/[^/]+', '/parameter-contexts/{id}/update-requests/{request-id}'),
+    (r'/versions/update-requests/process-groups/[^/]+', '/versions/update-requests/process-groups/{id}'),
+    (r'/versions/update-requests/[^/]+', '/versions/update-requests/{request-id}'),
+    (r'/versions/process-groups/[^/]+', '/versions/process-groups/{id}'),
+    (r'/flow/registries/[^/]+/buckets/[^/]+/flows/[^/]+/versions', '/flow/registries/{registry-id}/buckets/{bucket-id}/flows/{flow-id}/versions')
+]
+
+_endpoint_patterns = [(re.compile(pattern), template) for pattern, template in endpoint_templates]
+_recorders = []
+_recorders_lock = threading.Lock()
+
+
+class EndpointMetrics:
+    """Calls of one cluster to one endpoint template with one method."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.status_codes = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bucket_counts = [0] * (len(latency_buckets) + 1)
+
+    def record(self, status_code: int, seconds: float, bytes_sent: int, bytes_received: int):
+        status = 'error' if status_code is None else str(status_code)
+        self.calls += 1
+        if status_code is None or status_code >= 400:
+            self.errors += 1
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bucket_counts[_bucket_index(seconds)] += 1
+
+    def percentile_seconds(self, percentile: float) -> float:
+        """Return the upper bound of the bucket the percentile falls in, the slowest call for the overflow bucket."""
+        rank = percentile * self.calls
+        seen = 0
+        for i, count in enumerate(self.bucket_counts):
+            seen += count
+            if seen >= rank and count > 0:
+                return latency_buckets[i] if i < len(latency_buckets) else self.max_seconds
+        return self.max_seconds
+
+
+class HttpMetrics:
+    """API calls per cluster, method and endpoint template, collected while the recorder is registered."""
+
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, cluster_name: str, method: str, template: str, status_code: int, seconds: float, bytes_sent: int, bytes_received: int):
+        with self._lock:
+            self.endpoints.setdefault((cluster_name, method, template), EndpointMetrics()).record(status_code, seconds, bytes_sent, bytes_received)
+
+    def summary(self) -> str:
+        """Return a table of the endpoints, the ones that took the most time first."""
+        with self._lock:
+            rows = sorted(self.endpoints.items(), key=lambda item: item[1].seconds, reverse=True)
+            lines = [
+                f'{"cluster":<20} {"method":<6} {"endpoint":<60} {"calls":>6} {"errors":>6} {"total s":>8} '
+                f'{"mean ms":>8} {"p95 ms":>8} {"max ms":>8} {"sent KB":>8} {"recv KB":>8}  statuses'
+            ]
+            for (cluster_name, method, template), metrics in rows:
+                lines.append(
+                    f'{cluster_name:<20} {method:<6} {template:<60} {metrics.calls:>6} {metrics.errors:>6} {metrics.seconds:>8.2f} '
+                    f'{metrics.seconds / metrics.calls * 1000:>8.1f} {metrics.percentile_seconds(0.95) * 1000:>8.0f} {metrics.max_seconds * 1000:>8.1f} '
+                    f'{metrics.bytes_sent / 1024:>8.1f} {metrics.bytes_received / 1024:>8.1f}  '
+                    + ' '.join(f'{status}:{count}' for status, count in sorted(metrics.status_codes.items())))
+            calls = sum(m.calls for m in self.endpoints.values())
+            lines.append(f'{calls} calls, {sum(m.errors for m in self.endpoints.values())} errors, {sum(m.seconds for m in self.endpoints.values()):.2f} s waiting on NiFi.')
+            return '\n'.join(lines)
+
+    def to_json(self) -> list:
+        with self._lock:
+            return [
+                {
+                    'cluster': cluster_name,
+                    'method': method,
+                    'endpoint': template,
+                    'calls': metrics.calls,
+                    'errors': metrics.errors,
+                    'status_codes': dict(metrics.status_codes),
+                    'bytes_sent': metrics.bytes_sent,
+                    'bytes_received': metrics.bytes_received,
+                    'seconds': metrics.seconds,
+                    'max_seconds': metrics.max_seconds,
+                    'latency_buckets': {str(bound): count for bound, count in zip(latency_buckets + ['+Inf'], metrics.bucket_counts)}
+                }
+                for (cluster_name, method, template), metrics in sorted(self.endpoints.items())
+            ]
+
+
+def init_http_metrics(file: str):
+    """Set the file the metrics of every reconcile are written to, None to only log them."""
+    global summary_file
+    summary_file = file
+
+
+def add_recorder(recorder: HttpMetrics):
+    with _recorders_lock:
+        _recorders.append(recorder)
+
+
+def remove_recorder(recorder: HttpMetrics):
+    with _recorders_lock:
+        _recorders.remove(recorder)
+
+
+@contextmanager
+def recording():
+    """Collect the API calls made while the block runs."""
+    recorder = HttpMetrics()
+    add_recorder(recorder)
+    try:
+        yield recorder
+    finally:
+        remove_recorder(recorder)
+
+
+def record(cluster_name: str, method: str, endpoint: str, status_code: int, seconds: float, bytes_sent: int = 0, bytes_received: int = 0):
+    """Add an API call to every registered recorder, a status code of None stands for a call that got no response."""
+    with _recorders_lock:
+        recorders = list(_recorders)
+    if len(recorders) == 0:
+        return
+    template = endpoint_template(endpoint)
+    for recorder in recorders:
+        recorder.record(cluster_name, method, template, status_code, seconds, bytes_sent, bytes_received)
+
+
+def report(recorder: HttpMetrics):
+    """Log the summary table of the recorder and write it to the summary file when one is set."""
+    logger = logging.getLogger(__name__)
+    if len(recorder.endpoints) == 0:
+        return
+
+    logger.info(f'API calls of the reconcile:\n{recorder.summary()}')
+    if summary_file is None:
+        return
+    try:
+        with open(summary_file, 'w') as stream:
+            json.dump(recorder.to_json(), stream, indent=2)
+    except OSError as exception:
+        logger.warning(f'Unable to write the API call metrics to: {summary_file}.')
+        logger.warning(exception)
+
+
+def endpoint_template(endpoint: str) -> str:
+    """Return the endpoint with its ids folded into placeholders, like /policies/{action}/{resource}."""
+    path = endpoint.split('?', 1)[0]
+    for pattern, template in _endpoint_patterns:
+        if pattern.fullmatch(path):
+            return template
+    return path
+
+
+def _bucket_index(seconds: float) -> int:
+    for i, bound in enumerate(latency_buckets):
+        if seconds <= bound:
+            return i
+    return len(latency_buckets)
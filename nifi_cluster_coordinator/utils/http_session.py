@@ -0,0 +1,61 @@
+import ssl
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SSLContextAdapter(HTTPAdapter):
+    """HTTP adapter that hands a single pre-built SSL context to every pooled connection.
+
+    The client certificate and CA bundle are loaded into the context once, instead of
+    being re-read from disk for every new connection the pool opens.
+    """
+
+    def __init__(self, ssl_context: ssl.SSLContext, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs['ssl_context'] = self.ssl_context
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_kwargs['ssl_context'] = self.ssl_context
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+    def cert_verify(self, conn, url, verify, cert):
+        # The certificates already live in the shared context, loading them again per connection defeats the point.
+        conn.cert_reqs = 'CERT_REQUIRED'
+        conn.ca_certs = None
+        conn.ca_cert_dir = None
+        conn.cert_file = None
+        conn.key_file = None
+
+
+def create_ssl_context(ssl_cert_file: str, ssl_key_file: str, ssl_ca_cert: str) -> ssl.SSLContext:
+    """Return an SSL context loaded with the client certificate and the CA certificate."""
+    ssl_context = ssl.create_default_context(cafile=ssl_ca_cert)
+    ssl_context.load_cert_chain(certfile=ssl_cert_file, keyfile=ssl_key_file)
+    return ssl_context
+
+
+def create_session(pool_size: int, ssl_context: ssl.SSLContext = None) -> requests.Session:
+    """Return a keep-alive session with a connection pool of the given size.
+
+    :param pool_size:
+        Maximum number of connections kept open per host.
+    :param ssl_context:
+        Optional SSL context used for every https connection of the session.
+    :returns:
+        requests.Session object.
+    """
+    session = requests.Session()
+    session.headers['Connection'] = 'keep-alive'
+
+    if ssl_context is None:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    else:
+        adapter = SSLContextAdapter(ssl_context, pool_connections=1, pool_maxsize=pool_size)
+
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
@@ -0,0 +1,47 @@
+import collections
+import math
+import threading
+
+
+class LatencyTracker:
+    """Keeps the latencies of the most recent calls and derives read timeouts from them.
+
+    :param max_timeout:
+        Configured read timeout, an adapted timeout never exceeds it.
+    :param min_timeout:
+        Lowest adapted timeout, so short hiccups on a fast cluster do not fail calls.
+    :param multiplier:
+        Headroom applied on top of the observed percentile.
+    :param percentile:
+        Percentile of the recent latencies the timeout is derived from.
+    :param sample_size:
+        Number of recent calls kept, the configured timeout applies until this many calls were observed.
+    """
+
+    def __init__(self, max_timeout: float, min_timeout: float = 10, multiplier: float = 4, percentile: float = 0.99, sample_size: int = 100):
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.multiplier = multiplier
+        self.percentile = percentile
+        self.sample_size = sample_size
+        self._latencies = collections.deque(maxlen=sample_size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def percentile_latency(self) -> float:
+        """Return the configured percentile of the recent latencies, None before enough calls were observed."""
+        with self._lock:
+            if len(self._latencies) < self.sample_size:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, math.ceil(self.percentile * len(latencies)) - 1)]
+
+    def read_timeout(self) -> float:
+        """Return the read timeout for the next call."""
+        percentile_latency = self.percentile_latency()
+        if percentile_latency is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, percentile_latency * self.multiplier))
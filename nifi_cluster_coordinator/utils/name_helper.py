@@ -0,0 +1,9 @@
+def name_key(name: str) -> str:
+    """Return the case-folded key names and identities are matched by."""
+    return name.casefold()
+
+
+def missing_names(names, configured_names) -> list:
+    """Return the names without a case-insensitive match in the configured names, in their original order."""
+    configured_keys = {name_key(name) for name in configured_names}
+    return [name for name in names if not (name_key(name) in configured_keys)]
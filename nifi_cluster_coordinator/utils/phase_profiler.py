@@ -0,0 +1,167 @@
+import cProfile
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+import utils.http_metrics as http_metrics
+
+# Folder the profile dumps are written to, phases are only profiled once it is set.
+profile_folder = None
+enabled = False
+
+_lock = threading.Lock()
+_phases = {}
+_local = threading.local()
+
+
+class PhaseProfile:
+    """Time spent in one phase of one cluster, summed over the threads that worked for the phase."""
+
+    def __init__(self):
+        self.runs = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.http_seconds = 0.0
+        self.http_calls = 0
+        self.stats = None
+
+
+class _HttpRecorder:
+    """Adds the API calls to the phase the calling thread works for."""
+
+    def record(self, cluster_name: str, method: str, template: str, status_code: int, seconds: float, bytes_sent: int, bytes_received: int):
+        phase_profile = getattr(_local, 'phase', None)
+        if phase_profile is None:
+            return
+        with _lock:
+            phase_profile.http_calls += 1
+            phase_profile.http_seconds += seconds
+
+
+_http_recorder = _HttpRecorder()
+
+
+def init_phase_profiler(folder: str):
+    """Profile every phase and write the dumps to the folder, None to stop profiling."""
+    global profile_folder, enabled
+    with _lock:
+        _phases.clear()
+        if enabled:
+            http_metrics.remove_recorder(_http_recorder)
+        # loading a configuration folder changes the working directory
+        profile_folder = None if folder is None else os.path.abspath(folder)
+        enabled = not (folder is None)
+        if enabled:
+            os.makedirs(folder, exist_ok=True)
+            http_metrics.add_recorder(_http_recorder)
+
+
+@contextmanager
+def phase(cluster_name: str, name: str):
+    """Profile the block as a phase of the cluster, None as cluster name for work that is not bound to a cluster."""
+    if not enabled:
+        yield
+        return
+
+    with _lock:
+        phase_profile = _phases.setdefault((cluster_name, name), PhaseProfile())
+        phase_profile.runs += 1
+    started = time.perf_counter()
+    try:
+        with _thread_profile(phase_profile):
+            yield
+    finally:
+        with _lock:
+            phase_profile.wall_seconds += time.perf_counter() - started
+
+
+def bind(function):
+    """Return the function profiled for the phase of the calling thread, for work handed over to other threads."""
+    phase_profile = getattr(_local, 'phase', None) if enabled else None
+    if phase_profile is None:
+        return function
+
+    def run(*args, **kwargs):
+        with _thread_profile(phase_profile):
+            return function(*args, **kwargs)
+    return run
+
+
+def summary() -> str:
+    """Return a table of the phases, the ones that took the longest first.
+
+    Time waiting on NiFi and CPU time are summed over the threads of a phase, so both exceed the wall time of phases
+    that make calls at the same time.
+    """
+    with _lock:
+        rows = sorted(_phases.items(), key=lambda item: item[1].wall_seconds, reverse=True)
+        lines = [f'{"cluster":<20} {"phase":<28} {"runs":>5} {"wall s":>8} {"calls":>6} {"http s":>8} {"cpu s":>8}  http share']
+        for (cluster_name, name), phase_profile in rows:
+            busy_seconds = phase_profile.http_seconds + phase_profile.cpu_seconds
+            http_share = phase_profile.http_seconds / busy_seconds * 100 if busy_seconds > 0 else 0
+            lines.append(
+                f'{cluster_name or "-":<20} {name:<28} {phase_profile.runs:>5} {phase_profile.wall_seconds:>8.2f} {phase_profile.http_calls:>6} '
+                f'{phase_profile.http_seconds:>8.2f} {phase_profile.cpu_seconds:>8.2f}  {http_share:>9.0f}%')
+        return '\n'.join(lines)
+
+
+def report():
+    """Log the summary table, write a profile dump per phase and start over."""
+    logger = logging.getLogger(__name__)
+    if not enabled:
+        return
+
+    logger.info(f'Time spent per phase, waiting on NiFi (http) and in the coordinator (cpu):\n{summary()}')
+    with _lock:
+        phases = list(_phases.items())
+        _phases.clear()
+
+    for (cluster_name, name), phase_profile in phases:
+        if phase_profile.stats is None:
+            continue
+        file = os.path.join(profile_folder, _dump_file_name(cluster_name, name))
+        try:
+            phase_profile.stats.dump_stats(file)
+        except OSError as exception:
+            logger.warning(f'Unable to write the profile of phase: {name}, to: {file}.')
+            logger.warning(exception)
+
+
+@contextmanager
+def _thread_profile(phase_profile: PhaseProfile):
+    # a thread that is already profiled, like a task run inline, keeps its profiler and its phase
+    if not (getattr(_local, 'phase', None) is None):
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # from python 3.12 on one profiler sees every thread and no second one can start, the thread is only timed
+        profiler = None
+    _local.phase = phase_profile
+    started = time.thread_time()
+    try:
+        yield
+    finally:
+        cpu_seconds = time.thread_time() - started
+        _local.phase = None
+        stats = None
+        if not (profiler is None):
+            profiler.disable()
+            stats = pstats.Stats(profiler)
+        with _lock:
+            phase_profile.cpu_seconds += cpu_seconds
+            if not (stats is None) and phase_profile.stats is None:
+                phase_profile.stats = stats
+            elif not (stats is None):
+                phase_profile.stats.add(stats)
+
+
+def _dump_file_name(cluster_name: str, name: str) -> str:
+    file_name = name if cluster_name is None else f'{cluster_name}-{name}'
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', file_name) + '.prof'
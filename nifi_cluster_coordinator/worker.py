@@ -1,46 +1,255 @@
+import copy
 import logging
+import threading
+import time
+from contextlib import contextmanager
+from configuration.cluster import Cluster
 from configuration.config_loader import Configuration
+from configuration.config_diff import ClusterPlan
+from utils.circuit_breaker import CircuitOpenError
+import configuration.config_diff as config_diff
 import services.registry_service as registry_service
 import services.project_service as project_service
 import services.parameter_context_service as parameter_context_service
 import services.user_service as user_service
 import services.user_group_service as user_group_service
 import services.access_policy_service as access_policy_service
+import services.tenant_service as tenant_service
+import services.drift_service as drift_service
+import utils.concurrency_helper as concurrency_helper
+import utils.http_metrics as http_metrics
+import utils.phase_profiler as phase_profiler
+import cluster_prober
+import metrics_exporter
 
 
-def process(configuration: Configuration):
+class ReconcileCancelled(Exception):
+    """Raised at a phase boundary when a newer configuration supersedes the reconcile in progress."""
+
+
+# Phases a phase relies on, for the ids they resolve or the components they create.
+phase_dependencies = {
+    config_diff.registries_phase: [],
+    config_diff.users_phase: [],
+    config_diff.user_groups_phase: [config_diff.users_phase],
+    config_diff.global_policies_phase: [config_diff.users_phase, config_diff.user_groups_phase],
+    config_diff.parameter_contexts_phase: [],
+    config_diff.projects_phase: [config_diff.registries_phase, config_diff.parameter_contexts_phase],
+    config_diff.component_policies_phase: [
+        config_diff.users_phase,
+        config_diff.user_groups_phase,
+        config_diff.global_policies_phase,
+        config_diff.projects_phase
+    ]
+}
+
+
+def process(configuration: Configuration, max_parallel_clusters: int = 1, cancel_event: threading.Event = None, plans: dict = None) -> bool:
+    """Reconcile the clusters, returns True when all planned clusters were reachable and reconciled.
+
+    Without plans every phase of every cluster runs, otherwise only the clusters and phases in the plans of a cluster name.
+    """
+    return all(process_clusters(configuration, max_parallel_clusters, cancel_event, plans).values())
+
+
+def process_clusters(configuration: Configuration, max_parallel_clusters: int = 1, cancel_event: threading.Event = None, plans: dict = None) -> dict:
+    """Reconcile the clusters, returns for the name of every planned cluster whether it was reachable and fully reconciled."""
+    logger = logging.getLogger(__name__)
+
+    clusters = configuration.clusters if plans is None else list(filter(lambda c: c.name in plans, configuration.clusters))
+
+    # the API calls of the run are summed up per endpoint and reported once the run is over
+    with http_metrics.recording() as run_metrics:
+        try:
+            return _process_clusters(configuration, clusters, max_parallel_clusters, cancel_event, plans)
+
+        except Exception as exception:
+            logger.warning(exception)
+            return {cluster.name: False for cluster in clusters}
+
+        finally:
+            http_metrics.report(run_metrics)
+            phase_profiler.report()
+
+
+def _process_clusters(configuration: Configuration, clusters: list, max_parallel_clusters: int, cancel_event: threading.Event, plans: dict) -> dict:
     logger = logging.getLogger(__name__)
 
+    if len(clusters) == 0:
+        logger.info('No cluster is affected by the configuration changes.')
+        return {}
+
+    if configuration.security.is_coordinated:
+        access_policy_service.init_access_policies_descriptors()
+
+    # Probe every cluster at once so dead clusters only cost one timeout in total.
+    concurrency_helper.map_bounded(lambda cluster: _probe_cluster(cluster, configuration), clusters, len(clusters))
+
+    reachable_clusters = list(filter(lambda c: c.is_reachable, clusters))
+    reconciled = concurrency_helper.map_bounded(
+        lambda cluster: _process_cluster(cluster, configuration, cancel_event, None if plans is None else plans[cluster.name]),
+        reachable_clusters,
+        max_parallel_clusters)
+
+    results = {cluster.name: False for cluster in clusters}
+    results.update(zip([c.name for c in reachable_clusters], reconciled))
+    return results
+
+
+def _process_cluster(cluster: Cluster, configuration: Configuration, cancel_event: threading.Event = None, plan: ClusterPlan = None) -> bool:
+    """Reconcile a single cluster, returns False when the cluster could not be fully reconciled."""
+    logger = logging.getLogger(__name__)
+    started = time.monotonic()
+    failures = cluster.failures
     try:
-        if configuration.security.is_coordinated:
-            access_policy_service.init_access_policies_descriptors()
+        reconciled = _reconcile_cluster(cluster, configuration, cancel_event, plan)
+    finally:
+        # users and groups change out of band between runs, the snapshot is only shared by the phases of one run
+        cluster.tenant_snapshot = None
+        drift_service.discard(cluster)
+    if reconciled and cluster.failures > failures:
+        logger.warning(f'{cluster.failures - failures} change(s) failed in cluster: {cluster.name}, it is reconciled in full next time.')
+        reconciled = False
+    metrics_exporter.observe_reconcile(cluster.name, reconciled, time.monotonic() - started)
+    return reconciled
 
-        for cluster in configuration.clusters:
-            cluster.test_connectivity()
 
-        for cluster in list(filter(lambda c: c.is_reachable, configuration.clusters)):
-            logger.info(f'Setting registry clients for cluster: {cluster.name}')
-            registry_service.sync(cluster, configuration.registries)
+def _reconcile_cluster(cluster: Cluster, configuration: Configuration, cancel_event: threading.Event, plan: ClusterPlan) -> bool:
+    logger = logging.getLogger(__name__)
+    plan = ClusterPlan() if plan is None else plan
 
-            if configuration.security.is_coordinated:
-                logger.info(f'Setting users for cluster: {cluster.name}')
-                user_service.sync(cluster, configuration.security.users)
+    # The services record cluster specific ids on the configured objects, each cluster works on its own copy.
+    security = copy.deepcopy(configuration.security)
+    parameter_contexts = copy.deepcopy(configuration.parameter_contexts)
+    projects = copy.deepcopy(configuration.projects)
 
-                logger.info(f'Setting user groups for cluster: {cluster.name}')
-                user_group_service.sync(cluster, configuration.security.user_groups, configuration.security.users)
+    def run_phase(name: str, description: str, sync):
+        def run():
+            _check_phase_boundary(cancel_event, cluster)
+            logger.info(f'Setting {description} for cluster: {cluster.name}')
+            started = time.monotonic()
+            with phase_profiler.phase(cluster.name, name):
+                sync()
+            metrics_exporter.observe_phase(cluster.name, name, time.monotonic() - started)
+        return run
 
-                logger.info(f'Setting global access policies for cluster: {cluster.name}')
-                access_policy_service.sync_global_policies(cluster, configuration.security)
+    def sync_users():
+        tenant_service.load_snapshot(cluster)
+        user_service.sync(cluster, security)
 
-            logger.info(f'Setting parameter contexts for cluster: {cluster.name}')
-            parameter_context_service.sync(cluster, configuration.parameter_contexts)
+    phases = {
+        config_diff.registries_phase: (
+            'registry clients', lambda: registry_service.sync(cluster, configuration.registries)),
+        config_diff.parameter_contexts_phase: (
+            'parameter contexts', lambda: parameter_context_service.sync(cluster, parameter_contexts, plan.parameter_context_scope)),
+        config_diff.projects_phase: (
+            'projects', lambda: project_service.sync(cluster, projects, parameter_contexts, plan.project_scope))
+    }
+    if security.is_coordinated:
+        phases.update({
+            config_diff.users_phase: ('users', sync_users),
+            config_diff.user_groups_phase: (
+                'user groups', lambda: user_group_service.sync(cluster, security)),
+            config_diff.global_policies_phase: (
+                'global access policies', lambda: access_policy_service.sync_global_policies(cluster, security)),
+            config_diff.component_policies_phase: (
+                'component access policies', lambda: access_policy_service.sync_component_policies(cluster, security, projects))
+        })
 
-            logger.info(f'Setting projects for cluster: {cluster.name}')
-            project_service.sync(cluster, configuration.projects, configuration.parameter_contexts)
+    with _cluster_log_context(cluster):
+        try:
+            # phases that do not depend on each other run at the same time
+            concurrency_helper.run_dependent({
+                name: (phase_dependencies[name], run_phase(name, description, sync))
+                for name, (description, sync) in phases.items() if plan.includes(name)
+            })
 
-            if configuration.security.is_coordinated:
-                logger.info(f'Setting component access policies for cluster: {cluster.name}')
-                access_policy_service.sync_component_policies(cluster, configuration.security, configuration.projects)
+            _check_phase_boundary(None, cluster)
+            drift_service.record(cluster, plan)
+
+        except CircuitOpenError as exception:
+            logger.warning(f'Unable to reconcile cluster: {cluster.name}, it fails too many calls, will try again later.')
+            logger.warning(exception)
+            return False
+
+        except ReconcileCancelled:
+            logger.info(f'Reconcile of cluster: {cluster.name}, superseded by a newer configuration.')
+            return False
+
+        except Exception as exception:
+            logger.warning(f'Unable to reconcile cluster: {cluster.name}, will try again later.')
+            logger.warning(exception)
+            return False
+
+    return True
+
+
+def resync(configuration: Configuration, max_parallel_clusters: int = 1, cancel_event: threading.Event = None, cluster_names: list = None) -> dict:
+    """Reconcile the sections of the clusters that drifted since they were last reconciled.
+
+    Returns for the name of every cluster that drifted whether its drift was reconciled. Unreachable clusters are left
+    to the cluster prober which reconciles each of them once it answers again.
+    """
+    logger = logging.getLogger(__name__)
+
+    clusters = configuration.clusters if cluster_names is None else list(filter(lambda c: c.name in cluster_names, configuration.clusters))
+    try:
+        concurrency_helper.map_bounded(lambda cluster: _probe_cluster(cluster, configuration), clusters, len(clusters))
+        reachable_clusters = list(filter(lambda c: c.is_reachable, clusters))
+
+        # fingerprints are a handful of reads per cluster, all clusters are checked at once
+        sections = concurrency_helper.map_bounded(drift_service.changed_sections, reachable_clusters, len(reachable_clusters))
+        plans = {
+            cluster.name: drift_service.drift_plan(cluster_sections)
+            for cluster, cluster_sections in zip(reachable_clusters, sections) if len(cluster_sections) > 0
+        }
+        if len(plans) == 0:
+            logger.info('No drift detected.')
+            return {}
+
+        return process_clusters(configuration, max_parallel_clusters, cancel_event, plans)
 
     except Exception as exception:
         logger.warning(exception)
+        return {cluster.name: False for cluster in clusters}
+
+
+def _check_phase_boundary(cancel_event: threading.Event, cluster: Cluster = None):
+    if not (cancel_event is None) and cancel_event.is_set():
+        raise ReconcileCancelled()
+    # the services log failed calls and carry on, an open circuit stops the cluster at the next phase instead
+    if not (cluster is None) and cluster.circuit_breaker.is_open():
+        raise CircuitOpenError(f'Circuit of cluster: {cluster.name}, is open.')
+
+
+def _probe_cluster(cluster: Cluster, configuration: Configuration) -> bool:
+    logger = logging.getLogger(__name__)
+    with _cluster_log_context(cluster):
+        try:
+            reachable = cluster.test_connectivity()
+        except Exception as exception:
+            # an unexpected answer, like a page that is not json, only rules out this cluster
+            logger.warning(f'Unable to probe cluster: {cluster.name}, treating it as unreachable.')
+            logger.warning(exception)
+            cluster.is_reachable = False
+            reachable = False
+        metrics_exporter.set_reachable(cluster.name, reachable)
+        if reachable:
+            cluster_prober.forget(cluster)
+            return True
+
+    # the cluster is reconciled on its own as soon as a background probe reaches it again
+    cluster_prober.watch(cluster, configuration)
+    return False
+
+
+@contextmanager
+def _cluster_log_context(cluster: Cluster):
+    """Name the current thread after the cluster so every log line of the pass carries the cluster name."""
+    thread = threading.current_thread()
+    previous_name = thread.name
+    thread.name = cluster.name
+    try:
+        yield
+    finally:
+        thread.name = previous_name
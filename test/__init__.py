@@ -1,3 +1,4 @@
+import importlib
 import os
 import sys
 PROJECT_PATH = os.getcwd()
@@ -5,3 +6,12 @@ SOURCE_PATH = os.path.join(
     PROJECT_PATH, 'nifi_cluster_coordinator'
 )
 sys.path.append(SOURCE_PATH)
+
+
+def coordinator_module(name: str):
+    """Return a module of the coordinator the way its own modules import it.
+
+    The coordinator imports its modules as top level packages, importing one through nifi_cluster_coordinator
+    gives a second copy whose state the coordinator never sees.
+    """
+    return importlib.import_module(name)
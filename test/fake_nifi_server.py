@@ -0,0 +1,677 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+base_api_path = '/nifi-api'
+
+masked_value = '********'
+
+# Global policies the initial admin of a new NiFi instance holds.
+initial_admin_policies = [
+    ('flow', 'read'),
+    ('controller', 'read'),
+    ('controller', 'write'),
+    ('tenants', 'read'),
+    ('tenants', 'write'),
+    ('policies', 'read'),
+    ('policies', 'write')
+]
+
+
+class FakeNifiError(Exception):
+    """Raised by a route to answer the call with an error status."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+class FakeNifiServer:
+    """In-process stand-in for the NiFi REST API the coordinator talks to.
+
+    Components carry revisions that are checked and bumped like NiFi does, parameter context and version updates
+    are asynchronous update requests, and every call can be slowed down or failed to mimic a loaded cluster.
+
+    :param latency:
+        Seconds every call is delayed before it is handled.
+    :param failure_rate:
+        Fraction of the calls that fail with a 503 instead of being handled.
+    :param update_request_duration:
+        Seconds an update request takes before it completes.
+    :param update_request_failure:
+        Failure reason every update request completes with instead of applying its changes, None to apply them.
+    :param flow_versions:
+        Number of versions every flow in the registry has.
+    :param current_user:
+        Identity of the initial admin the coordinator connects as.
+    :param seed:
+        Seed of the random generator that picks the failing calls.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        failure_rate: float = 0,
+        update_request_duration: float = 0,
+        update_request_failure: str = None,
+        flow_versions: int = 3,
+        current_user: str = 'coordinator',
+        seed: int = None
+    ):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.update_request_duration = update_request_duration
+        self.update_request_failure = update_request_failure
+        self.flow_versions = flow_versions
+        self.current_user = current_user
+        self.calls = Counter()
+        self.endpoint_calls = Counter()
+        # most calls to an endpoint that were in flight at once
+        self.peak_concurrent_calls = Counter()
+        self._in_flight_calls = Counter()
+        # TCP connections the coordinator opened to the server
+        self.connections = 0
+        # endpoints, like 'POST /tenants/users', whose calls are rejected with a 409 like NiFi rejects a stale change
+        self.rejected_endpoints = set()
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._server = None
+        self._thread = None
+
+        self.process_groups = {}
+        self.registry_clients = {}
+        self.users = {}
+        self.user_groups = {}
+        self.policies = {}
+        self.parameter_contexts = {}
+        self.update_requests = {}
+
+        self.root_process_group_id = self._add(self.process_groups, {'name': 'NiFi Flow', 'comments': '', 'parentGroupId': None})['id']
+        admin_id = self._add(self.users, {'identity': current_user})['id']
+        for resource, action in initial_admin_policies:
+            self._add(self.policies, {'resource': '/' + resource, 'action': action, 'users': [admin_id], 'userGroups': []})
+        for action in ['read', 'write']:
+            self._add(self.policies, {
+                'resource': f'/process-groups/{self.root_process_group_id}', 'action': action, 'users': [admin_id], 'userGroups': []})
+
+        self._routes = [
+            ('GET', 'flow/current-user', self._get_current_user),
+            ('GET', 'flow/parameter-contexts', self._get_parameter_contexts),
+            ('GET', 'flow/registries/{}/buckets/{}/flows/{}/versions', self._get_flow_versions),
+            ('GET', 'process-groups/{}', self._get_process_group),
+            ('PUT', 'process-groups/{}', self._put_process_group),
+            ('DELETE', 'process-groups/{}', self._delete_process_group),
+            ('GET', 'process-groups/{}/process-groups', self._get_child_process_groups),
+            ('POST', 'process-groups/{}/process-groups', self._post_process_group),
+            ('GET', 'controller/registry-clients', self._get_registry_clients),
+            ('POST', 'controller/registry-clients', self._post_registry_client),
+            ('PUT', 'controller/registry-clients/{}', self._put_registry_client),
+            ('DELETE', 'controller/registry-clients/{}', self._delete_registry_client),
+            ('GET', 'tenants/users', self._get_users),
+            ('POST', 'tenants/users', self._post_user),
+            ('DELETE', 'tenants/users/{}', self._delete_user),
+            ('GET', 'tenants/user-groups', self._get_user_groups),
+            ('POST', 'tenants/user-groups', self._post_user_group),
+            ('PUT', 'tenants/user-groups/{}', self._put_user_group),
+            ('DELETE', 'tenants/user-groups/{}', self._delete_user_group),
+            ('POST', 'policies', self._post_policy),
+            ('PUT', 'policies/{}', self._put_policy),
+            ('DELETE', 'policies/{}', self._delete_policy),
+            ('GET', 'policies/{}/{*}', self._get_policy),
+            ('POST', 'parameter-contexts', self._post_parameter_context),
+            ('DELETE', 'parameter-contexts/{}', self._delete_parameter_context),
+            ('POST', 'parameter-contexts/{}/update-requests', self._post_parameter_context_update_request),
+            ('GET', 'parameter-contexts/{}/update-requests/{}', self._get_update_request),
+            ('DELETE', 'parameter-contexts/{}/update-requests/{}', self._delete_update_request),
+            ('POST', 'versions/update-requests/process-groups/{}', self._post_version_update_request),
+            ('GET', 'versions/update-requests/{}', self._get_update_request),
+            ('DELETE', 'versions/update-requests/{}', self._delete_update_request),
+            ('DELETE', 'versions/process-groups/{}', self._delete_version_control)
+        ]
+        self._routes = [(method, path, _route_pattern(path), handler) for method, path, handler in self._routes]
+
+    @property
+    def host_name(self) -> str:
+        """Return the host name a cluster entry of the configuration points at."""
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _handler_class(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-nifi', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if not (self._server is None):
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def handle(self, method: str, path: str, query: dict, body) -> tuple:
+        """Answer an API call, returns the status code and the json of the response."""
+        endpoint, handler, arguments = self._route(method, path)
+        key = f'{method} /{endpoint}'
+        with self._lock:
+            self.calls[method] += 1
+            self.endpoint_calls[key] += 1
+            self._in_flight_calls[key] += 1
+            self.peak_concurrent_calls[key] = max(self.peak_concurrent_calls[key], self._in_flight_calls[key])
+            failed = self.failure_rate > 0 and self._random.random() < self.failure_rate
+        try:
+            if key in self.rejected_endpoints:
+                return 409, {'message': 'Injected rejection.'}
+            return self._answer(handler, arguments, method, path, query, body, failed)
+        finally:
+            with self._lock:
+                self._in_flight_calls[key] -= 1
+
+    def _answer(self, handler, arguments: tuple, method: str, path: str, query: dict, body, failed: bool) -> tuple:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if failed:
+            return 503, {'message': 'Injected failure.'}
+
+        if handler is None:
+            return 404, {'message': f'No route for {method} {path}.'}
+        try:
+            with self._lock:
+                return handler(*arguments, query=query, body=body)
+        except FakeNifiError as error:
+            return error.status_code, {'message': error.message}
+        except (KeyError, TypeError, ValueError) as exception:
+            return 400, {'message': f'Malformed request: {exception}'}
+
+    def _route(self, method: str, path: str) -> tuple:
+        """Return the endpoint template, the handler and the path arguments of a call."""
+        for route_method, endpoint, pattern, handler in self._routes:
+            match = pattern.fullmatch(path)
+            if route_method == method and not (match is None):
+                return endpoint, handler, match.groups()
+        return path, None, ()
+
+    # -- flow
+
+    def _get_current_user(self, query, body):
+        return 200, {'identity': self.current_user}
+
+    def _get_flow_versions(self, registry_id, bucket_id, flow_id, query, body):
+        self._find(self.registry_clients, registry_id)
+        return 200, {
+            'versionedFlowSnapshotMetadataSet': [
+                {
+                    'registryId': registry_id,
+                    'versionedFlowSnapshotMetadata': {'bucketIdentifier': bucket_id, 'flowIdentifier': flow_id, 'version': version}
+                }
+                for version in range(1, self.flow_versions + 1)
+            ]
+        }
+
+    # -- process groups
+
+    def _get_process_group(self, group_id, query, body):
+        if group_id == 'root':
+            group_id = self.root_process_group_id
+        return 200, self._process_group_json(self._find(self.process_groups, group_id))
+
+    def _get_child_process_groups(self, group_id, query, body):
+        self._find(self.process_groups, group_id)
+        return 200, {
+            'processGroups': [
+                self._process_group_json(g) for g in self.process_groups.values() if g['component']['parentGroupId'] == group_id
+            ]
+        }
+
+    def _post_process_group(self, group_id, query, body):
+        self._find(self.process_groups, group_id)
+        component = {
+            'name': body['component']['name'],
+            'comments': body['component'].get('comments', ''),
+            'parentGroupId': group_id
+        }
+        if 'parameterContext' in body['component']:
+            component['parameterContextId'] = self._parameter_context_id(body['component']['parameterContext'])
+        return 201, self._process_group_json(self._add(self.process_groups, component))
+
+    def _put_process_group(self, group_id, query, body):
+        group = self._find(self.process_groups, group_id)
+        self._check_revision(group, body['revision']['version'])
+        component = body['component']
+        for key in ['name', 'comments']:
+            if key in component:
+                group['component'][key] = component[key]
+        if 'parameterContext' in component:
+            group['component']['parameterContextId'] = self._parameter_context_id(component['parameterContext'])
+        self._bump(group)
+        return 200, self._process_group_json(group)
+
+    def _delete_process_group(self, group_id, query, body):
+        group = self._find(self.process_groups, group_id)
+        self._check_revision(group, _query_version(query))
+        for child in [g for g in self.process_groups.values() if g['component']['parentGroupId'] == group_id]:
+            self._delete_process_group(child['id'], query={'version': [str(child['revision']['version'])]}, body=None)
+        for policy in [p for p in self.policies.values() if _component_id(p['component']['resource']) == group_id]:
+            del self.policies[policy['id']]
+        del self.process_groups[group_id]
+        return 200, self._process_group_json(group)
+
+    def _delete_version_control(self, group_id, query, body):
+        group = self._find(self.process_groups, group_id)
+        self._check_revision(group, _query_version(query))
+        if not ('versionControlInformation' in group['component']):
+            raise FakeNifiError(409, f'Process group {group_id} is not under version control.')
+        del group['component']['versionControlInformation']
+        self._bump(group)
+        return 200, {'processGroupRevision': dict(group['revision'])}
+
+    def _process_group_json(self, group):
+        component = {k: v for k, v in group['component'].items() if k != 'parameterContextId'}
+        component['id'] = group['id']
+        parameter_context_id = group['component'].get('parameterContextId', None)
+        if not (parameter_context_id is None) and parameter_context_id in self.parameter_contexts:
+            component['parameterContext'] = {
+                'id': parameter_context_id,
+                'component': {'id': parameter_context_id, 'name': self.parameter_contexts[parameter_context_id]['component']['name']}
+            }
+        return {'id': group['id'], 'revision': dict(group['revision']), 'component': component}
+
+    def _parameter_context_id(self, parameter_context_json):
+        if parameter_context_json is None:
+            return None
+        return self._find(self.parameter_contexts, parameter_context_json['id'])['id']
+
+    # -- registry clients
+
+    def _get_registry_clients(self, query, body):
+        return 200, {'registries': [self._entity_json(r) for r in self.registry_clients.values()]}
+
+    def _post_registry_client(self, query, body):
+        component = body['component']
+        if len([r for r in self.registry_clients.values() if r['component']['name'] == component['name']]) > 0:
+            raise FakeNifiError(409, f'A registry client named {component["name"]} already exists.')
+        registry_client = self._add(self.registry_clients, {
+            'name': component['name'], 'uri': component['uri'], 'description': component.get('description', '')})
+        return 201, self._entity_json(registry_client)
+
+    def _put_registry_client(self, registry_id, query, body):
+        registry_client = self._find(self.registry_clients, registry_id)
+        self._check_revision(registry_client, body['revision']['version'])
+        for key in ['name', 'uri', 'description']:
+            if key in body['component']:
+                registry_client['component'][key] = body['component'][key]
+        self._bump(registry_client)
+        return 200, self._entity_json(registry_client)
+
+    def _delete_registry_client(self, registry_id, query, body):
+        return self._delete(self.registry_clients, registry_id, query)
+
+    # -- tenants
+
+    def _get_users(self, query, body):
+        return 200, {'users': [self._user_json(u) for u in self.users.values()]}
+
+    def _post_user(self, query, body):
+        identity = body['component']['identity']
+        self._check_unique_identity(identity)
+        return 201, self._user_json(self._add(self.users, {'identity': identity}))
+
+    def _delete_user(self, user_id, query, body):
+        status_code, user_json = self._delete(self.users, user_id, query)
+        for entity in list(self.user_groups.values()) + list(self.policies.values()):
+            if user_id in entity['component']['users']:
+                entity['component']['users'].remove(user_id)
+                self._bump(entity)
+        return status_code, user_json
+
+    def _get_user_groups(self, query, body):
+        return 200, {'userGroups': [self._user_group_json(g) for g in self.user_groups.values()]}
+
+    def _post_user_group(self, query, body):
+        identity = body['component']['identity']
+        self._check_unique_identity(identity)
+        user_group = self._add(self.user_groups, {'identity': identity, 'users': self._tenant_ids(self.users, body['component'].get('users', []))})
+        return 201, self._user_group_json(user_group)
+
+    def _put_user_group(self, group_id, query, body):
+        user_group = self._find(self.user_groups, group_id)
+        self._check_revision(user_group, body['revision']['version'])
+        if 'identity' in body['component']:
+            user_group['component']['identity'] = body['component']['identity']
+        if 'users' in body['component']:
+            user_group['component']['users'] = self._tenant_ids(self.users, body['component']['users'])
+        self._bump(user_group)
+        return 200, self._user_group_json(user_group)
+
+    def _delete_user_group(self, group_id, query, body):
+        status_code, user_group_json = self._delete(self.user_groups, group_id, query)
+        for policy in self.policies.values():
+            if group_id in policy['component']['userGroups']:
+                policy['component']['userGroups'].remove(group_id)
+                self._bump(policy)
+        return status_code, user_group_json
+
+    def _check_unique_identity(self, identity: str):
+        if len([t for t in list(self.users.values()) + list(self.user_groups.values()) if t['component']['identity'] == identity]) > 0:
+            raise FakeNifiError(409, f'A user or group with identity {identity} already exists.')
+
+    def _tenant_ids(self, tenants: dict, tenants_json: list) -> list:
+        return [self._find(tenants, t['id'])['id'] for t in tenants_json]
+
+    def _tenant_reference_json(self, tenant):
+        return {
+            'id': tenant['id'],
+            'revision': dict(tenant['revision']),
+            'component': {'id': tenant['id'], 'identity': tenant['component']['identity']}
+        }
+
+    def _user_json(self, user):
+        user_json = self._entity_json(user)
+        user_json['component']['userGroups'] = [
+            self._tenant_reference_json(g) for g in self.user_groups.values() if user['id'] in g['component']['users']
+        ]
+        user_json['component']['accessPolicies'] = self._access_policy_summaries_json(user['id'], 'users')
+        return user_json
+
+    def _user_group_json(self, user_group):
+        user_group_json = self._entity_json(user_group)
+        user_group_json['component']['users'] = [self._tenant_reference_json(self.users[u]) for u in user_group['component']['users']]
+        user_group_json['component']['accessPolicies'] = self._access_policy_summaries_json(user_group['id'], 'userGroups')
+        return user_group_json
+
+    def _access_policy_summaries_json(self, tenant_id, members_key: str) -> list:
+        return [
+            {
+                'id': p['id'],
+                'revision': dict(p['revision']),
+                'component': {'id': p['id'], 'resource': p['component']['resource'], 'action': p['component']['action']}
+            }
+            for p in self.policies.values() if tenant_id in p['component'][members_key]
+        ]
+
+    # -- access policies
+
+    def _get_policy(self, action, resource, query, body):
+        resource = '/' + resource
+        while True:
+            policies = [p for p in self.policies.values() if p['component']['resource'] == resource and p['component']['action'] == action]
+            if len(policies) > 0:
+                return 200, self._policy_json(policies[0])
+            # component policies are inherited from the closest process group that overrides them
+            component_id = _component_id(resource)
+            if component_id is None or not (component_id in self.process_groups):
+                raise FakeNifiError(404, f'Unable to find access policy for {action} {resource}.')
+            parent_group_id = self.process_groups[component_id]['component']['parentGroupId']
+            if parent_group_id is None:
+                raise FakeNifiError(404, f'Unable to find access policy for {action} {resource}.')
+            resource = resource[:-len(component_id)] + parent_group_id
+
+    def _post_policy(self, query, body):
+        component = body['component']
+        if len([
+            p for p in self.policies.values()
+            if p['component']['resource'] == component['resource'] and p['component']['action'] == component['action']
+        ]) > 0:
+            raise FakeNifiError(409, f'An access policy for {component["action"]} {component["resource"]} already exists.')
+        policy = self._add(self.policies, {
+            'resource': component['resource'],
+            'action': component['action'],
+            'users': self._tenant_ids(self.users, component.get('users', [])),
+            'userGroups': self._tenant_ids(self.user_groups, component.get('userGroups', []))
+        })
+        return 201, self._policy_json(policy)
+
+    def _put_policy(self, policy_id, query, body):
+        policy = self._find(self.policies, policy_id)
+        self._check_revision(policy, body['revision']['version'])
+        if 'users' in body['component']:
+            policy['component']['users'] = self._tenant_ids(self.users, body['component']['users'])
+        if 'userGroups' in body['component']:
+            policy['component']['userGroups'] = self._tenant_ids(self.user_groups, body['component']['userGroups'])
+        self._bump(policy)
+        return 200, self._policy_json(policy)
+
+    def _delete_policy(self, policy_id, query, body):
+        policy = self._find(self.policies, policy_id)
+        self._check_revision(policy, _query_version(query))
+        del self.policies[policy_id]
+        return 200, self._policy_json(policy)
+
+    def _policy_json(self, policy):
+        policy_json = self._entity_json(policy)
+        policy_json['component']['users'] = [self._tenant_reference_json(self.users[u]) for u in policy['component']['users']]
+        policy_json['component']['userGroups'] = [self._tenant_reference_json(self.user_groups[g]) for g in policy['component']['userGroups']]
+        component_id = _component_id(policy['component']['resource'])
+        if not (component_id is None):
+            policy_json['component']['componentReference'] = {'id': component_id}
+        return policy_json
+
+    # -- parameter contexts
+
+    def _get_parameter_contexts(self, query, body):
+        return 200, {'parameterContexts': [self._parameter_context_json(c) for c in self.parameter_contexts.values()]}
+
+    def _post_parameter_context(self, query, body):
+        component = body['component']
+        if len([c for c in self.parameter_contexts.values() if c['component']['name'] == component['name']]) > 0:
+            raise FakeNifiError(409, f'A parameter context named {component["name"]} already exists.')
+        parameter_context = self._add(self.parameter_contexts, {
+            'name': component['name'],
+            'description': component.get('description', ''),
+            'parameters': {}
+        })
+        _apply_parameters(parameter_context, component.get('parameters', []))
+        return 201, self._parameter_context_json(parameter_context)
+
+    def _delete_parameter_context(self, context_id, query, body):
+        if len([g for g in self.process_groups.values() if g['component'].get('parameterContextId', None) == context_id]) > 0:
+            raise FakeNifiError(409, f'Parameter context {context_id} is bound to a process group.')
+        return self._delete(self.parameter_contexts, context_id, query)
+
+    def _post_parameter_context_update_request(self, context_id, query, body):
+        parameter_context = self._find(self.parameter_contexts, context_id)
+        self._check_revision(parameter_context, body['revision']['version'])
+        component = body['component']
+
+        def apply():
+            if 'description' in component:
+                parameter_context['component']['description'] = component['description']
+            _apply_parameters(parameter_context, component.get('parameters', []))
+            self._bump(parameter_context)
+
+        request = self._add_update_request(apply)
+        return 200, {'request': request, 'parameterContextRevision': dict(parameter_context['revision'])}
+
+    def _parameter_context_json(self, parameter_context):
+        parameter_context_json = self._entity_json(parameter_context)
+        parameter_context_json['component']['parameters'] = [
+            {'parameter': {**p, 'value': masked_value if p['sensitive'] and not (p['value'] is None) else p['value']}}
+            for p in parameter_context['component']['parameters'].values()
+        ]
+        return parameter_context_json
+
+    # -- version control
+
+    def _post_version_update_request(self, group_id, query, body):
+        group = self._find(self.process_groups, group_id)
+        self._check_revision(group, body['processGroupRevision']['version'])
+        version_control_information = body['versionControlInformation']
+        self._find(self.registry_clients, version_control_information['registryId'])
+        if not (1 <= int(version_control_information['version']) <= self.flow_versions):
+            raise FakeNifiError(404, f'Unable to find version {version_control_information["version"]} of the flow.')
+
+        def apply():
+            group['component']['versionControlInformation'] = {
+                'groupId': group_id,
+                'registryId': version_control_information['registryId'],
+                'bucketId': version_control_information['bucketId'],
+                'flowId': version_control_information['flowId'],
+                'version': version_control_information['version'],
+                'state': 'UP_TO_DATE'
+            }
+            self._bump(group)
+
+        request = self._add_update_request(apply)
+        return 200, {'request': request, 'processGroupRevision': dict(group['revision'])}
+
+    # -- update requests
+
+    def _add_update_request(self, apply) -> dict:
+        request_id = str(uuid.uuid4())
+        self.update_requests[request_id] = {
+            'submitted': time.monotonic(),
+            'apply': apply,
+            'request': {
+                'requestId': request_id,
+                'complete': False,
+                'percentCompleted': 0,
+                'state': 'Applying changes',
+                'failureReason': None
+            }
+        }
+        self._advance_update_request(request_id)
+        return dict(self.update_requests[request_id]['request'])
+
+    def _get_update_request(self, *ids, query, body):
+        request_id = ids[-1]
+        if not (request_id in self.update_requests):
+            raise FakeNifiError(404, f'Unable to find update request {request_id}.')
+        self._advance_update_request(request_id)
+        return 200, {'request': dict(self.update_requests[request_id]['request'])}
+
+    def _delete_update_request(self, *ids, query, body):
+        request_id = ids[-1]
+        if not (request_id in self.update_requests):
+            raise FakeNifiError(404, f'Unable to find update request {request_id}.')
+        self._advance_update_request(request_id)
+        return 200, {'request': dict(self.update_requests.pop(request_id)['request'])}
+
+    def _advance_update_request(self, request_id: str):
+        update_request = self.update_requests[request_id]
+        request = update_request['request']
+        if request['complete']:
+            return
+        elapsed = time.monotonic() - update_request['submitted']
+        if elapsed < self.update_request_duration:
+            request['percentCompleted'] = int(100 * elapsed / self.update_request_duration)
+            return
+        try:
+            if self.update_request_failure is None:
+                update_request['apply']()
+            else:
+                request['failureReason'] = self.update_request_failure
+        except FakeNifiError as error:
+            request['failureReason'] = error.message
+        request['complete'] = True
+        request['percentCompleted'] = 100
+        request['state'] = 'Complete'
+
+    # -- components
+
+    def _add(self, components: dict, component: dict) -> dict:
+        component_id = str(uuid.uuid4())
+        components[component_id] = {'id': component_id, 'revision': {'version': 1}, 'component': {**component, 'id': component_id}}
+        return components[component_id]
+
+    def _find(self, components: dict, component_id: str) -> dict:
+        if not (component_id in components):
+            raise FakeNifiError(404, f'Unable to find component with id {component_id}.')
+        return components[component_id]
+
+    def _delete(self, components: dict, component_id: str, query: dict) -> tuple:
+        component = self._find(components, component_id)
+        self._check_revision(component, _query_version(query))
+        del components[component_id]
+        return 200, self._entity_json(component)
+
+    def _check_revision(self, component: dict, version):
+        if int(version) != component['revision']['version']:
+            raise FakeNifiError(
+                409, f'{version} is not the most up-to-date revision. This component appears to have been modified.')
+
+    def _bump(self, component: dict):
+        component['revision']['version'] += 1
+
+    def _entity_json(self, component: dict) -> dict:
+        return json.loads(json.dumps({'id': component['id'], 'revision': component['revision'], 'component': component['component']}))
+
+
+def _handler_class(fake_nifi_server: FakeNifiServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # keep-alive calls otherwise wait on delayed acknowledgements between the header and body writes
+        disable_nagle_algorithm = True
+        wbufsize = -1
+
+        def setup(self):
+            super().setup()
+            with fake_nifi_server._lock:
+                fake_nifi_server.connections += 1
+
+        def _handle(self):
+            url = urlsplit(self.path)
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length)) if length > 0 else None
+            path = url.path[len(base_api_path):] if url.path.startswith(base_api_path) else url.path
+            status_code, response_json = fake_nifi_server.handle(self.command, path.strip('/'), parse_qs(url.query), body)
+
+            content = json.dumps(response_json).encode('utf-8')
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = _handle
+        do_POST = _handle
+        do_PUT = _handle
+        do_DELETE = _handle
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _route_pattern(path: str):
+    # {} matches one path segment, {*} the rest of the path
+    return re.compile(path.replace('{*}', '(.+)').replace('{}', '([^/]+)'))
+
+
+def _query_version(query: dict):
+    if not ('version' in query):
+        raise FakeNifiError(400, 'The revision version is required.')
+    return query['version'][0]
+
+
+def _component_id(resource: str):
+    match = re.fullmatch(r'/(?:.+/)?process-groups/([^/]+)', resource)
+    return None if match is None else match.group(1)
+
+
+def _apply_parameters(parameter_context: dict, parameters_json: list):
+    parameters = parameter_context['component']['parameters']
+    for parameter_json in parameters_json:
+        parameter = parameter_json['parameter']
+        # a parameter sent with only its name and no value is removed
+        if parameter.get('value', None) is None and not ('sensitive' in parameter):
+            parameters.pop(parameter['name'], None)
+            continue
+        parameters[parameter['name']] = {
+            'name': parameter['name'],
+            'description': parameter.get('description', ''),
+            'sensitive': parameter.get('sensitive', False),
+            'value': parameter.get('value', None)
+        }
@@ -0,0 +1,75 @@
+import unittest
+from test import coordinator_module
+from test.fake_nifi_server import FakeNifiServer
+import nifi_cluster_coordinator.worker as worker
+import nifi_cluster_coordinator.configuration.config_loader as config_loader
+
+update_request_service = coordinator_module('services.update_request_service')
+sensitive_parameter_store = coordinator_module('services.sensitive_parameter_store')
+flow_version_cache = coordinator_module('services.flow_version_cache')
+
+
+def configuration_definition(host_name, parameter_value='1', version=2):
+    """Return a configuration with one cluster, fake, on the host and a component of every kind."""
+    return {
+        'clusters': [{'name': 'fake', 'host_name': host_name, 'security': {'use_certificate': False}}],
+        'registries': [{'name': 'registry', 'host_name': 'http://registry', 'description': 'registry'}],
+        'parameter_contexts': [{
+            'name': 'context',
+            'description': 'context',
+            'is_coordinated': True,
+            'parameters': [
+                {'name': 'plain', 'description': '', 'is_sensitive': False, 'value': parameter_value},
+                {'name': 'secret', 'description': '', 'is_sensitive': True, 'value': 'password'}
+            ]
+        }],
+        'projects': [{
+            'name': 'project',
+            'description': 'project',
+            'registry_name': 'registry',
+            'bucket_id': 'bucket',
+            'flow_id': 'flow',
+            'clusters': [{
+                'cluster_name': 'fake',
+                'environments': [
+                    {'name': 'dev', 'description': 'dev', 'is_coordinated': True, 'version': version, 'parameter_context_name': 'context'},
+                    {'name': 'prod', 'description': 'prod', 'is_coordinated': True, 'version': 'latest', 'parameter_context_name': 'context'}
+                ]
+            }]
+        }],
+        'security': {
+            'is_coordinated': True,
+            'users': ['alice', 'bob'],
+            'user_groups': [{'identity': 'team', 'members': ['alice']}],
+            'global_access_policies': [{'name': 'view the UI', 'action': 'read', 'users': ['bob'], 'user_groups': ['team']}],
+            'component_access_policies': [{
+                'name': 'view the component', 'component_type': 'environment', 'component_name': 'project:dev', 'user_groups': ['team']
+            }]
+        }
+    }
+
+
+class ReconcileTestCase(unittest.TestCase):
+    """Reconciles against a fresh fake NiFi server per test, with fast update request polls and nothing cached."""
+
+    def setUp(self):
+        self.server = FakeNifiServer().start()
+        self.initial_poll_interval = update_request_service.initial_poll_interval
+        update_request_service.initial_poll_interval = 0.01
+        sensitive_parameter_store.init_sensitive_parameter_store(None)
+        flow_version_cache.clear()
+
+    def tearDown(self):
+        update_request_service.initial_poll_interval = self.initial_poll_interval
+        self.server.stop()
+
+    def _process(self, definition):
+        configuration = config_loader._build_configuration(definition)
+        try:
+            return worker.process(configuration)
+        finally:
+            for cluster in configuration.clusters:
+                cluster.close()
+
+    def _writes(self):
+        return sum(count for method, count in self.server.calls.items() if method != 'GET')
@@ -0,0 +1,24 @@
+from test.reconcile_test_case import ReconcileTestCase, configuration_definition
+
+
+class AccessPolicyServiceTests(ReconcileTestCase):
+    def test_policy_calls_stay_within_max_parallel_access_policies(self):
+        self.server.latency = 0.02
+        changed_definition = configuration_definition(self.server.host_name)
+        changed_definition['clusters'][0]['max_parallel_access_policies'] = 2
+        environments = [f'environment-{i}' for i in range(6)]
+        changed_definition['projects'][0]['clusters'][0]['environments'] = [
+            {'name': name, 'description': '', 'is_coordinated': True, 'version': 2, 'parameter_context_name': 'context'} for name in environments
+        ]
+        changed_definition['security']['component_access_policies'] = [
+            {'name': policy_name, 'component_type': 'environment', 'component_name': f'project:{name}', 'user_groups': ['team']}
+            for name in environments
+            for policy_name in ['view the component', 'modify the data']
+        ]
+
+        self.assertTrue(self._process(changed_definition))
+
+        self.assertGreaterEqual(self.server.endpoint_calls['POST /policies'], 6)
+        self.assertEqual(2, self.server.peak_concurrent_calls['GET /policies/{}/{*}'])
+        self.assertLessEqual(self.server.peak_concurrent_calls['POST /policies'], 2)
+        self.assertLessEqual(self.server.peak_concurrent_calls['PUT /policies/{}'], 2)
@@ -0,0 +1,98 @@
+import unittest
+from unittest import mock
+from parameterized import parameterized
+from nifi_cluster_coordinator.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from nifi_cluster_coordinator.utils.latency_tracker import LatencyTracker
+import nifi_cluster_coordinator.utils.circuit_breaker as circuit_breaker
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker('a', failure_threshold=3, cooldown=30)
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record(False, 0.1)
+
+        self.assertTrue(breaker.is_open())
+        self.assertRaises(CircuitOpenError, breaker.before_call)
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker('a', failure_threshold=2, cooldown=30)
+        breaker.record(False, 0.1)
+        breaker.record(True, 0.1)
+        breaker.record(False, 0.1)
+
+        self.assertEqual(circuit_breaker.closed_state, breaker.state)
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker('a', failure_threshold=1, cooldown=30, slow_call_seconds=1)
+        breaker.record(True, 2)
+
+        self.assertTrue(breaker.is_open())
+
+    @parameterized.expand([
+        (True, circuit_breaker.closed_state),
+        (False, circuit_breaker.open_state)
+    ])
+    def test_single_trial_call_after_cooldown(self, trial_succeeded, expected_state):
+        breaker = CircuitBreaker('a', failure_threshold=1, cooldown=30)
+        with mock.patch('time.monotonic', return_value=100):
+            breaker.record(False, 0.1)
+        with mock.patch('time.monotonic', return_value=131):
+            breaker.before_call()
+            self.assertRaises(CircuitOpenError, breaker.before_call)
+            breaker.record(trial_succeeded, 0.1)
+
+        self.assertEqual(expected_state, breaker.state)
+
+    def test_call_in_flight_when_the_circuit_opened_does_not_close_it(self):
+        breaker = CircuitBreaker('a', failure_threshold=2, cooldown=30)
+        in_flight_ticket = breaker.before_call()
+        for _ in range(2):
+            breaker.record(False, 0.1, breaker.before_call())
+
+        breaker.record(True, 5, in_flight_ticket)
+
+        self.assertTrue(breaker.is_open())
+
+    @parameterized.expand([
+        (True, circuit_breaker.closed_state),
+        (False, circuit_breaker.open_state)
+    ])
+    def test_only_the_trial_call_resolves_the_half_open_circuit(self, trial_succeeded, expected_state):
+        breaker = CircuitBreaker('a', failure_threshold=1, cooldown=30)
+        in_flight_tickets = [breaker.before_call(), breaker.before_call()]
+        with mock.patch('time.monotonic', return_value=100):
+            breaker.record(False, 0.1, breaker.before_call())
+        with mock.patch('time.monotonic', return_value=131):
+            trial_ticket = breaker.before_call()
+
+            breaker.record(True, 0.1, in_flight_tickets[0])
+            breaker.record(False, 0.1, in_flight_tickets[1])
+
+            self.assertEqual(circuit_breaker.half_open_state, breaker.state)
+            self.assertRaises(CircuitOpenError, breaker.before_call)
+            breaker.record(trial_succeeded, 0.1, trial_ticket)
+
+        self.assertEqual(expected_state, breaker.state)
+
+
+class LatencyTrackerTests(unittest.TestCase):
+    def test_configured_timeout_until_enough_samples(self):
+        tracker = LatencyTracker(60, sample_size=10)
+        for _ in range(9):
+            tracker.record(0.1)
+
+        self.assertEqual(60, tracker.read_timeout())
+
+    @parameterized.expand([
+        (0.1, 10),
+        (5, 20),
+        (30, 60)
+    ])
+    def test_timeout_follows_observed_latency(self, latency, expected):
+        tracker = LatencyTracker(60, min_timeout=10, multiplier=4, sample_size=10)
+        for _ in range(10):
+            tracker.record(latency)
+
+        self.assertEqual(expected, tracker.read_timeout())
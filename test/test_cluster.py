@@ -0,0 +1,144 @@
+import os
+import socket
+import tempfile
+import time
+import unittest
+import yaml
+from contextlib import contextmanager
+from test import coordinator_module
+from test.fake_nifi_server import FakeNifiServer
+import nifi_cluster_coordinator.configuration.config_loader as config_loader
+
+concurrency_helper = coordinator_module('utils.concurrency_helper')
+
+
+def _cluster(host_name: str, **settings):
+    return config_loader._build_configuration({
+        'clusters': [{'name': 'fake', 'host_name': host_name, 'security': {'use_certificate': False}, **settings}],
+        'registries': []
+    }).clusters[0]
+
+
+@contextmanager
+def _unresponsive_host():
+    """Yield the host name of a listener whose backlog is full, new connections hang until they time out."""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(0)
+    port = listener.getsockname()[1]
+    pending = []
+    try:
+        for _ in range(3):
+            connection = socket.socket()
+            connection.setblocking(False)
+            connection.connect_ex(('127.0.0.1', port))
+            pending.append(connection)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        for connection in pending:
+            connection.close()
+        listener.close()
+
+
+class ClusterTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeNifiServer().start()
+        self.cluster = _cluster(self.server.host_name, read_timeout=60, connection_pool_size=2)
+
+    def tearDown(self):
+        self.cluster.close()
+        self.server.stop()
+
+    def test_timeouts_adapt_per_endpoint(self):
+        for _ in range(100):
+            self.cluster.get(f'/process-groups/{self.server.root_process_group_id}')
+        root_process_group_id = self.server.root_process_group_id
+
+        self.assertEqual(10, self.cluster._latency_tracker('GET', '/process-groups/another-id').read_timeout())
+        self.assertEqual(60, self.cluster._latency_tracker('GET', '/flow/parameter-contexts').read_timeout())
+        self.assertEqual(60, self.cluster._latency_tracker('PUT', f'/process-groups/{root_process_group_id}').read_timeout())
+
+    def test_calls_reuse_the_pooled_connections(self):
+        for _ in range(20):
+            self.assertEqual(200, self.cluster.get('/process-groups/root').status_code)
+        self.assertEqual(1, self.server.connections)
+
+        concurrency_helper.map_bounded(lambda _: self.cluster.get('/process-groups/root'), range(40), 2)
+        self.assertLessEqual(self.server.connections, self.cluster.connection_pool_size)
+
+    def test_close_drops_the_pooled_connections(self):
+        self.cluster.get('/process-groups/root')
+        self.cluster.close()
+        self.cluster.get('/process-groups/root')
+
+        self.assertEqual(2, self.server.connections)
+
+    def test_probe_finds_a_reachable_cluster(self):
+        self.assertTrue(self.cluster.test_connectivity())
+        self.assertEqual(self.server.root_process_group_id, self.cluster.root_process_group_id)
+        self.assertIsNotNone(self.cluster.latency)
+
+    def test_probe_of_an_unreachable_cluster_fails_within_the_connect_timeout(self):
+        with _unresponsive_host() as host_name:
+            cluster = _cluster(host_name, connect_timeout=0.5, read_timeout=60)
+            try:
+                started = time.monotonic()
+                self.assertFalse(cluster.test_connectivity())
+                elapsed = time.monotonic() - started
+            finally:
+                cluster.close()
+
+        self.assertFalse(cluster.is_reachable)
+        self.assertGreaterEqual(elapsed, 0.5)
+        self.assertLess(elapsed, 2)
+
+    def test_reload_carries_on_with_the_state_of_the_cluster(self):
+        self.cluster.get('/process-groups/root')
+        self.cluster.circuit_breaker.record(False, 0)
+        reloaded_cluster = _cluster(self.server.host_name, read_timeout=30, connection_pool_size=2)
+
+        reloaded_cluster.take_over(self.cluster)
+        reloaded_cluster.get('/process-groups/root')
+
+        self.assertIs(self.cluster.circuit_breaker, reloaded_cluster.circuit_breaker)
+        self.assertEqual(1, self.server.connections)
+        self.assertEqual(30, reloaded_cluster._latency_tracker('GET', '/process-groups/root').max_timeout)
+        self.assertEqual(2, len(reloaded_cluster._latency_tracker('GET', '/process-groups/root')._latencies))
+
+    def test_reload_with_other_connection_settings_closes_the_connections(self):
+        self.cluster.get('/process-groups/root')
+        reloaded_cluster = _cluster(self.server.host_name, read_timeout=60, connection_pool_size=4)
+
+        reloaded_cluster.take_over(self.cluster)
+        reloaded_cluster.get('/process-groups/root')
+
+        self.assertIsNone(self.cluster._session)
+        self.assertEqual(2, self.server.connections)
+        self.assertIs(self.cluster.circuit_breaker, reloaded_cluster.circuit_breaker)
+
+    def test_reload_of_the_configuration_file_takes_over_the_clusters(self):
+        with tempfile.TemporaryDirectory() as folder:
+            config_file = os.path.join(folder, 'configuration.yaml')
+            with open(config_file, 'w') as stream:
+                yaml.safe_dump({
+                    'clusters': [
+                        {'name': 'fake', 'host_name': self.server.host_name, 'security': {'use_certificate': False}},
+                        {'name': 'removed', 'host_name': self.server.host_name, 'security': {'use_certificate': False}}
+                    ],
+                    'registries': []
+                }, stream)
+            configuration = config_loader.load_from_file(config_file)
+            for cluster in configuration.clusters:
+                cluster.get('/process-groups/root')
+            with open(config_file, 'w') as stream:
+                yaml.safe_dump({
+                    'clusters': [{'name': 'fake', 'host_name': self.server.host_name, 'security': {'use_certificate': False}}],
+                    'registries': []
+                }, stream)
+
+            reloaded_configuration = config_loader.load_from_file(config_file)
+
+        self.assertIs(configuration.clusters[0].circuit_breaker, reloaded_configuration.clusters[0].circuit_breaker)
+        self.assertIs(configuration.clusters[0]._session, reloaded_configuration.clusters[0]._session)
+        self.assertIsNone(configuration.clusters[1]._session)
+        reloaded_configuration.clusters[0].close()
@@ -0,0 +1,47 @@
+import threading
+import unittest
+from unittest import mock
+import nifi_cluster_coordinator.cluster_prober as cluster_prober
+
+
+class FakeCluster:
+    def __init__(self, name, unreachable_probes):
+        self.name = name
+        self.unreachable_probes = unreachable_probes
+        self.probes = 0
+
+    def test_connectivity(self):
+        self.probes += 1
+        return self.probes > self.unreachable_probes
+
+
+class ClusterProberTests(unittest.TestCase):
+    @mock.patch.object(cluster_prober, 'max_backoff', 0.04)
+    @mock.patch.object(cluster_prober, 'initial_backoff', 0.01)
+    def test_recovered_cluster_is_handed_over_with_its_configuration(self):
+        recovered = threading.Event()
+        handed_over = []
+
+        def on_recovered(cluster, configuration):
+            handed_over.append((cluster.name, configuration))
+            recovered.set()
+            return True
+
+        cluster_prober.init_cluster_prober(on_recovered)
+        cluster = FakeCluster('a', unreachable_probes=3)
+        cluster_prober.watch(cluster, 'configuration')
+
+        self.assertTrue(recovered.wait(5))
+        self.assertEqual([('a', 'configuration')], handed_over)
+        self.assertEqual(4, cluster.probes)
+        self.assertEqual([], cluster_prober.watched_cluster_names())
+
+    @mock.patch.object(cluster_prober, 'initial_backoff', 60)
+    def test_forget_stops_probing(self):
+        cluster_prober.init_cluster_prober(lambda cluster, configuration: True)
+        cluster_prober.watch(FakeCluster('b', 0), None)
+        self.assertEqual(['b'], cluster_prober.watched_cluster_names())
+
+        cluster_prober.forget(FakeCluster('b', 0))
+
+        self.assertEqual([], cluster_prober.watched_cluster_names())
@@ -0,0 +1,120 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from parameterized import parameterized
+import nifi_cluster_coordinator.utils.concurrency_helper as concurrency_helper
+
+
+class MapBoundedTests(unittest.TestCase):
+    @parameterized.expand([
+        (None,),
+        (1,),
+        (4,),
+        (32,)
+    ])
+    def test_map_bounded_returns_results_in_order(self, max_workers):
+        result = concurrency_helper.map_bounded(lambda x: x * 2, range(10), max_workers)
+        self.assertEqual([x * 2 for x in range(10)], result)
+
+    @parameterized.expand([
+        (1,),
+        (3,)
+    ])
+    def test_map_bounded_never_exceeds_max_workers(self, max_workers):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def work(_):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        concurrency_helper.map_bounded(work, range(12), max_workers)
+        self.assertEqual(max_workers, peak[0])
+
+    def test_calls_of_several_maps_share_the_workers_of_an_executor(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def work(_):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            concurrency_helper.map_bounded(lambda _: concurrency_helper.map_bounded(work, range(4), 4, executor), range(3), 3)
+        self.assertEqual(2, peak[0])
+
+    def test_map_bounded_raises_after_all_calls_finish(self):
+        finished = []
+
+        def work(x):
+            if x == 0:
+                raise ValueError('boom')
+            time.sleep(0.01)
+            finished.append(x)
+
+        with self.assertRaises(ValueError):
+            concurrency_helper.map_bounded(work, range(4), 4)
+        self.assertEqual([1, 2, 3], sorted(finished))
+
+
+class RunDependentTests(unittest.TestCase):
+    def test_run_dependent_respects_dependencies(self):
+        lock = threading.Lock()
+        events = []
+
+        def task(name):
+            def run():
+                with lock:
+                    events.append(('start', name))
+                time.sleep(0.02)
+                with lock:
+                    events.append(('end', name))
+            return run
+
+        concurrency_helper.run_dependent({
+            'a': ([], task('a')),
+            'b': ([], task('b')),
+            'c': (['a', 'b'], task('c')),
+            'd': (['c', 'missing'], task('d'))
+        })
+
+        self.assertLess(events.index(('end', 'a')), events.index(('start', 'c')))
+        self.assertLess(events.index(('end', 'b')), events.index(('start', 'c')))
+        self.assertLess(events.index(('end', 'c')), events.index(('start', 'd')))
+        # independent tasks overlap
+        self.assertLess(events.index(('start', 'b')), events.index(('end', 'a')))
+
+    def test_run_dependent_stops_after_a_failure(self):
+        started = []
+
+        def fail():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            concurrency_helper.run_dependent({
+                'a': ([], fail),
+                'b': (['a'], lambda: started.append('b'))
+            })
+        self.assertEqual([], started)
+
+    def test_run_dependent_rejects_cycles(self):
+        with self.assertRaises(ValueError):
+            concurrency_helper.run_dependent({
+                'a': (['b'], lambda: None),
+                'b': (['a'], lambda: None)
+            })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import copy
+import unittest
+from parameterized import parameterized
+import nifi_cluster_coordinator.configuration.config_loader as config_loader
+import nifi_cluster_coordinator.configuration.config_diff as config_diff
+
+definition = {
+    'clusters': [
+        {'name': 'a', 'host_name': 'http://a', 'security': {'use_certificate': False}},
+        {'name': 'b', 'host_name': 'http://b', 'security': {'use_certificate': False}}
+    ],
+    'registries': [
+        {'name': 'registry', 'host_name': 'http://registry', 'description': ''}
+    ],
+    'parameter_contexts': [
+        {'name': 'context', 'description': '', 'is_coordinated': True, 'parameters': []}
+    ],
+    'projects': [
+        {
+            'name': 'project',
+            'description': '',
+            'registry_name': 'registry',
+            'clusters': [
+                {'cluster_name': 'a', 'environments': [{'name': 'dev', 'description': '', 'is_coordinated': True, 'version': 1}]}
+            ]
+        }
+    ],
+    'security': {
+        'is_coordinated': True,
+        'users': ['someone'],
+        'user_groups': [],
+        'global_access_policies': [],
+        'component_access_policies': []
+    }
+}
+
+
+def _configuration(change=None):
+    changed_definition = copy.deepcopy(definition)
+    if not (change is None):
+        change(changed_definition)
+    return config_loader._build_configuration(changed_definition)
+
+
+def _bump_version(d):
+    d['projects'][0]['clusters'][0]['environments'][0]['version'] = 2
+
+
+def _change_context(d):
+    d['parameter_contexts'][0]['description'] = 'changed'
+
+
+def _change_cluster(d):
+    d['clusters'][1]['read_timeout'] = 120
+
+
+def _change_registry(d):
+    d['registries'][0]['host_name'] = 'http://other'
+
+
+def _rename_environment(d):
+    d['projects'][0]['clusters'][0]['environments'][0]['name'] = 'qa'
+
+
+def _add_environment_policy(d):
+    d['security']['component_access_policies'] = [
+        {'name': 'view the component', 'component_type': 'environment', 'component_name': 'project:dev', 'user_groups': []}
+    ]
+
+
+def _change_users(d):
+    d['security']['users'].append('someone else')
+
+
+class PlanTests(unittest.TestCase):
+    def test_unchanged_configuration_has_no_plans(self):
+        self.assertEqual({}, config_diff.plan(_configuration(), _configuration()))
+
+    def test_unknown_previous_configuration_plans_everything(self):
+        plans = config_diff.plan(None, _configuration())
+        self.assertEqual(['a', 'b'], sorted(plans.keys()))
+        self.assertTrue(all(p.phases == set(config_diff.all_phases) for p in plans.values()))
+
+    def test_version_bump_only_touches_the_project_on_its_cluster(self):
+        plans = config_diff.plan(_configuration(), _configuration(_bump_version))
+
+        self.assertEqual(['a'], list(plans.keys()))
+        self.assertEqual(
+            {config_diff.registries_phase, config_diff.parameter_contexts_phase, config_diff.projects_phase},
+            plans['a'].phases)
+        self.assertEqual({'project'}, plans['a'].project_scope)
+        self.assertEqual(set(), plans['a'].parameter_context_scope)
+
+    def test_environment_change_reapplies_the_component_policies_of_its_project(self):
+        plans = config_diff.plan(_configuration(_add_environment_policy), _configuration(lambda d: (_add_environment_policy(d), _rename_environment(d))))
+
+        self.assertEqual(['a'], list(plans.keys()))
+        self.assertIn(config_diff.component_policies_phase, plans['a'].phases)
+        self.assertIsNone(plans['a'].project_scope)
+
+    def test_environment_change_without_component_policies_stays_scoped(self):
+        plans = config_diff.plan(_configuration(), _configuration(_rename_environment))
+
+        self.assertNotIn(config_diff.component_policies_phase, plans['a'].phases)
+        self.assertEqual({'project'}, plans['a'].project_scope)
+
+    def test_parameter_context_change_touches_every_cluster(self):
+        plans = config_diff.plan(_configuration(), _configuration(_change_context))
+
+        self.assertEqual(['a', 'b'], sorted(plans.keys()))
+        self.assertEqual({config_diff.parameter_contexts_phase}, plans['b'].phases)
+        self.assertEqual({'context'}, plans['b'].parameter_context_scope)
+
+    @parameterized.expand([
+        (_change_cluster, ['b']),
+        (_change_registry, ['a', 'b'])
+    ])
+    def test_plans_everything_for(self, change, expected_clusters):
+        plans = config_diff.plan(_configuration(), _configuration(change))
+
+        self.assertEqual(expected_clusters, sorted(plans.keys()))
+        for cluster_plan in plans.values():
+            self.assertEqual(set(config_diff.all_phases), cluster_plan.phases)
+            self.assertIsNone(cluster_plan.project_scope)
+
+    def test_user_change_reconciles_policies_with_every_project(self):
+        plans = config_diff.plan(_configuration(), _configuration(_change_users))
+
+        self.assertIn(config_diff.component_policies_phase, plans['b'].phases)
+        self.assertIn(config_diff.projects_phase, plans['b'].phases)
+        self.assertIsNone(plans['b'].project_scope)
+
+    def test_each_cluster_is_planned_against_its_applied_configuration(self):
+        applied_configuration = _configuration()
+        plans = config_diff.plan_clusters({'a': applied_configuration, 'b': None}, _configuration(_bump_version))
+
+        self.assertEqual({'project'}, plans['a'].project_scope)
+        self.assertEqual(set(config_diff.all_phases), plans['b'].phases)
+        self.assertIsNone(plans['b'].project_scope)
+
+    @parameterized.expand([
+        ('version bump', _bump_version, False),
+        ('renamed environment', _rename_environment, True),
+        ('added environment', lambda d: d['projects'][0]['clusters'][0]['environments'].append({'name': 'qa', 'description': '', 'is_coordinated': True}), True),
+        ('removed environment', lambda d: d['projects'][0]['clusters'][0].update({'environments': []}), True)
+    ])
+    def test_component_policies_of_a_project_are_reapplied_for(self, _, change, expected):
+        plans = config_diff.plan(_configuration(_add_environment_policy), _configuration(lambda d: (_add_environment_policy(d), change(d))))
+
+        self.assertEqual(expected, config_diff.component_policies_phase in plans['a'].phases)
@@ -0,0 +1,13 @@
+import unittest
+from parameterized import parameterized
+import nifi_cluster_coordinator.configuration.config_loader as config_loader
+
+
+class DefinitionDigestTests(unittest.TestCase):
+    @parameterized.expand([
+        ({'a': 1, 'b': [1, 2]}, {'b': [1, 2], 'a': 1}, True),
+        ({'a': 1}, {'a': 2}, False),
+        ({'a': [1, 2]}, {'a': [2, 1]}, False)
+    ])
+    def test_definition_digest(self, first, second, expected):
+        self.assertEqual(expected, config_loader.definition_digest(first) == config_loader.definition_digest(second))
@@ -0,0 +1,176 @@
+import unittest
+from parameterized import parameterized
+from test import coordinator_module
+from test.reconcile_test_case import ReconcileTestCase, configuration_definition
+import nifi_cluster_coordinator.worker as worker
+import nifi_cluster_coordinator.configuration.config_loader as config_loader
+
+drift_service = coordinator_module('services.drift_service')
+config_diff = coordinator_module('configuration.config_diff')
+http_metrics = coordinator_module('utils.http_metrics')
+
+
+class FakeResponse:
+    def __init__(self, json):
+        self._json = json
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._json
+
+
+class FakeCluster:
+    def __init__(self):
+        self.name = 'fake'
+        self.revisions = {'user': 1, 'context': 1, 'project': 1, 'environment': 1, 'global-policy': 1, 'component-policy': 1}
+        self.environment_state = 'UP_TO_DATE'
+        self.endpoints = []
+
+    def _component(self, name, component=None):
+        return {'id': name, 'revision': {'version': self.revisions[name]}, 'component': {'id': name, **(component or {})}}
+
+    def get(self, endpoint):
+        user_json = self._component('user', {'accessPolicies': [
+            self._component('global-policy', {'resource': '/flow', 'action': 'read'}),
+            self._component('component-policy', {'resource': '/process-groups/environment', 'action': 'read'})
+        ]})
+        environment_json = self._component('environment', {'versionControlInformation': {'version': 2, 'state': self.environment_state}})
+        responses = {
+            '/controller/registry-clients': {'registries': []},
+            '/tenants/users': {'users': [user_json]},
+            '/tenants/user-groups': {'userGroups': []},
+            '/flow/parameter-contexts': {'parameterContexts': [self._component('context')]},
+            '/process-groups/root': {'id': 'root', 'revision': {'version': 0}},
+            '/process-groups/root/process-groups': {'processGroups': [self._component('project')]},
+            '/process-groups/project/process-groups': {'processGroups': [environment_json]}
+        }
+        self.endpoints.append(endpoint)
+        return FakeResponse(responses[endpoint])
+
+
+class DriftServiceTests(unittest.TestCase):
+    def setUp(self):
+        drift_service.init_drift_detection(True)
+
+    def tearDown(self):
+        drift_service.init_drift_detection(False)
+
+    def test_unknown_cluster_has_drifted_everywhere(self):
+        self.assertEqual(set(drift_service.all_sections), drift_service.changed_sections(FakeCluster()))
+
+    @parameterized.expand([
+        ('user', {drift_service.tenants_section}),
+        ('context', {drift_service.parameter_contexts_section}),
+        ('project', {drift_service.projects_section}),
+        ('environment', {drift_service.environments_section}),
+        ('global-policy', {drift_service.global_policies_section}),
+        ('component-policy', {drift_service.component_policies_section})
+    ])
+    def test_changed_revision_is_reported_for_its_section(self, component, expected):
+        cluster = FakeCluster()
+        drift_service.record(cluster, config_diff.ClusterPlan())
+        self.assertEqual(set(), drift_service.changed_sections(cluster))
+
+        cluster.revisions[component] += 1
+
+        self.assertEqual(expected, drift_service.changed_sections(cluster))
+
+    def test_changed_version_control_state_is_reported_for_environments(self):
+        cluster = FakeCluster()
+        drift_service.record(cluster, config_diff.ClusterPlan())
+
+        cluster.environment_state = 'LOCALLY_MODIFIED'
+
+        self.assertEqual({drift_service.environments_section}, drift_service.changed_sections(cluster))
+
+    @parameterized.expand([
+        (drift_service.environments_section, {config_diff.projects_phase, config_diff.component_policies_phase}),
+        (drift_service.global_policies_section, {config_diff.global_policies_phase}),
+        (drift_service.component_policies_section, {config_diff.component_policies_phase})
+    ])
+    def test_drift_plan_reconciles_the_phase_of_the_section(self, section, expected_phases):
+        self.assertTrue(expected_phases <= drift_service.drift_plan({section}).phases)
+
+    def test_partly_reconciled_section_keeps_its_drift(self):
+        cluster = FakeCluster()
+        drift_service.record(cluster, config_diff.ClusterPlan())
+        cluster.revisions['context'] += 1
+
+        drift_service.record(cluster, config_diff.ClusterPlan({config_diff.parameter_contexts_phase}, parameter_context_scope={'other'}))
+
+        self.assertEqual({drift_service.parameter_contexts_section}, drift_service.changed_sections(cluster))
+
+    def test_drift_plan_adds_required_phases(self):
+        cluster_plan = drift_service.drift_plan({drift_service.projects_section})
+
+        self.assertIn(config_diff.registries_phase, cluster_plan.phases)
+        self.assertIn(config_diff.parameter_contexts_phase, cluster_plan.phases)
+        self.assertIsNone(cluster_plan.project_scope)
+
+    def test_change_made_while_the_drift_is_reconciled_is_still_noticed(self):
+        cluster = FakeCluster()
+        drift_service.changed_sections(cluster)
+        cluster.revisions['context'] += 1
+
+        drift_service.record(cluster, config_diff.ClusterPlan())
+
+        self.assertEqual({drift_service.parameter_contexts_section}, drift_service.changed_sections(cluster))
+
+    def test_only_the_sections_the_reconcile_wrote_are_read_again(self):
+        cluster = FakeCluster()
+        drift_service.changed_sections(cluster)
+        cluster.endpoints.clear()
+        http_metrics.record(cluster.name, 'POST', '/parameter-contexts/context/update-requests', 200, 0.1)
+        cluster.revisions['context'] += 1
+
+        drift_service.record(cluster, config_diff.ClusterPlan())
+
+        self.assertEqual(['/flow/parameter-contexts'], cluster.endpoints)
+        self.assertEqual(set(), drift_service.changed_sections(cluster))
+
+    def test_sections_are_read_again_without_a_check(self):
+        cluster = FakeCluster()
+        drift_service.record(cluster, config_diff.ClusterPlan({config_diff.registries_phase}))
+
+        self.assertEqual(['/controller/registry-clients'], cluster.endpoints)
+
+
+class ResyncTests(ReconcileTestCase):
+    def test_unreachable_cluster_does_not_fail_a_resync_without_drift(self):
+        definition = configuration_definition(self.server.host_name)
+        definition['clusters'].append({'name': 'down', 'host_name': 'http://127.0.0.1:1', 'security': {'use_certificate': False}})
+        configuration = config_loader._build_configuration(definition)
+        drift_service.init_drift_detection(True)
+        try:
+            self.assertFalse(worker.process(configuration))
+            writes = self._writes()
+
+            self.assertEqual({}, worker.resync(configuration))
+
+            self.assertEqual(writes, self._writes())
+        finally:
+            drift_service.init_drift_detection(False)
+            for cluster in configuration.clusters:
+                cluster.close()
+
+    def test_resync_restores_a_component_policy_changed_by_hand(self):
+        configuration = config_loader._build_configuration(configuration_definition(self.server.host_name))
+        drift_service.init_drift_detection(True)
+        try:
+            self.assertTrue(worker.process(configuration))
+            policy = [
+                p for p in self.server.policies.values()
+                if p['component']['resource'].startswith('/process-groups/') and len(p['component']['userGroups']) > 0
+            ][0]
+            group_ids = list(policy['component']['userGroups'])
+            policy['component']['userGroups'] = []
+            self.server._bump(policy)
+
+            self.assertEqual({'fake': True}, worker.resync(configuration))
+
+            self.assertEqual(group_ids, policy['component']['userGroups'])
+        finally:
+            drift_service.init_drift_detection(False)
+            configuration.clusters[0].close()
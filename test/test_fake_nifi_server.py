@@ -0,0 +1,82 @@
+import unittest
+import requests
+from test.fake_nifi_server import FakeNifiServer
+from test.reconcile_test_case import ReconcileTestCase, configuration_definition
+
+
+class FakeNifiServerTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeNifiServer().start()
+        self.url = self.server.host_name + '/nifi-api'
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_stale_revision_is_rejected(self):
+        created = requests.post(self.url + '/tenants/users', json={'revision': {'version': 0}, 'component': {'identity': 'alice'}}).json()
+
+        stale = requests.delete(f'{self.url}/tenants/users/{created["id"]}', params={'version': created['revision']['version'] + 1})
+        current = requests.delete(f'{self.url}/tenants/users/{created["id"]}', params={'version': created['revision']['version']})
+
+        self.assertEqual(409, stale.status_code)
+        self.assertEqual(200, current.status_code)
+
+    def test_update_request_completes_after_its_duration(self):
+        self.server.update_request_duration = 60
+        context = requests.post(self.url + '/parameter-contexts', json={
+            'revision': {'version': 0}, 'component': {'name': 'context', 'parameters': []}}).json()
+        update = {'revision': context['revision'], 'component': {'parameters': [{'parameter': {'name': 'a', 'value': '1'}}]}}
+
+        request_json = requests.post(f'{self.url}/parameter-contexts/{context["id"]}/update-requests', json=update).json()['request']
+        request_url = f'{self.url}/parameter-contexts/{context["id"]}/update-requests/{request_json["requestId"]}'
+        self.assertFalse(request_json['complete'])
+
+        self.server.update_request_duration = 0
+        self.assertTrue(requests.get(request_url).json()['request']['complete'])
+        self.assertEqual(200, requests.delete(request_url).status_code)
+        self.assertEqual(404, requests.get(request_url).status_code)
+        self.assertEqual(['a'], list(self.server.parameter_contexts[context['id']]['component']['parameters'].keys()))
+
+    def test_injected_failures(self):
+        self.server.failure_rate = 1
+
+        self.assertEqual(503, requests.get(self.url + '/process-groups/root').status_code)
+
+
+class ReconcileAgainstFakeNifiServerTests(ReconcileTestCase):
+    def test_reconcile_creates_the_configured_components(self):
+        self.assertTrue(self._process(configuration_definition(self.server.host_name)))
+
+        project = [g for g in self.server.process_groups.values() if g['component']['name'] == 'project'][0]
+        environments = {
+            g['component']['name']: g['component'] for g in self.server.process_groups.values() if g['component']['parentGroupId'] == project['id']
+        }
+        self.assertEqual(2, environments['dev']['versionControlInformation']['version'])
+        self.assertEqual(3, environments['prod']['versionControlInformation']['version'])
+        self.assertEqual(
+            {'plain', 'secret'},
+            {p for c in self.server.parameter_contexts.values() for p in c['component']['parameters'].keys()})
+        self.assertEqual(
+            {'coordinator', 'alice', 'bob'}, {u['component']['identity'] for u in self.server.users.values()})
+        self.assertEqual(
+            {'/process-groups/' + environments['dev']['id']},
+            {p['component']['resource'] for p in self.server.policies.values() if len(p['component']['userGroups']) > 0} - {'/flow'})
+
+    def test_second_reconcile_does_not_write(self):
+        self.assertTrue(self._process(configuration_definition(self.server.host_name)))
+        writes = self._writes()
+
+        self.assertTrue(self._process(configuration_definition(self.server.host_name)))
+
+        self.assertEqual(writes, self._writes())
+
+    def test_changes_are_applied(self):
+        self.assertTrue(self._process(configuration_definition(self.server.host_name)))
+
+        self.assertTrue(self._process(configuration_definition(self.server.host_name, parameter_value='2', version=1)))
+
+        parameters = [c for c in self.server.parameter_contexts.values()][0]['component']['parameters']
+        self.assertEqual('2', parameters['plain']['value'])
+        self.assertEqual(
+            [1],
+            [g['component']['versionControlInformation']['version'] for g in self.server.process_groups.values() if g['component']['name'] == 'dev'])
@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+import unittest
+from parameterized import parameterized
+from test import coordinator_module
+from test.fake_nifi_server import FakeNifiServer
+import nifi_cluster_coordinator.worker as worker
+import nifi_cluster_coordinator.configuration.config_loader as config_loader
+
+http_metrics = coordinator_module('utils.http_metrics')
+
+
+class EndpointTemplateTests(unittest.TestCase):
+    @parameterized.expand([
+        ('/process-groups/root', '/process-groups/root'),
+        ('/process-groups/1234', '/process-groups/{id}'),
+        ('/process-groups/1234/process-groups', '/process-groups/{id}/process-groups'),
+        ('/tenants/users', '/tenants/users'),
+        ('/tenants/users/1234', '/tenants/users/{id}'),
+        ('/policies', '/policies'),
+        ('/policies/1234', '/policies/{id}'),
+        ('/policies/read/flow', '/policies/{action}/{resource}'),
+        ('/policies/write/data/process-groups/1234', '/policies/{action}/{resource}'),
+        ('/parameter-contexts/1234/update-requests/5678', '/parameter-contexts/{id}/update-requests/{request-id}'),
+        ('/versions/update-requests/process-groups/1234', '/versions/update-requests/process-groups/{id}'),
+        ('/versions/update-requests/5678', '/versions/update-requests/{request-id}'),
+        ('/flow/registries/1/buckets/2/flows/3/versions', '/flow/registries/{registry-id}/buckets/{bucket-id}/flows/{flow-id}/versions')
+    ])
+    def test_endpoint_template_returns_expected(self, endpoint, expected):
+        self.assertEqual(expected, http_metrics.endpoint_template(endpoint))
+
+
+class HttpMetricsTests(unittest.TestCase):
+    def test_calls_are_recorded_while_recording(self):
+        http_metrics.record('a', 'GET', '/tenants/users', 200, 0.01)
+        with http_metrics.recording() as recorder:
+            http_metrics.record('a', 'GET', '/policies/read/flow', 200, 0.02, 0, 100)
+            http_metrics.record('a', 'GET', '/policies/write/flow', 404, 0.2, 0, 10)
+            http_metrics.record('a', 'DELETE', '/policies/1234', None, 3)
+        http_metrics.record('a', 'GET', '/tenants/users', 200, 0.01)
+
+        self.assertEqual(
+            [('a', 'DELETE', '/policies/{id}'), ('a', 'GET', '/policies/{action}/{resource}')], sorted(recorder.endpoints.keys()))
+        metrics = recorder.endpoints[('a', 'GET', '/policies/{action}/{resource}')]
+        self.assertEqual((2, 1, 110), (metrics.calls, metrics.errors, metrics.bytes_received))
+        self.assertEqual({'200': 1, '404': 1}, metrics.status_codes)
+        self.assertEqual(0.25, metrics.percentile_seconds(0.95))
+        self.assertEqual({'error': 1}, recorder.endpoints[('a', 'DELETE', '/policies/{id}')].status_codes)
+
+    def test_summary_lists_the_slowest_endpoint_first(self):
+        recorder = http_metrics.HttpMetrics()
+        recorder.record('a', 'GET', '/tenants/users', 200, 0.01, 0, 0)
+        recorder.record('a', 'PUT', '/policies/{id}', 200, 1, 0, 0)
+
+        lines = recorder.summary().split('\n')
+
+        self.assertIn('/policies/{id}', lines[1])
+        self.assertIn('/tenants/users', lines[2])
+        self.assertIn('2 calls', lines[3])
+
+
+class ProcessMetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeNifiServer().start()
+        self.folder = tempfile.TemporaryDirectory()
+        http_metrics.init_http_metrics(os.path.join(self.folder.name, 'metrics.json'))
+
+    def tearDown(self):
+        http_metrics.init_http_metrics(None)
+        self.folder.cleanup()
+        self.server.stop()
+
+    def test_process_writes_the_calls_of_the_run(self):
+        configuration = config_loader._build_configuration({
+            'clusters': [{'name': 'fake', 'host_name': self.server.host_name, 'security': {'use_certificate': False}}],
+            'registries': [{'name': 'registry', 'host_name': 'http://registry', 'description': 'registry'}]
+        })
+
+        self.assertTrue(worker.process(configuration))
+        configuration.clusters[0].close()
+
+        with open(http_metrics.summary_file, 'r') as stream:
+            metrics_json = json.load(stream)
+        self.assertEqual(sum(self.server.calls.values()), sum(m['calls'] for m in metrics_json))
+        self.assertEqual(
+            ['POST'], [m['method'] for m in metrics_json if m['endpoint'] == '/controller/registry-clients' and m['status_codes'] == {'201': 1}])
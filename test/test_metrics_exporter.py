@@ -0,0 +1,58 @@
+import unittest
+import requests
+from test import coordinator_module
+
+metrics_exporter = coordinator_module('metrics_exporter')
+http_metrics = coordinator_module('utils.http_metrics')
+
+
+class MetricsExporterTests(unittest.TestCase):
+    def setUp(self):
+        self.port = metrics_exporter.init_metrics_exporter(0, '127.0.0.1')
+
+    def tearDown(self):
+        metrics_exporter.shutdown_metrics_exporter()
+
+    def test_reconciles_phases_and_reachability_are_rendered(self):
+        metrics_exporter.observe_reconcile('a', True, 2.5)
+        metrics_exporter.observe_reconcile('a', False, 1)
+        metrics_exporter.observe_phase('a', 'users', 0.5)
+        metrics_exporter.set_reachable('b', False)
+
+        lines = metrics_exporter.render().split('\n')
+
+        self.assertIn('nifi_coordinator_reconciles_total{cluster="a",result="failure"} 1', lines)
+        self.assertIn('nifi_coordinator_reconciles_total{cluster="a",result="success"} 1', lines)
+        self.assertIn('nifi_coordinator_reconcile_duration_seconds{cluster="a"} 1', lines)
+        self.assertIn('nifi_coordinator_phase_duration_seconds{cluster="a",phase="users"} 0.5', lines)
+        self.assertIn('nifi_coordinator_cluster_reachable{cluster="b"} 0', lines)
+        self.assertEqual(1, len([line for line in lines if line.startswith('nifi_coordinator_last_success_timestamp_seconds{cluster="a"}')]))
+
+    def test_api_calls_and_resource_changes_are_rendered(self):
+        http_metrics.record('a', 'POST', '/tenants/users', 201, 0.02)
+        http_metrics.record('a', 'POST', '/tenants/users', 409, 0.02)
+        http_metrics.record('a', 'DELETE', '/policies/1234', 200, 0.2)
+
+        lines = metrics_exporter.render().split('\n')
+
+        self.assertIn('nifi_coordinator_api_calls_total{cluster="a",method="POST",endpoint="/tenants/users",status="409"} 1', lines)
+        self.assertIn('nifi_coordinator_api_errors_total{cluster="a",method="POST",endpoint="/tenants/users"} 1', lines)
+        self.assertIn('nifi_coordinator_api_call_duration_seconds_bucket{cluster="a",method="DELETE",endpoint="/policies/{id}",le="0.25"} 1', lines)
+        self.assertIn('nifi_coordinator_api_call_duration_seconds_count{cluster="a",method="POST",endpoint="/tenants/users"} 2', lines)
+        self.assertIn('nifi_coordinator_resource_changes_total{cluster="a",resource="user",action="created"} 1', lines)
+        self.assertIn('nifi_coordinator_resource_changes_total{cluster="a",resource="access_policy",action="deleted"} 1', lines)
+
+    def test_metrics_are_served(self):
+        metrics_exporter.set_reachable('a', True)
+
+        response = requests.get(f'http://127.0.0.1:{self.port}/metrics')
+
+        self.assertEqual(200, response.status_code)
+        self.assertIn('nifi_coordinator_cluster_reachable{cluster="a"} 1', response.text)
+        self.assertEqual(404, requests.get(f'http://127.0.0.1:{self.port}/other').status_code)
+
+    def test_nothing_is_collected_once_shut_down(self):
+        metrics_exporter.shutdown_metrics_exporter()
+        metrics_exporter.set_reachable('a', True)
+
+        self.assertNotIn('cluster="a"', metrics_exporter.render())
@@ -0,0 +1,15 @@
+import unittest
+from parameterized import parameterized
+import nifi_cluster_coordinator.utils.name_helper as name_helper
+
+
+class MissingNamesTests(unittest.TestCase):
+    @parameterized.expand([
+        ([], ['a'], []),
+        (['a', 'b'], [], ['a', 'b']),
+        (['a', 'B', 'c'], ['b'], ['a', 'c']),
+        (['A'], ['a'], []),
+        (['STRASSE'], ['Straße'], [])
+    ])
+    def test_missing_names_returns_expected(self, names, configured_names, expected):
+        self.assertEqual(expected, name_helper.missing_names(names, configured_names))
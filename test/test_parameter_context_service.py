@@ -0,0 +1,135 @@
+import unittest
+from unittest import mock
+from parameterized import parameterized
+from test import coordinator_module
+from test.fake_nifi_server import FakeNifiServer
+import nifi_cluster_coordinator.services.parameter_context_service as parameter_context_service
+import nifi_cluster_coordinator.configuration.config_loader as config_loader
+from nifi_cluster_coordinator.configuration.parameter_context import ParameterContext
+
+sensitive_parameter_store = coordinator_module('services.sensitive_parameter_store')
+update_request_service = coordinator_module('services.update_request_service')
+
+
+class FakeCluster:
+    def __init__(self, name):
+        self.name = name
+
+
+def _current_json(parameters):
+    return {
+        'id': 'context-id',
+        'component': {
+            'description': '',
+            'parameters': [
+                {'parameter': {'name': n, 'description': '', 'sensitive': s, 'value': v}} for n, s, v in parameters
+            ]
+        }
+    }
+
+
+def _parameter_context(parameters):
+    return ParameterContext('context', '', True, [
+        {'name': n, 'description': '', 'is_sensitive': s, 'value': v} for n, s, v in parameters
+    ])
+
+
+class DiffParametersTests(unittest.TestCase):
+    def setUp(self):
+        sensitive_parameter_store.init_sensitive_parameter_store(None)
+
+    @parameterized.expand([
+        ([('a', False, '1')], [('a', False, '1')], [], [], []),
+        ([('a', False, '1')], [('A', False, '1')], [], [], []),
+        ([('a', False, '1'), ('b', False, '2')], [('a', False, '1')], ['b'], [], []),
+        ([('a', False, '1')], [('a', False, '2')], [], ['a'], []),
+        ([('a', False, '1')], [('a', False, '1'), ('b', False, '2')], [], [], ['b']),
+    ])
+    def test_diff_parameters(self, configured, current, expected_added, expected_changed, expected_removed):
+        added, changed, removed = parameter_context_service._diff_parameters(
+            FakeCluster('a'), _parameter_context(configured), _current_json(current))
+
+        self.assertEqual(expected_added, [p.name for p in added])
+        self.assertEqual(expected_changed, [p.name for p in changed])
+        self.assertEqual(expected_removed, removed)
+
+    def test_diff_parameters_skips_applied_sensitive_value(self):
+        cluster = FakeCluster('a')
+        parameter_context = _parameter_context([('password', True, 'secret')])
+        current_json = _current_json([('password', True, '********')])
+
+        _, changed, _ = parameter_context_service._diff_parameters(cluster, parameter_context, current_json)
+        self.assertEqual(['password'], [p.name for p in changed])
+
+        sensitive_parameter_store.record(cluster, 'context-id', parameter_context.parameters)
+
+        _, changed, _ = parameter_context_service._diff_parameters(cluster, parameter_context, current_json)
+        self.assertEqual([], changed)
+
+
+class UpdateRequestTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeNifiServer().start()
+        sensitive_parameter_store.init_sensitive_parameter_store(None)
+        self.cluster = self._configuration('password').clusters[0]
+        self._sync('password')
+
+    def tearDown(self):
+        self.cluster.close()
+        self.server.stop()
+
+    def _configuration(self, secret):
+        return config_loader._build_configuration({
+            'clusters': [{'name': 'fake', 'host_name': self.server.host_name, 'security': {'use_certificate': False}}],
+            'registries': [],
+            'parameter_contexts': [{
+                'name': 'context',
+                'description': 'context',
+                'is_coordinated': True,
+                'parameters': [{'name': 'secret', 'description': '', 'is_sensitive': True, 'value': secret}]
+            }]
+        })
+
+    def _sync(self, secret):
+        parameter_contexts = self._configuration(secret).parameter_contexts
+        parameter_context_service.sync(self.cluster, parameter_contexts)
+        return parameter_contexts[0]
+
+    def _assert_request_deleted(self):
+        self.assertEqual({}, self.server.update_requests)
+        self.assertEqual(1, self.server.endpoint_calls['DELETE /parameter-contexts/{}/update-requests/{}'])
+
+    def _secret_value(self):
+        return list(self.server.parameter_contexts.values())[0]['component']['parameters']['secret']['value']
+
+    @mock.patch.object(update_request_service, 'initial_poll_interval', 0.01)
+    def test_completed_request_is_deleted_and_recorded(self):
+        self.server.update_request_duration = 0.05
+
+        parameter_context = self._sync('new password')
+
+        self._assert_request_deleted()
+        self.assertGreater(self.server.endpoint_calls['GET /parameter-contexts/{}/update-requests/{}'], 0)
+        self.assertEqual('new password', self._secret_value())
+        self.assertTrue(sensitive_parameter_store.is_applied(self.cluster, parameter_context.id, parameter_context.parameters[0]))
+
+    @mock.patch.object(update_request_service, 'initial_poll_interval', 0.01)
+    def test_failed_request_is_deleted_and_not_recorded(self):
+        self.server.update_request_failure = 'Unable to restart the referencing components.'
+
+        parameter_context = self._sync('new password')
+
+        self._assert_request_deleted()
+        self.assertEqual('password', self._secret_value())
+        self.assertFalse(sensitive_parameter_store.is_applied(self.cluster, parameter_context.id, parameter_context.parameters[0]))
+
+    @mock.patch.object(update_request_service, 'request_timeout', 0.05)
+    @mock.patch.object(update_request_service, 'initial_poll_interval', 0.01)
+    def test_timed_out_request_is_deleted_and_not_recorded(self):
+        self.server.update_request_duration = 60
+
+        parameter_context = self._sync('new password')
+
+        self._assert_request_deleted()
+        self.assertEqual('password', self._secret_value())
+        self.assertFalse(sensitive_parameter_store.is_applied(self.cluster, parameter_context.id, parameter_context.parameters[0]))
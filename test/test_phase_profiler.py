@@ -0,0 +1,126 @@
+import os
+import pstats
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import yaml
+from test import coordinator_module
+from test.reconcile_test_case import ReconcileTestCase, configuration_definition
+import nifi_cluster_coordinator.worker as worker
+import nifi_cluster_coordinator.configuration.config_loader as config_loader
+
+phase_profiler = coordinator_module('utils.phase_profiler')
+concurrency_helper = coordinator_module('utils.concurrency_helper')
+http_metrics = coordinator_module('utils.http_metrics')
+
+
+def _busy(seconds: float):
+    started = time.thread_time()
+    while time.thread_time() - started < seconds:
+        pass
+
+
+class PhaseProfilerTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        phase_profiler.init_phase_profiler(self.folder.name)
+
+    def tearDown(self):
+        phase_profiler.init_phase_profiler(None)
+        self.folder.cleanup()
+
+    def test_work_handed_to_other_threads_counts_towards_the_phase(self):
+        with phase_profiler.phase('a', 'projects'):
+            concurrency_helper.map_bounded(_busy, [0.05] * 4, 4)
+
+        phase_profile = phase_profiler._phases[('a', 'projects')]
+        self.assertGreaterEqual(phase_profile.cpu_seconds, 0.2)
+        self.assertIn('_busy', [function for _, _, function in phase_profile.stats.stats])
+
+    def test_phases_run_at_the_same_time(self):
+        both_started = threading.Barrier(2)
+
+        def sync(name):
+            with phase_profiler.phase('a', name):
+                both_started.wait(5)
+                concurrency_helper.map_bounded(_busy, [0.05] * 2, 2)
+
+        concurrency_helper.run_dependent({
+            'users': ([], lambda: sync('users')),
+            'registries': ([], lambda: sync('registries'))
+        })
+
+        for name in ['users', 'registries']:
+            self.assertEqual(1, phase_profiler._phases[('a', name)].runs)
+            self.assertGreaterEqual(phase_profiler._phases[('a', name)].cpu_seconds, 0.1)
+
+    def test_phase_is_timed_when_another_profiler_is_active(self):
+        with mock.patch.object(phase_profiler.cProfile.Profile, 'enable', side_effect=ValueError('Another profiling tool is already active')):
+            with phase_profiler.phase('a', 'projects'):
+                concurrency_helper.map_bounded(_busy, [0.05] * 2, 2)
+
+        phase_profile = phase_profiler._phases[('a', 'projects')]
+        self.assertGreaterEqual(phase_profile.cpu_seconds, 0.1)
+        self.assertIsNone(phase_profile.stats)
+        phase_profiler.report()
+        self.assertEqual([], os.listdir(self.folder.name))
+
+    def test_nothing_is_profiled_when_disabled(self):
+        phase_profiler.init_phase_profiler(None)
+
+        with phase_profiler.phase('a', 'projects'):
+            _busy(0.01)
+        phase_profiler.report()
+
+        self.assertEqual({}, phase_profiler._phases)
+        self.assertEqual([], os.listdir(self.folder.name))
+
+    def test_summary_splits_the_time_between_http_and_cpu(self):
+        with phase_profiler.phase('a', 'users'):
+            http_metrics.record('a', 'GET', '/tenants/users', 200, 0.3)
+            _busy(0.1)
+        http_metrics.record('a', 'GET', '/tenants/users', 200, 5)
+
+        phase_profile = phase_profiler._phases[('a', 'users')]
+        self.assertEqual(1, phase_profile.http_calls)
+        self.assertAlmostEqual(0.3, phase_profile.http_seconds)
+        row = [line for line in phase_profiler.summary().split('\n') if line.startswith('a ')][0]
+        self.assertEqual(['a', 'users', '1'], row.split()[:3])
+
+
+class ReconcileProfileTests(ReconcileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.folder = tempfile.TemporaryDirectory()
+        phase_profiler.init_phase_profiler(self.folder.name)
+
+    def tearDown(self):
+        phase_profiler.init_phase_profiler(None)
+        self.folder.cleanup()
+        super().tearDown()
+
+    def test_reconcile_writes_a_profile_per_phase(self):
+        config_file = os.path.join(self.folder.name, 'configuration.yaml')
+        with open(config_file, 'w') as stream:
+            yaml.safe_dump(configuration_definition(self.server.host_name), stream)
+        configuration = config_loader.load_from_file(config_file)
+        try:
+            self.assertTrue(worker.process(configuration))
+        finally:
+            configuration.clusters[0].close()
+
+        self.assertEqual({}, phase_profiler._phases)
+        files = sorted(f for f in os.listdir(self.folder.name) if f.endswith('.prof'))
+        self.assertEqual([
+            'fake-component_policies.prof',
+            'fake-global_policies.prof',
+            'fake-parameter_contexts.prof',
+            'fake-projects.prof',
+            'fake-registries.prof',
+            'fake-user_groups.prof',
+            'fake-users.prof',
+            'load_configuration.prof'
+        ], files)
+        self.assertGreater(pstats.Stats(os.path.join(self.folder.name, 'fake-users.prof')).total_calls, 0)
@@ -0,0 +1,33 @@
+from test.reconcile_test_case import ReconcileTestCase, configuration_definition
+
+
+class ProjectServiceTests(ReconcileTestCase):
+    def test_environments_of_all_projects_stay_within_max_parallel_projects(self):
+        self.server.latency = 0.02
+
+        def projects_definition(context_name):
+            changed_definition = configuration_definition(self.server.host_name)
+            changed_definition['clusters'][0]['max_parallel_projects'] = 2
+            changed_definition['parameter_contexts'].append({'name': 'other', 'description': 'other', 'is_coordinated': True, 'parameters': []})
+            changed_definition['projects'] = [
+                {
+                    **changed_definition['projects'][0],
+                    'name': f'project-{i}',
+                    'clusters': [{'cluster_name': 'fake', 'environments': [
+                        {'name': f'environment-{j}', 'description': '', 'is_coordinated': True, 'version': 2, 'parameter_context_name': context_name}
+                        for j in range(4)
+                    ]}]
+                }
+                for i in range(3)
+            ]
+            changed_definition['security']['component_access_policies'] = []
+            return changed_definition
+
+        self.assertTrue(self._process(projects_definition('context')))
+        self.server.peak_concurrent_calls.clear()
+
+        self.assertTrue(self._process(projects_definition('other')))
+
+        self.assertEqual(12, self.server.endpoint_calls['PUT /process-groups/{}'])
+        self.assertLessEqual(self.server.peak_concurrent_calls['PUT /process-groups/{}'], 2)
+        self.assertLessEqual(self.server.peak_concurrent_calls['DELETE /versions/process-groups/{}'], 2)
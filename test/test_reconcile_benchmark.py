@@ -0,0 +1,18 @@
+import unittest
+import benchmark.reconcile_benchmark as reconcile_benchmark
+import nifi_cluster_coordinator.configuration.config_loader as config_loader
+
+
+class GenerateDefinitionTests(unittest.TestCase):
+    def test_generated_definition_has_the_requested_size(self):
+        definition = reconcile_benchmark.generate_definition(['http://a', 'http://b'], 10, 3, 2, 4, 5, 2)
+
+        configuration = config_loader._build_configuration(definition)
+
+        self.assertEqual(['cluster-0', 'cluster-1'], [c.name for c in configuration.clusters])
+        self.assertEqual(10, len(configuration.security.users))
+        self.assertEqual(10, sum(len(g.members) for g in configuration.security.user_groups))
+        self.assertEqual([4, 4], [len(pc.parameters) for pc in configuration.parameter_contexts])
+        self.assertEqual(5, len(configuration.security.component_access_policies))
+        self.assertEqual(
+            [2] * 10, [len(project_cluster.environments) for p in configuration.projects for project_cluster in p.clusters])
@@ -0,0 +1,160 @@
+import threading
+import unittest
+from parameterized import parameterized
+from nifi_cluster_coordinator.reconcile_queue import ReconcileQueue
+
+
+class FakeCluster:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeConfiguration:
+    def __init__(self, digest, cluster_names=('a',)):
+        self.digest = digest
+        self.clusters = [FakeCluster(name) for name in cluster_names]
+
+
+class ReconcileQueueTests(unittest.TestCase):
+    def test_burst_of_changes_is_coalesced_into_one_run(self):
+        reconciled = []
+        queue = ReconcileQueue(lambda: FakeConfiguration('a'), lambda c, e, a: reconciled.append(c.digest) or {}, debounce_seconds=0.1)
+        queue.start()
+
+        for i in range(5):
+            queue.submit(f'change {i}')
+
+        self.assertTrue(queue.wait_idle(5))
+        queue.stop()
+        self.assertEqual(['a'], reconciled)
+
+    def test_change_during_run_cancels_it_and_runs_again(self):
+        started = threading.Event()
+        cancelled = []
+        versions = iter([FakeConfiguration('first'), FakeConfiguration('second')])
+
+        def reconcile(configuration, cancel_event, applied_configurations):
+            if configuration.digest == 'first':
+                started.set()
+                cancelled.append(cancel_event.wait(5))
+            else:
+                cancelled.append(cancel_event.is_set())
+            return {}
+
+        queue = ReconcileQueue(lambda: next(versions), reconcile, debounce_seconds=0.05)
+        queue.start()
+        queue.submit('change 1')
+        self.assertTrue(started.wait(5))
+        queue.submit('change 2')
+
+        self.assertTrue(queue.wait_idle(5))
+        queue.stop()
+        self.assertEqual([True, False], cancelled)
+        self.assertEqual(2, queue.runs)
+
+    def test_failed_load_does_not_stop_the_queue(self):
+        reconciled = []
+        loads = iter([ValueError('bad yaml'), FakeConfiguration('a')])
+
+        def load():
+            result = next(loads)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        queue = ReconcileQueue(load, lambda c, e, a: reconciled.append(c.digest) or {}, debounce_seconds=0.01)
+        queue.start()
+        queue.submit('change 1')
+        self.assertTrue(queue.wait_idle(5))
+        queue.submit('change 2')
+        self.assertTrue(queue.wait_idle(5))
+        queue.stop()
+        self.assertEqual(['a'], reconciled)
+
+    @parameterized.expand([
+        (True, ['a']),
+        (False, ['a', 'a'])
+    ])
+    def test_unchanged_configuration_is_skipped_once_applied(self, applied, expected):
+        reconciled = []
+
+        def reconcile(configuration, cancel_event, applied_configurations):
+            reconciled.append(configuration.digest)
+            return {'a': applied}
+
+        queue = ReconcileQueue(lambda: FakeConfiguration('a'), reconcile, debounce_seconds=0.01)
+        queue.start()
+        queue.submit('change 1')
+        self.assertTrue(queue.wait_idle(5))
+        queue.submit('change 2')
+        self.assertTrue(queue.wait_idle(5))
+        queue.stop()
+        self.assertEqual(expected, reconciled)
+
+    def test_resync_runs_against_applied_configuration_when_idle(self):
+        resynced = threading.Event()
+        applied = FakeConfiguration('a')
+
+        def resync(applied_configurations, cancel_event):
+            self.assertEqual({'a': applied}, applied_configurations)
+            resynced.set()
+            return {}
+
+        queue = ReconcileQueue(lambda: None, lambda c, e, a: {}, 0, {'a': applied}, resync, resync_interval=0.05)
+        queue.start()
+        self.assertTrue(resynced.wait(5))
+        queue.stop()
+        self.assertEqual(0, queue.runs)
+
+    def test_recovered_cluster_is_reconciled_on_its_own(self):
+        reconciled_clusters = []
+
+        def reconcile_clusters(configuration, cancel_event, cluster_names):
+            reconciled_clusters.append((configuration.digest, cluster_names))
+            return {name: True for name in cluster_names}
+
+        queue = ReconcileQueue(lambda: None, lambda c, e, a: {}, 0, reconcile_clusters=reconcile_clusters)
+        queue.start()
+        self.assertTrue(queue.submit_cluster('a', FakeConfiguration('x')))
+        self.assertTrue(queue.wait_idle(5))
+        queue.stop()
+        self.assertEqual([('x', ['a'])], reconciled_clusters)
+        self.assertEqual(0, queue.runs)
+        self.assertEqual('x', queue.applied_configurations['a'].digest)
+
+    def test_cluster_that_was_not_reconciled_is_planned_on_its_own(self):
+        configurations = iter([FakeConfiguration('first', ['a', 'b']), FakeConfiguration('second', ['a', 'b'])])
+        applied = []
+
+        def reconcile(configuration, cancel_event, applied_configurations):
+            applied.append({name: None if c is None else c.digest for name, c in applied_configurations.items()})
+            return {'a': True, 'b': configuration.digest == 'second'}
+
+        queue = ReconcileQueue(lambda: next(configurations), reconcile, debounce_seconds=0.01)
+        queue.start()
+        queue.submit('change 1')
+        self.assertTrue(queue.wait_idle(5))
+        queue.submit('change 2')
+        self.assertTrue(queue.wait_idle(5))
+        queue.stop()
+
+        self.assertEqual([{}, {'a': 'first', 'b': None}], applied)
+        self.assertEqual({'a': 'second', 'b': 'second'}, {name: c.digest for name, c in queue.applied_configurations.items()})
+
+    def test_drift_that_was_not_reconciled_reconciles_only_that_cluster_again(self):
+        applied = FakeConfiguration('a', ['a', 'b'])
+        reconciled = threading.Event()
+        planned_against = []
+
+        def reconcile(configuration, cancel_event, applied_configurations):
+            planned_against.append(applied_configurations)
+            reconciled.set()
+            return {'b': True}
+
+        queue = ReconcileQueue(
+            lambda: applied, reconcile, 0, {'a': applied, 'b': applied}, lambda c, e: {'b': False}, resync_interval=0.05)
+        queue.start()
+        self.assertTrue(reconciled.wait(5))
+        queue.stop()
+
+        self.assertEqual({'a': applied, 'b': None}, planned_against[0])
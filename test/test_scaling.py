@@ -0,0 +1,26 @@
+import os
+import unittest
+from parameterized import parameterized
+import benchmark.hot_path_benchmark as hot_path_benchmark
+
+# a quarter of the benchmark sizes keeps the suite fast, quadratic growth still shows as an exponent near 2
+scale = 0.25
+
+batch_seconds = 0.02
+
+# a stall of the machine only ever slows down one measurement, quadratic growth fails every attempt
+attempts = 3
+
+
+# wall clock timings depend on the load of the machine, so they only run with make benchmark-scaling
+@unittest.skipUnless(os.environ.get('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS to time the hot paths')
+class ScalingTests(unittest.TestCase):
+    @parameterized.expand([(name, build, size, max_exponent) for name, build, size, max_exponent in hot_path_benchmark.cases])
+    def test_scaling_class(self, name, build, size, max_exponent):
+        size = max(int(size * scale), hot_path_benchmark.size_factor)
+        for _ in range(attempts):
+            _, exponent = hot_path_benchmark.scaling_exponent(build, size, batch_seconds=batch_seconds)
+            if exponent <= max_exponent:
+                break
+
+        self.assertLessEqual(exponent, max_exponent, f'{name} grows with an exponent of {exponent:.2f}.')
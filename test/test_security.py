@@ -0,0 +1,37 @@
+import unittest
+from parameterized import parameterized
+from nifi_cluster_coordinator.configuration.security import Security, User
+
+
+class SecurityIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.security = Security({
+            'is_coordinated': True,
+            'users': ['Foo-User', 'bar-user'],
+            'user_groups': [{'identity': 'Foo-Group', 'members': ['FOO-USER', 'bar-user']}]
+        })
+
+    @parameterized.expand([
+        ('foo-user', 'Foo-User'),
+        ('FOO-USER', 'Foo-User'),
+        ('bar-user', 'bar-user'),
+        ('baz-user', None)
+    ])
+    def test_find_user_is_case_insensitive(self, identity, expected):
+        user = self.security.find_user(identity)
+        self.assertEqual(expected, None if user is None else user.identity)
+
+    def test_find_user_group_is_case_insensitive(self):
+        self.assertEqual('Foo-Group', self.security.find_user_group('foo-group').identity)
+
+    def test_user_group_members_are_case_folded(self):
+        self.assertEqual({'foo-user', 'bar-user'}, self.security.user_group_members['foo-group'])
+
+    def test_add_user_updates_index(self):
+        self.security.add_user(User('CN=Coordinator'))
+        self.assertEqual('CN=Coordinator', self.security.find_user('cn=coordinator').identity)
+        self.assertEqual(3, len(self.security.users))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from parameterized import parameterized
+import nifi_cluster_coordinator.services.sensitive_parameter_store as sensitive_parameter_store
+from nifi_cluster_coordinator.configuration.parameter_context import Parameter
+
+
+class FakeCluster:
+    def __init__(self, name):
+        self.name = name
+
+
+class SensitiveParameterStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.folder.name, 'store.json')
+        sensitive_parameter_store.init_sensitive_parameter_store(self.file)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    @parameterized.expand([
+        ('secret', True),
+        ('other', False)
+    ])
+    def test_is_applied_compares_with_recorded_value(self, value, expected):
+        cluster = FakeCluster('a')
+        sensitive_parameter_store.record(cluster, 'context-id', [Parameter('Password', '', True, 'secret')])
+
+        self.assertEqual(expected, sensitive_parameter_store.is_applied(cluster, 'context-id', Parameter('password', '', True, value)))
+
+    def test_recorded_values_survive_reload(self):
+        cluster = FakeCluster('a')
+        parameter = Parameter('password', '', True, 'secret')
+        sensitive_parameter_store.record(cluster, 'context-id', [parameter])
+
+        sensitive_parameter_store.init_sensitive_parameter_store(self.file)
+
+        self.assertTrue(sensitive_parameter_store.is_applied(cluster, 'context-id', parameter))
+        self.assertFalse(sensitive_parameter_store.is_applied(FakeCluster('b'), 'context-id', parameter))
+
+    def test_forget_drops_recorded_values(self):
+        cluster = FakeCluster('a')
+        parameter = Parameter('password', '', True, 'secret')
+        sensitive_parameter_store.record(cluster, 'context-id', [parameter])
+
+        sensitive_parameter_store.forget(cluster, 'context-id')
+
+        self.assertFalse(sensitive_parameter_store.is_applied(cluster, 'context-id', parameter))
+
+    def test_secret_is_not_written_in_clear(self):
+        sensitive_parameter_store.record(FakeCluster('a'), 'context-id', [Parameter('password', '', True, 'secret')])
+
+        with open(self.file, 'r') as stream:
+            self.assertNotIn('secret', stream.read().replace('"salt"', ''))
+
+    def test_file_is_readable_by_its_owner_only(self):
+        sensitive_parameter_store.record(FakeCluster('a'), 'context-id', [Parameter('password', '', True, 'secret')])
+
+        self.assertEqual(0o600, os.stat(self.file).st_mode & 0o777)
+
+    def test_values_are_kept_in_memory_without_a_file(self):
+        cluster = FakeCluster('a')
+        parameter = Parameter('password', '', True, 'secret')
+        sensitive_parameter_store.init_sensitive_parameter_store(None)
+        sensitive_parameter_store.record(cluster, 'context-id', [parameter])
+
+        self.assertTrue(sensitive_parameter_store.is_applied(cluster, 'context-id', parameter))
+        self.assertEqual([], os.listdir(self.folder.name))
@@ -0,0 +1,97 @@
+import unittest
+from test import coordinator_module
+from test.reconcile_test_case import ReconcileTestCase, configuration_definition
+import nifi_cluster_coordinator.worker as worker
+import nifi_cluster_coordinator.configuration.config_loader as config_loader
+from nifi_cluster_coordinator.configuration.tenant_snapshot import TenantSnapshot
+
+config_diff = coordinator_module('configuration.config_diff')
+
+
+def _tenant_json(tenant_id: str, identity: str, access_policies: list = None):
+    tenant_json = {
+        'id': tenant_id,
+        'revision': {'version': 1},
+        'component': {'id': tenant_id, 'identity': identity}
+    }
+    if not (access_policies is None):
+        tenant_json['component']['accessPolicies'] = access_policies
+    return tenant_json
+
+
+def _policy_json(policy_id: str, resource: str, action: str, user_ids: list):
+    return {
+        'id': policy_id,
+        'revision': {'version': 1},
+        'component': {
+            'id': policy_id,
+            'resource': resource,
+            'action': action,
+            'users': [{'id': user_id} for user_id in user_ids]
+        }
+    }
+
+
+class TenantSnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = TenantSnapshot(
+            'CN=Coordinator',
+            [_tenant_json('u1', 'cn=coordinator', []), _tenant_json('u2', 'foo-user')],
+            [_tenant_json('g1', 'foo-group')])
+
+    def test_current_user_is_matched_case_insensitive(self):
+        self.assertEqual('u1', self.snapshot.current_user_json['id'])
+
+    def test_set_and_remove_user_keep_users_current(self):
+        self.snapshot.set_user(_tenant_json('u3', 'bar-user'))
+        self.snapshot.remove_user('foo-user')
+        self.assertEqual(['cn=coordinator', 'bar-user'], list(self.snapshot.users_json_dict.keys()))
+
+    def test_set_and_remove_user_group_keep_user_groups_current(self):
+        self.snapshot.set_user_group(_tenant_json('g2', 'bar-group'))
+        self.snapshot.remove_user_group('foo-group')
+        self.assertEqual(['bar-group'], list(self.snapshot.user_groups_json_dict.keys()))
+
+    def test_identities_are_matched_by_their_case_folded_key(self):
+        snapshot = TenantSnapshot('STRASSE', [_tenant_json('u1', 'Straße', [])], [_tenant_json('g1', 'Straße')])
+        self.assertEqual('u1', snapshot.current_user_json['id'])
+
+        snapshot.remove_user('STRASSE')
+        snapshot.remove_user_group('strasse')
+
+        self.assertEqual({}, snapshot.users_json_dict)
+        self.assertEqual({}, snapshot.user_groups_json_dict)
+
+    def test_record_access_policy_tracks_coordinator_policies(self):
+        self.snapshot.record_access_policy(_policy_json('p1', '/flow', 'read', ['u1']))
+        self.snapshot.record_access_policy(_policy_json('p2', '/tenants', 'read', ['u2']))
+        self.assertEqual(['p1'], [p['id'] for p in self.snapshot.current_user_json['component']['accessPolicies']])
+
+        self.snapshot.record_access_policy(_policy_json('p1', '/flow', 'read', ['u2']))
+        self.assertEqual([], self.snapshot.current_user_json['component']['accessPolicies'])
+
+    def test_forget_access_policy_removes_deleted_policy(self):
+        self.snapshot.record_access_policy(_policy_json('p1', '/flow', 'read', ['u1']))
+        self.snapshot.forget_access_policy('p1')
+        self.assertEqual([], self.snapshot.current_user_json['component']['accessPolicies'])
+
+
+class TenantSnapshotLifetimeTests(ReconcileTestCase):
+    def test_next_run_does_not_reuse_the_tenants_of_the_last_run(self):
+        definition = configuration_definition(self.server.host_name)
+        # without the users phase the members have no ids, an empty group only depends on the tenants NiFi holds
+        definition['security']['user_groups'][0]['members'] = []
+        configuration = config_loader._build_configuration(definition)
+        try:
+            self.assertTrue(worker.process(configuration))
+            self.server.user_groups.clear()
+
+            self.assertTrue(worker.process(configuration, plans={'fake': config_diff.ClusterPlan({config_diff.user_groups_phase})}))
+
+            self.assertEqual(['team'], [g['component']['identity'] for g in self.server.user_groups.values()])
+        finally:
+            configuration.clusters[0].close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+from parameterized import parameterized
+import nifi_cluster_coordinator.services.update_request_service as update_request_service
+
+
+class FakeResponse:
+    def __init__(self, request_json):
+        self.status_code = 200
+        self.text = ''
+        self._json = {'request': request_json}
+
+    def json(self):
+        return self._json
+
+
+class FakeCluster:
+    def __init__(self, polled_requests):
+        self.name = 'fake'
+        self.polled_requests = list(polled_requests)
+        self.deleted = []
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+
+    def get(self, endpoint):
+        return FakeResponse(self.polled_requests.pop(0))
+
+    def delete(self, endpoint):
+        self.deleted.append(endpoint)
+        return FakeResponse({})
+
+
+class UpdateRequestServiceTests(unittest.TestCase):
+    @parameterized.expand([
+        ([], True),
+        ([{'complete': False}, {'complete': True}], True),
+        ([{'complete': True, 'failureReason': 'boom'}], False)
+    ])
+    @mock.patch('time.sleep')
+    def test_track_polls_until_complete_and_deletes(self, polled_requests, expected, _):
+        cluster = FakeCluster(polled_requests)
+        submitted = {'complete': len(polled_requests) == 0}
+
+        result = update_request_service.track(cluster, '/versions/update-requests/1', submitted, 'update')
+
+        self.assertEqual(expected, result)
+        self.assertEqual([], cluster.polled_requests)
+        self.assertEqual(['/versions/update-requests/1'], cluster.deleted)
+        self.assertEqual(0 if expected else 1, cluster.failures)
+
+    @mock.patch('time.sleep')
+    def test_track_backs_off_between_polls(self, sleep):
+        cluster = FakeCluster([{'complete': False}] * 6 + [{'complete': True}])
+
+        update_request_service.track(cluster, '/versions/update-requests/1', {'complete': False}, 'update')
+
+        intervals = [c.args[0] for c in sleep.call_args_list]
+        self.assertEqual(sorted(intervals), intervals)
+        self.assertLessEqual(max(intervals), update_request_service.max_poll_interval)
@@ -0,0 +1,69 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from test.reconcile_test_case import ReconcileTestCase, configuration_definition
+import nifi_cluster_coordinator.worker as worker
+import nifi_cluster_coordinator.configuration.config_loader as config_loader
+
+
+class NotNifiHandler(BaseHTTPRequestHandler):
+    """Answers every call with json NiFi never returns, like another service behind the host name."""
+
+    def do_GET(self):
+        content = b'{"status": "ok"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ProcessClustersTests(ReconcileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.configuration = config_loader._build_configuration(configuration_definition(self.server.host_name))
+
+    def tearDown(self):
+        self.configuration.clusters[0].close()
+        super().tearDown()
+
+    def test_cluster_with_a_rejected_change_is_not_reconciled(self):
+        self.server.rejected_endpoints.add('POST /tenants/users')
+
+        self.assertEqual({'fake': False}, worker.process_clusters(self.configuration))
+
+        self.server.rejected_endpoints.clear()
+        self.assertEqual({'fake': True}, worker.process_clusters(self.configuration))
+
+    def test_cluster_with_a_failed_update_request_is_not_reconciled(self):
+        self.server.update_request_failure = 'Unable to apply the changes.'
+
+        self.assertEqual({'fake': False}, worker.process_clusters(self.configuration))
+
+    def test_unreachable_cluster_is_reported_on_its_own(self):
+        definition = configuration_definition(self.server.host_name)
+        definition['clusters'].append({'name': 'down', 'host_name': 'http://127.0.0.1:1', 'security': {'use_certificate': False}})
+        configuration = config_loader._build_configuration(definition)
+        try:
+            self.assertEqual({'fake': True, 'down': False}, worker.process_clusters(configuration))
+        finally:
+            for cluster in configuration.clusters:
+                cluster.close()
+
+    def test_cluster_with_an_unexpected_answer_does_not_stop_the_others(self):
+        other_server = ThreadingHTTPServer(('127.0.0.1', 0), NotNifiHandler)
+        threading.Thread(target=other_server.serve_forever, daemon=True).start()
+        definition = configuration_definition(self.server.host_name)
+        definition['clusters'].append({
+            'name': 'other', 'host_name': f'http://127.0.0.1:{other_server.server_address[1]}', 'security': {'use_certificate': False}
+        })
+        configuration = config_loader._build_configuration(definition)
+        try:
+            self.assertEqual({'fake': True, 'other': False}, worker.process_clusters(configuration))
+        finally:
+            for cluster in configuration.clusters:
+                cluster.close()
+            other_server.shutdown()
+            other_server.server_close()